@@ -10,12 +10,79 @@ BASE_DIR = Path(__file__).parent.parent
 # Database configuration
 DATABASE_PATH = BASE_DIR / "logs" / "network_monitor.db"
 
+# Koneksi SQLite (satu writer persisten + pool reader)
+DATABASE_CONFIG = {
+    "journal_mode": "WAL",            # Reader tidak memblokir writer (dan sebaliknya)
+    "synchronous": "NORMAL",          # Dengan WAL: fsync hanya saat checkpoint
+    "cache_size_kb": 16384,           # Page cache per koneksi (KiB)
+    "mmap_size": 256 * 1024 * 1024,   # Memory-mapped I/O untuk pembacaan (byte)
+    "busy_timeout_ms": 5000,          # Tunggu lock writer proses lain (misalnya worker)
+    "statement_cache_size": 256,      # Prepared statement yang di-cache per koneksi
+    "reader_pool_size": 4,            # Maksimum koneksi reader idle yang disimpan
+    "online_migration_rows": 1000000, # Di atas ini pembuatan index dijalankan di background
+    "online_migration_pause": 0.05,   # Jeda antar langkah migrasi background agar writer lain bisa menulis (detik)
+    "rollup_minute_retention_hours": 48,  # Rollup per menit (tepi window statistik)
+    "rollup_hour_retention_days": 90,     # Rollup per jam; rollup harian (daily_stats) disimpan permanen
+    "rollup_top_domains": 200,        # Top domain yang disimpan per bucket rollup
+    "stats_cache_min_refresh": 1.0,   # Detik; polling dashboard dalam jeda ini memakai hasil cache
+    "partition_keep_days": 30,        # Partisi harian packet/flow yang disimpan (0 = selamanya)
+    "partition_migration_chunk": 50000,  # Baris tabel lama yang dipindah ke partisi per transaksi migrasi
+    "maintenance_interval": 300,      # Detik; buat partisi hari ini/besok, hapus partisi kedaluwarsa, prune rollup
+}
+
 # Monitoring configuration
 MONITORING_CONFIG = {
     "interface": "eth0",  # Default network interface
-    "capture_timeout": 1,  # Timeout in seconds
-    "max_packets": 1000,  # Maximum packets to capture
+    "capture_backend": "scapy",       # "scapy" (dissection penuh), "af_packet" atau "tpacket_v3" (ring buffer mmap)
+    "af_packet_buffer_size": 4 * 1024 * 1024,  # SO_RCVBUF untuk socket AF_PACKET (byte)
+    "tpacket_block_size": 1 << 22,    # Ukuran block ring TPACKET_V3 (byte, kelipatan page size)
+    "tpacket_block_count": 64,        # Jumlah block di ring (total memori = size * count)
+    "tpacket_frame_size": 2048,       # Ukuran frame nominal untuk tpacket_req3
+    "tpacket_block_timeout_ms": 100,  # Block diserahkan ke user setelah timeout walau belum penuh
+    "capture_restart_delay": 1,       # Jeda awal sebelum restart capture jika sniffer berhenti (detik)
+    "capture_restart_max_delay": 60,  # Batas backoff restart capture (detik)
+    "local_address_refresh_interval": 60,  # Refresh tabel alamat lokal jika tidak ada event netlink (detik)
+    "rate_max_tracked_ips": 10000,  # Jumlah maksimal source/destination IP di rate tracker (LRU)
+    "workers": 0,                   # Jumlah proses worker pemrosesan packet (0 = proses capture saja)
+    "worker_queue_size": 1024,      # Maksimum batch frame yang menunggu per worker
+    "worker_batch_size": 256,       # Frame per batch yang dikirim ke worker
+    "worker_stats_interval": 1.0,   # Interval ringkasan worker ke proses utama (detik)
+    "worker_send_timeout": 30,      # Batas tunggu antrian worker yang penuh saat backpressure (detik)
+    "worker_max_restarts": 5,       # Restart worker yang mati; setelah itu batch worker tersebut di-drop
     "log_interval": 60,   # Log interval in seconds
+    "write_queue_size": 10000,     # Maksimum record yang menunggu ditulis ke database
+    "write_batch_size": 500,       # Flush ketika batch mencapai ukuran ini
+    "write_flush_interval": 1.0,   # Flush paling lambat setiap N detik
+    "write_spool_size": 100000,    # Record yang ditahan di memori selama database dikunci (migrasi/proses lain)
+    "write_retry_delay": 0.5,      # Jeda awal coba ulang batch saat database dikunci (detik, backoff x2)
+    "write_retry_max_delay": 10,   # Batas backoff coba ulang (detik)
+    "flow_aggregation": True,      # Simpan satu baris per flow, bukan per packet
+    "flow_idle_timeout": 30,       # Flow ditutup jika tidak ada packet selama N detik
+    "flow_active_timeout": 300,    # Flow panjang di-export setiap N detik
+    "flow_table_max_flows": 100000,  # Batas memori flow table (flow terlama di-evict)
+    "bpf_filter": None,    # Ekspresi BPF manual (menggantikan filter yang disusun otomatis)
+    "bpf_include": [],     # Ekspresi BPF yang harus cocok, misalnya ["tcp", "udp port 53"]
+    "bpf_exclude": [],     # Ekspresi BPF yang dibuang di kernel, misalnya ["port 443"]
+}
+
+# Reverse DNS resolver configuration
+DNS_CONFIG = {
+    "resolver_workers": 4,   # Jumlah thread untuk PTR lookup
+    "cache_size": 10000,     # Maksimum entri cache (LRU)
+    "positive_ttl": 3600,    # TTL cache untuk lookup yang berhasil (detik)
+    "negative_ttl": 300,     # TTL cache untuk lookup yang gagal (detik)
+    "max_pending": 1000,     # Maksimum lookup yang sedang berjalan
+    "passive_dns": True,           # Pakai jawaban DNS yang terlihat di jaringan sebelum PTR lookup
+    "passive_cache_size": 50000,   # Maksimum entri IP -> domain (LRU)
+    "passive_min_ttl": 60,         # TTL minimum entri passive DNS (detik)
+    "passive_max_ttl": 86400,      # TTL maksimum entri passive DNS (detik)
+}
+
+# Geolocation configuration
+GEO_CONFIG = {
+    "mode": "online",        # "online" (ip-api.com) atau "offline" (file index lokal)
+    "index_path": BASE_DIR / "logs" / "geoip.idx",  # Dibuat dengan: python -m src.utils.geo_index build
+    "online_fallback": False,  # Mode offline: tanya ip-api.com jika IP tidak ada di index
 }
 
 # Web dashboard configuration
@@ -50,3 +117,47 @@ ALERT_THRESHOLDS = {
         "suspicious.com"
     ]
 }
+
+# Penyimpanan packet mentah (pcap side-file)
+RAW_CAPTURE_CONFIG = {
+    "mode": "off",                            # off, suspicious, all
+    "directory": BASE_DIR / "logs" / "raw",   # Lokasi file pcap
+    "max_file_size": 64 * 1024 * 1024,        # Rotasi file setelah ukuran ini (bytes)
+    "max_files": 10,                          # Jumlah file pcap yang disimpan
+    "header_bytes": 128,                      # Maksimum bytes header yang disimpan di database
+}
+
+# Sampling packet saat traffic tinggi
+SAMPLING_CONFIG = {
+    "mode": "off",            # off, deterministic (1-in-N), flow (hash 5-tuple), adaptive
+    "rate": 1,                # N awal / minimum (1 = semua packet)
+    "max_rate": 64,           # Batas N untuk mode adaptive
+    "high_watermark": 0.8,    # Beban di atas ini: N dikali dua
+    "low_watermark": 0.3,     # Beban di bawah ini: N dibagi dua
+}
+
+# Alert pipeline (deduplikasi dan penulisan batch)
+ALERT_CONFIG = {
+    "suppression_window": 300,   # Alert dengan dedup key sama digabung dalam window ini (detik)
+    "flush_interval": 1.0,       # Interval penulisan alert ke database (detik)
+    "max_active_keys": 10000,    # Maksimum dedup key yang dilacak di memori
+}
+
+# Instrumentasi latency per tahap pipeline
+METRICS_CONFIG = {
+    "enabled": False,            # Bisa di-toggle saat runtime (dashboard atau SIGUSR1)
+    "snapshot_path": BASE_DIR / "logs" / "metrics.json",  # Dibaca oleh main.py --stats
+    "snapshot_interval": 5,      # Interval penulisan snapshot saat metrics aktif (detik)
+}
+
+# Detection rules (dikompilasi sekali oleh RuleEngine)
+DETECTION_RULES = {
+    "suspicious_ports": [22, 23, 135, 139, 445, 1433, 3389, 5900],
+    "trusted_networks": [   # Tujuan di network ini tidak ditandai (kecuali port mencurigakan)
+        "192.168.0.0/16",
+        "10.0.0.0/8",
+    ],
+    "suspicious_networks": [],  # CIDR yang selalu ditandai mencurigakan
+    "rules_file": None,     # File JSON rule tambahan, di-reload otomatis saat berubah
+    "reload_interval": 5,   # Interval cek perubahan rules_file (detik)
+}
@@ -8,12 +8,13 @@ import argparse
 import logging
 import signal
 import time
+import json
 from pathlib import Path
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent / 'src'))
 
-from config.config import LOGGING_CONFIG, MONITORING_CONFIG
+from config.config import LOGGING_CONFIG, MONITORING_CONFIG, METRICS_CONFIG
 from src.monitor.network_monitor import NetworkMonitor
 from src.monitor.process_monitor import ProcessMonitor
 from src.database.db_manager import DatabaseManager
@@ -69,6 +70,39 @@ class NetworkMonitorApp:
         except Exception as e:
             self.logger.error(f"Error stopping monitoring: {e}")
     
+    def replay_pcap(self, pcap_file: str, speed: float = 0.0, interface: str = None):
+        """Replay file pcap/pcapng ke database lalu tampilkan throughput"""
+        try:
+            if not Path(pcap_file).is_file():
+                print(f"❌ File {pcap_file} tidak ditemukan")
+                return False
+            
+            self.network_monitor = NetworkMonitor(interface)
+            print(f"📼 Replaying {pcap_file} ({'max speed' if speed <= 0 else f'{speed}x'})")
+            
+            def show_progress(progress):
+                print(f"\r⏱️  {progress['packets']:,} packets in {progress['elapsed_seconds']:.0f}s", end="", flush=True)
+            
+            result = self.network_monitor.replay_pcap(pcap_file, speed, progress=show_progress)
+            
+            print("\n\n" + "="*50)
+            print("PCAP REPLAY COMPLETED")
+            print("="*50)
+            print(f"Packets: {result['packets']:,}")
+            print(f"Connections: {result['connections']:,}")
+            print(f"Data: {result['bytes'] / (1024 * 1024):.2f} MB")
+            print(f"Capture Duration: {result['capture_seconds']}s")
+            print(f"Replay Duration: {result['elapsed_seconds']}s")
+            print(f"Throughput: {result['packets_per_second']:,} packets/s")
+            print(f"Rows Written: {result['write_queue']['written']:,} (errors: {result['write_queue']['write_errors']})")
+            print("="*50)
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error replaying {pcap_file}: {e}")
+            print(f"❌ Error: {e}")
+            return False
+    
     def run_dashboard(self, host: str = "0.0.0.0", port: int = 5000):
         """Run web dashboard"""
         try:
@@ -225,9 +259,34 @@ class NetworkMonitorApp:
                 for alert in alerts:
                     print(f"- [{alert['severity']}] {alert['alert_type']}: {alert['message']}")
             
+            self.show_pipeline_metrics()
+            
         except Exception as e:
             self.logger.error(f"Error showing stats: {e}")
     
+    def show_pipeline_metrics(self):
+        """Tampilkan latency per tahap dari snapshot yang ditulis monitor yang sedang berjalan"""
+        snapshot_path = Path(METRICS_CONFIG['snapshot_path'])
+        if not snapshot_path.exists():
+            print("\nPIPELINE METRICS: no snapshot (enable with --metrics, SIGUSR1 or /api/internal/metrics)")
+            return
+        
+        metrics = json.loads(snapshot_path.read_text())
+        age = time.time() - metrics.get('written_at', 0)
+        print(f"\nPIPELINE METRICS (snapshot {age:.0f}s ago, {'enabled' if metrics['enabled'] else 'disabled'}):")
+        print(f"{'stage':<10} {'count':>10} {'mean_us':>10} {'p50_us':>10} {'p99_us':>10} {'p999_us':>10} {'max_us':>10}")
+        for stage, summary in metrics['stages'].items():
+            if summary['count']:
+                print(f"{stage:<10} {summary['count']:>10} {summary['mean_us']:>10} {summary['p50_us']:>10} "
+                      f"{summary['p99_us']:>10} {summary['p999_us']:>10} {summary['max_us']:>10}")
+        if metrics['counters']:
+            print("Counters: " + ", ".join(f"{name}={value}" for name, value in sorted(metrics['counters'].items())))
+    
+    def toggle_metrics(self, signum, frame):
+        """SIGUSR1: nyalakan/matikan instrumentasi pipeline tanpa restart"""
+        if self.network_monitor:
+            self.network_monitor.set_metrics_enabled(not self.network_monitor.metrics.enabled)
+    
     def signal_handler(self, signum, frame):
         """Handle shutdown signals"""
         self.logger.info("Received shutdown signal, stopping monitoring...")
@@ -244,8 +303,17 @@ def main():
     parser.add_argument('--monitor-only', '-m', action='store_true', help='Run monitoring only (no dashboard)')
     parser.add_argument('--app-monitor', '-a', type=str, help='Monitor specific application (e.g., discord, chrome, firefox)')
     parser.add_argument('--app-duration', type=int, default=300, help='Duration for app monitoring in seconds')
+    parser.add_argument('--pcap', type=str, help='Replay a pcap/pcapng file through the pipeline and exit')
+    parser.add_argument('--pcap-speed', type=float, default=0.0,
+                        help='Replay speed: 0 = as fast as possible, 1 = original timing, 2 = twice as fast')
+    parser.add_argument('--workers', type=int, help='Packet processing worker processes (0 = process in the capture process)')
+    parser.add_argument('--metrics', action='store_true', help='Enable per-stage pipeline latency metrics')
     
     args = parser.parse_args()
+    if args.workers is not None:
+        MONITORING_CONFIG['workers'] = args.workers
+    if args.metrics:
+        METRICS_CONFIG['enabled'] = True
     
     # Create app instance
     app_instance = NetworkMonitorApp()
@@ -253,6 +321,7 @@ def main():
     # Setup signal handlers
     signal.signal(signal.SIGINT, app_instance.signal_handler)
     signal.signal(signal.SIGTERM, app_instance.signal_handler)
+    signal.signal(signal.SIGUSR1, app_instance.toggle_metrics)
     
     try:
         if args.stats:
@@ -260,6 +329,12 @@ def main():
             app_instance.show_stats()
             return
         
+        if args.pcap:
+            # Replay file capture (backfill/benchmark)
+            if not app_instance.replay_pcap(args.pcap, args.pcap_speed, args.interface):
+                sys.exit(1)
+            return
+        
         if args.dashboard:
             # Run dashboard only
             app_instance.run_dashboard(args.host, args.port)
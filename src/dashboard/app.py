@@ -1,7 +1,8 @@
 """
 Web Dashboard untuk Network Monitor
 """
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, send_file
+import io
 import json
 from datetime import datetime, timedelta
 import logging
@@ -9,6 +10,10 @@ import logging
 from config.config import DASHBOARD_CONFIG
 from src.database.db_manager import DatabaseManager
 from src.monitor.network_monitor import NetworkMonitor
+from src.monitor.rate_tracker import RESOLUTIONS
+from src.monitor.raw_capture import pcap_bytes
+from src.monitor.packet_decoder import decode_frame
+from src.monitor.prometheus import CONTENT_TYPE, render_metrics
 
 app = Flask(__name__)
 app.secret_key = 'network_monitor_secret_key'
@@ -109,6 +114,135 @@ def get_network_info():
             'error': str(e)
         }), 500
 
+@app.route('/api/rates')
+def get_rates():
+    """API untuk mendapatkan laju koneksi (deret waktu dan top IP)"""
+    try:
+        resolution = request.args.get('resolution', 'minute')
+        if resolution not in RESOLUTIONS:
+            resolution = 'minute'
+        points = request.args.get('points', 60, type=int)
+        window = request.args.get('window', 300, type=int)
+        limit = request.args.get('limit', 10, type=int)
+        rates = network_monitor.rates
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'resolution': resolution,
+                'series': rates.series(resolution, points),
+                'summary': rates.get_stats(),
+                'top_sources': rates.top('source', limit, window),
+                'top_destinations': rates.top('destination', limit, window)
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/raw/<record_type>/<int:record_id>')
+def get_raw_packets(record_type, record_id):
+    """Download packet mentah (pcap) untuk satu baris packet atau flow"""
+    try:
+        if record_type not in ('packet', 'flow'):
+            return jsonify({'success': False, 'error': 'Unknown record type'}), 404
+        
+        record = db_manager.get_raw_record(record_type, record_id)
+        if not record or not record.get('raw_ref'):
+            return jsonify({'success': False, 'error': 'No raw capture for this record'}), 404
+        
+        if record_type == 'flow':
+            key = (record['source_ip'], record['dest_ip'], record['source_port'],
+                   record['dest_port'], record['protocol'])
+            
+            def match(data, linktype):
+                info = decode_frame(data, linktype)
+                return info is not None and (info.source_ip, info.dest_ip, info.source_port,
+                                             info.dest_port, info.protocol) == key
+            
+            linktype, packets = network_monitor.raw_capture.read(
+                record['raw_ref'], count=min(record['packets'] or 1, 10000), match=match,
+                until=record['last_seen']
+            )
+        else:
+            linktype, packets = network_monitor.raw_capture.read(record['raw_ref'])
+        
+        return send_file(
+            io.BytesIO(pcap_bytes(linktype, packets)),
+            mimetype='application/vnd.tcpdump.pcap',
+            as_attachment=True,
+            download_name=f'{record_type}-{record_id}.pcap'
+        )
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': 'Raw capture file has been rotated out'
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/internal/metrics', methods=['GET', 'POST'])
+def internal_metrics():
+    """Histogram latency per tahap pipeline; POST {"enabled": true/false} untuk toggle saat runtime"""
+    try:
+        if request.method == 'POST':
+            payload = request.get_json(silent=True) or {}
+            if 'enabled' in payload:
+                network_monitor.set_metrics_enabled(bool(payload['enabled']))
+        
+        return jsonify({
+            'success': True,
+            'data': network_monitor.get_pipeline_metrics()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Counter dan gauge in-memory dalam format Prometheus text exposition (tanpa query database)"""
+    try:
+        return Response(render_metrics(network_monitor), content_type=CONTENT_TYPE)
+    except Exception as e:
+        return Response(f'# error: {e}\n', status=500, content_type=CONTENT_TYPE)
+
+@app.route('/api/rules')
+def get_rules():
+    """API untuk mendapatkan statistik detection rules"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': network_monitor.get_rule_stats(top=100)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/rules/reload', methods=['POST'])
+def reload_rules():
+    """API untuk reload detection rules tanpa restart"""
+    try:
+        reloaded = network_monitor.rule_engine.reload()
+        
+        return jsonify({
+            'success': reloaded,
+            'data': network_monitor.get_rule_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/start-monitoring', methods=['POST'])
 def start_monitoring():
     """API untuk memulai monitoring"""
@@ -148,19 +282,8 @@ def get_connection_chart():
     """API untuk data chart koneksi per jam"""
     try:
         # Get connections for last 24 hours grouped by hour
-        import sqlite3
-        with sqlite3.connect(db_manager.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT strftime('%H', timestamp) as hour, COUNT(*) as count
-                FROM network_connections 
-                WHERE timestamp >= datetime('now', '-24 hours')
-                GROUP BY strftime('%H', timestamp)
-                ORDER BY hour
-            ''')
-            
-            data = cursor.fetchall()
-            
+        data = db_manager.get_hourly_connections(24)
+        
         # Format data for chart
         chart_data = []
         for hour, count in data:
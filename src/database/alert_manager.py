@@ -0,0 +1,175 @@
+"""
+Alert Manager - Deduplikasi dan penulisan batch untuk alert
+
+Alert dengan dedup key yang sama dalam suppression window digabung ke satu
+baris (first_seen, last_seen, count). Perubahan dikumpulkan di memori dan
+ditulis oleh thread background dalam satu transaksi per flush_interval,
+sehingga badai alert hanya menghasilkan O(1) write per window.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from config.config import ALERT_CONFIG
+
+def _format_time(timestamp: float) -> str:
+    """Format yang sama dengan CURRENT_TIMESTAMP SQLite (UTC)"""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class AlertManager:
+    def __init__(self, connections, suppression_window: float = None,
+                 flush_interval: float = None, max_active_keys: int = None):
+        # ConnectionManager milik DatabaseManager (alert ditulis lewat writer bersama)
+        self.connections = connections
+        self.logger = logging.getLogger(__name__)
+        self.suppression_window = suppression_window or ALERT_CONFIG['suppression_window']
+        self.flush_interval = flush_interval or ALERT_CONFIG['flush_interval']
+        self.max_active_keys = max_active_keys or ALERT_CONFIG['max_active_keys']
+        # dedup_key -> state alert yang sedang dalam suppression window
+        self.active: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._dirty: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.flush_thread = None
+
+        self.stats = {
+            'raised': 0,
+            'suppressed': 0,
+            'rows_inserted': 0,
+            'rows_updated': 0,
+            'flushes': 0,
+            'write_errors': 0,
+        }
+
+    def raise_alert(self, alert_type: str, message: str, severity: str = 'INFO',
+                    dedup_key: Optional[str] = None, timestamp: float = None) -> bool:
+        """
+        Catat alert. Return True jika membuka baris baru, False jika digabung
+        ke alert yang sama dalam suppression window.
+        """
+        now = timestamp or time.time()
+        key = dedup_key or f'{alert_type}:{message}'
+
+        with self._lock:
+            self.stats['raised'] += 1
+            state = self.active.get(key)
+            if state is not None and now < state['window_end']:
+                state['count'] += 1
+                state['last_seen'] = max(state['last_seen'], now)
+                state['message'] = message
+                self._dirty[id(state)] = state
+                self.active.move_to_end(key)
+                self.stats['suppressed'] += 1
+                return False
+
+            state = {
+                'row_id': None,
+                'dedup_key': key,
+                'alert_type': alert_type,
+                'message': message,
+                'severity': severity,
+                'first_seen': now,
+                'last_seen': now,
+                'count': 1,
+                'window_end': now + self.suppression_window,
+            }
+            self.active[key] = state
+            self.active.move_to_end(key)
+            self._dirty[id(state)] = state
+            self._evict(now)
+
+        self._ensure_thread()
+        return True
+
+    def _evict(self, now: float):
+        """Buang state yang window-nya sudah lewat atau melebihi batas key"""
+        # State yang belum ditulis tetap dipegang oleh _dirty sampai flush berikutnya
+        while self.active:
+            state = next(iter(self.active.values()))
+            if len(self.active) <= self.max_active_keys and state['window_end'] > now:
+                break
+            self.active.popitem(last=False)
+
+    def _ensure_thread(self):
+        if self.flush_thread and self.flush_thread.is_alive():
+            return
+        with self._lock:
+            if self.flush_thread and self.flush_thread.is_alive():
+                return
+            self._stop_event.clear()
+            self.flush_thread = threading.Thread(target=self._flush_loop, name='alert-writer')
+            self.flush_thread.daemon = True
+            self.flush_thread.start()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self) -> int:
+        """Tulis semua alert baru/berubah dalam satu transaksi"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            pending = [(state, state['count'], state['last_seen'], state['message'])
+                       for state in self._dirty.values()]
+            self._dirty = {}
+
+        inserted = updated = 0
+        try:
+            with self.connections.writer() as conn:
+                cursor = conn.cursor()
+                for state, count, last_seen, message in pending:
+                    if state['row_id'] is None:
+                        cursor.execute('''
+                            INSERT INTO alerts
+                            (timestamp, alert_type, message, severity, dedup_key, first_seen, last_seen, count)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ''', (
+                            _format_time(state['first_seen']),
+                            state['alert_type'],
+                            message,
+                            state['severity'],
+                            state['dedup_key'],
+                            _format_time(state['first_seen']),
+                            _format_time(last_seen),
+                            count
+                        ))
+                        state['row_id'] = cursor.lastrowid
+                        inserted += 1
+                    else:
+                        cursor.execute('''
+                            UPDATE alerts SET last_seen = ?, count = ?, message = ? WHERE id = ?
+                        ''', (_format_time(last_seen), count, message, state['row_id']))
+                        updated += 1
+        except Exception as e:
+            self.logger.error(f"Error writing {len(pending)} alerts: {e}")
+            self.stats['write_errors'] += 1
+            # Coba lagi pada flush berikutnya
+            with self._lock:
+                for state, _, _, _ in pending:
+                    self._dirty.setdefault(id(state), state)
+            return 0
+
+        self.stats['rows_inserted'] += inserted
+        self.stats['rows_updated'] += updated
+        self.stats['flushes'] += 1
+        return inserted + updated
+
+    def stop(self, timeout: float = 5):
+        """Hentikan thread flush setelah sisa alert ditulis"""
+        self._stop_event.set()
+        if self.flush_thread and self.flush_thread.is_alive():
+            self.flush_thread.join(timeout=timeout)
+        else:
+            self.flush()
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'active_keys': len(self.active),
+            'pending_writes': len(self._dirty),
+        }
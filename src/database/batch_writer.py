@@ -0,0 +1,207 @@
+"""
+Batch Writer - Antrian write-behind untuk insert database secara batch
+
+Jika database dikunci lebih lama dari busy_timeout (migrasi online, proses
+worker lain), batch tidak dibuang: batch disimpan di spool memori terbatas
+dan dicoba ulang dengan backoff, sementara antrian tetap dikuras. Selama
+spool berisi, batch baru langsung masuk spool agar urutan tulis terjaga.
+"""
+import queue
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+from config.config import MONITORING_CONFIG
+from src.database.connection import is_busy_error
+
+class BatchWriter:
+    def __init__(self, db_manager, max_queue_size: int = None,
+                 batch_size: int = None, flush_interval: float = None,
+                 block_when_full: bool = False, metrics=None, spool_size: int = None,
+                 retry_delay: float = None, retry_max_delay: float = None):
+        self.db_manager = db_manager
+        self.logger = logging.getLogger(__name__)
+        self.max_queue_size = max_queue_size or MONITORING_CONFIG['write_queue_size']
+        self.batch_size = batch_size or MONITORING_CONFIG['write_batch_size']
+        self.flush_interval = flush_interval or MONITORING_CONFIG['write_flush_interval']
+        self.queue = queue.Queue(maxsize=self.max_queue_size)
+        # Capture live drop record jika antrian penuh; replay offline menunggu writer (backpressure)
+        self.block_when_full = block_when_full
+        # PipelineMetrics opsional: durasi setiap batch dicatat sebagai tahap 'persist'
+        self.metrics = metrics
+        self.writer_thread = None
+        self._stop_event = threading.Event()
+        self.spool_size = spool_size or MONITORING_CONFIG['write_spool_size']
+        self.retry_delay = retry_delay or MONITORING_CONFIG['write_retry_delay']
+        self.retry_max_delay = retry_max_delay or MONITORING_CONFIG['write_retry_max_delay']
+        # Batch (kind, rows) yang menunggu database bisa ditulis lagi, terlama di depan
+        self._spool = deque()
+        self._spooled = 0
+        self._backoff = self.retry_delay
+        self._retry_at = 0.0
+
+        # Handler per jenis record, masing-masing menerima list of rows
+        self.handlers: Dict[str, Callable[[List], int]] = {
+            'connection': db_manager.insert_connections,
+        }
+
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'write_errors': 0,
+            'busy_retries': 0,
+            'spool_dropped': 0,
+        }
+
+    def register_handler(self, kind: str, handler: Callable[[List], int]):
+        """Daftarkan handler untuk jenis record baru"""
+        self.handlers[kind] = handler
+
+    def start(self):
+        """Mulai writer thread (idempotent)"""
+        if self.writer_thread and self.writer_thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self.writer_thread = threading.Thread(target=self._writer_loop, name='batch-writer')
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+    def stop(self, timeout: float = 5):
+        """Stop writer thread setelah sisa antrian di-flush"""
+        self._stop_event.set()
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.writer_thread.join(timeout=timeout)
+
+    def submit(self, kind: str, row) -> bool:
+        """Masukkan record ke antrian, drop jika antrian penuh (kecuali block_when_full)"""
+        try:
+            if self.block_when_full and self.writer_thread and self.writer_thread.is_alive():
+                self.queue.put((kind, row))
+            else:
+                self.queue.put_nowait((kind, row))
+            added = True
+        except queue.Full:
+            added = False
+        # submit dipanggil dari banyak thread (capture, expiry flow, resolver, alert):
+        # counter diperbarui di bawah lock antrian agar tidak ada update yang hilang
+        with self.queue.mutex:
+            self.stats['enqueued' if added else 'dropped'] += 1
+        return added
+
+    def _next_batch(self) -> List:
+        """Kumpulkan record sampai batch_size tercapai atau flush_interval habis"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _writer_loop(self):
+        """Loop writer: drain antrian dalam batch, coba ulang spool setelah backoff"""
+        while not self._stop_event.is_set() or not self.queue.empty():
+            batch = self._next_batch()
+            if batch:
+                self.flush(batch)
+            if self._spool and time.monotonic() >= self._retry_at:
+                self._retry_spool()
+
+        # Berhenti: satu percobaan terakhir untuk sisa spool
+        if self._spool and not self._retry_spool():
+            self.logger.error(f"Dropping {self._spooled} spooled records, database is still locked")
+            self.stats['spool_dropped'] += self._spooled
+            self._spool.clear()
+            self._spooled = 0
+
+    def flush(self, batch: List):
+        """Tulis satu batch, dikelompokkan per jenis record"""
+        metrics = self.metrics
+        timed = metrics is not None and metrics.enabled
+        if timed:
+            started = time.perf_counter_ns()
+        grouped: Dict[str, List] = {}
+        for kind, row in batch:
+            grouped.setdefault(kind, []).append(row)
+
+        for kind, rows in grouped.items():
+            # Database masih dikunci: langsung ke spool tanpa menunggu busy_timeout lagi
+            if self._spool or not self._write(kind, rows):
+                self._spool_rows(kind, rows)
+
+        if timed:
+            metrics.record_since('persist', started)
+        self.stats['batches'] += 1
+        self.stats['last_batch_size'] = len(batch)
+        self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+
+    def _write(self, kind: str, rows: List) -> bool:
+        """Tulis rows lewat handler; return False jika database dikunci (rows dicoba ulang)"""
+        handler = self.handlers.get(kind)
+        if handler is None:
+            self.logger.error(f"No batch handler registered for '{kind}'")
+            self.stats['write_errors'] += 1
+            return True
+        try:
+            written = handler(rows) or 0
+        except Exception as e:
+            if is_busy_error(e):
+                return False
+            self.logger.error(f"Error writing batch of {len(rows)} '{kind}' rows: {e}")
+            self.stats['write_errors'] += 1
+            return True
+        self.stats['written'] += written
+        if written < len(rows):
+            self.stats['write_errors'] += 1
+        return True
+
+    def _spool_rows(self, kind: str, rows: List):
+        """Simpan batch yang belum tertulis; drop jika spool penuh"""
+        if self._spooled + len(rows) > self.spool_size:
+            self.stats['spool_dropped'] += len(rows)
+            return
+        if not self._spool:
+            self.logger.warning("Database is locked, spooling writes until it is writable again")
+            self._backoff = self.retry_delay
+            self._retry_at = time.monotonic() + self._backoff
+        self._spool.append((kind, rows))
+        self._spooled += len(rows)
+
+    def _retry_spool(self) -> bool:
+        """Tulis ulang spool (terlama dulu); return False jika database masih dikunci"""
+        while self._spool:
+            kind, rows = self._spool[0]
+            self.stats['busy_retries'] += 1
+            if not self._write(kind, rows):
+                self._backoff = min(self._backoff * 2, self.retry_max_delay)
+                self._retry_at = time.monotonic() + self._backoff
+                return False
+            self._spool.popleft()
+            self._spooled -= len(rows)
+        self.logger.info("Database is writable again, spooled writes flushed")
+        return True
+
+    def get_stats(self) -> Dict:
+        """Dapatkan statistik antrian"""
+        with self.queue.mutex:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'queue_depth': self.queue.qsize(),
+            'spooled': self._spooled,
+            'queue_capacity': self.max_queue_size,
+            'is_running': bool(self.writer_thread and self.writer_thread.is_alive()),
+        }
@@ -0,0 +1,148 @@
+"""
+Connection Manager - Koneksi SQLite persisten untuk DatabaseManager
+
+- Satu koneksi writer yang hidup selama proses, dipakai bergantian (lock)
+  oleh batch writer, alert manager dan inisialisasi schema.
+- Pool koneksi reader read-only untuk query dashboard. Dengan journal WAL,
+  reader membaca snapshot terakhir tanpa menunggu writer dan tidak pernah
+  memblokir penulisan dari pipeline capture.
+
+Setiap koneksi menyimpan cache prepared statement (cached_statements),
+sehingga query yang sama tidak di-compile ulang di setiap pemanggilan.
+
+Pekerjaan write yang panjang (migrasi online) memakai koneksi tersendiri
+(dedicated), bukan writer bersama, agar lock writer proses ini tidak
+tertahan. Penulis lain yang melewati busy_timeout mendapat error "locked"
+(is_busy_error) dan mencoba ulang, bukan membuang data.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from config.config import DATABASE_CONFIG
+
+def is_busy_error(error: Exception) -> bool:
+    """Database dikunci koneksi lain lebih lama dari busy_timeout (transaksi boleh dicoba ulang)"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+class ConnectionManager:
+    def __init__(self, db_path, config: Dict = None):
+        self.db_path = db_path
+        self.config = {**DATABASE_CONFIG, **(config or {})}
+        self.logger = logging.getLogger(__name__)
+        self.journal_mode = None
+        self._writer = None
+        self._write_lock = threading.RLock()
+        # Reader idle (LIFO: koneksi yang baru dipakai masih hangat cache-nya)
+        self._readers = queue.LifoQueue(maxsize=self.config['reader_pool_size'])
+
+        self.stats = {
+            'write_transactions': 0,
+            'write_errors': 0,
+            'write_seconds': 0.0,
+            'write_wait_seconds': 0.0,
+            'reads': 0,
+            'readers_opened': 0,
+        }
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=self.config['busy_timeout_ms'] / 1000,
+            check_same_thread=False,
+            cached_statements=self.config['statement_cache_size'],
+        )
+        conn.execute(f"PRAGMA synchronous={self.config['synchronous']}")
+        conn.execute(f"PRAGMA cache_size={-int(self.config['cache_size_kb'])}")
+        conn.execute(f"PRAGMA mmap_size={int(self.config['mmap_size'])}")
+        conn.execute('PRAGMA temp_store=MEMORY')
+        if read_only:
+            conn.execute('PRAGMA query_only=1')
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def _open_writer(self) -> sqlite3.Connection:
+        conn = self._connect(read_only=False)
+        # Journal mode tersimpan di file database; cukup di-set oleh writer
+        self.journal_mode = conn.execute(f"PRAGMA journal_mode={self.config['journal_mode']}").fetchone()[0]
+        if self.journal_mode.lower() != self.config['journal_mode'].lower():
+            self.logger.warning(f"SQLite journal mode is {self.journal_mode}, "
+                                f"requested {self.config['journal_mode']}")
+        return conn
+
+    def dedicated(self) -> sqlite3.Connection:
+        """Koneksi write terpisah dari writer bersama; ditutup oleh pemanggil"""
+        return self._open_writer()
+
+    @contextmanager
+    def writer(self):
+        """Koneksi writer dalam satu transaksi (commit saat selesai, rollback jika error)"""
+        waited = time.perf_counter()
+        with self._write_lock:
+            started = time.perf_counter()
+            self.stats['write_wait_seconds'] += started - waited
+            if self._writer is None:
+                self._writer = self._open_writer()
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+                self.stats['write_transactions'] += 1
+            except Exception:
+                conn.rollback()
+                self.stats['write_errors'] += 1
+                raise
+            finally:
+                self.stats['write_seconds'] += time.perf_counter() - started
+
+    @contextmanager
+    def reader(self):
+        """Koneksi read-only dari pool (row_factory sqlite3.Row)"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._connect(read_only=True)
+            self.stats['readers_opened'] += 1
+        try:
+            yield conn
+            self.stats['reads'] += 1
+        finally:
+            # Akhiri snapshot baca agar checkpoint WAL tidak tertahan
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        """Tutup writer dan semua reader idle"""
+        with self._write_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.execute('PRAGMA optimize')
+                except sqlite3.Error:
+                    pass
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'write_seconds': round(self.stats['write_seconds'], 3),
+            'write_wait_seconds': round(self.stats['write_wait_seconds'], 3),
+            'journal_mode': self.journal_mode,
+            'idle_readers': self._readers.qsize(),
+        }
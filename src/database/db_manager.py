@@ -1,214 +1,555 @@
 """
 Database Manager untuk Network Monitor
 """
-import sqlite3
 import logging
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import List, Dict, Optional
 import json
 
-from config.config import DATABASE_PATH
+from config.config import DATABASE_CONFIG, DATABASE_PATH
+from src.database import migrations, partitions, rollups
+from src.database.alert_manager import AlertManager
+from src.database.connection import ConnectionManager, is_busy_error
+from src.database.stats_cache import StatsCache
+
+# Jumlah IP per query IN (...) di bawah batas parameter SQLite lama (999)
+PENDING_DOMAIN_CHUNK = 500
 
 class DatabaseManager:
     def __init__(self, db_path: str = None):
         self.db_path = db_path or DATABASE_PATH
         self.logger = logging.getLogger(__name__)
+        self.connections = ConnectionManager(self.db_path)
+        self.migration_thread = None
+        # Rollup ditulis setelah migrasi rollup diterapkan (bisa di background)
+        self.rollup_schema = 0
+        self.stats_cache = StatsCache(self.connections)
+        # Partisi harian yang ada (jenis, hari), dimuat ulang saat PRAGMA schema_version berubah
+        self.partition_schema = 0
+        self._partitions = set()
+        self._schema_cookie = None
+        # Thread maintenance (partisi, retensi, prune rollup) dimulai saat insert pertama
+        self.maintenance_thread = None
+        self._maintenance_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # Hari di luar masa simpan yang record-nya sudah pernah ditolak (warning sekali per hari)
+        self._expired_days = set()
+        self.stats = {'expired_rows': 0}
         self.init_database()
+        self.alert_manager = AlertManager(self.connections)
     
     def init_database(self):
-        """Initialize database dengan tabel yang diperlukan"""
+        """Initialize database: terapkan migrasi schema yang belum ada"""
         try:
             # Pastikan direktori logs ada
             self.db_path.parent.mkdir(parents=True, exist_ok=True)
             
-            with sqlite3.connect(self.db_path) as conn:
+            deferred = migrations.migrate(self.connections)
+            if deferred:
+                # Database besar: index dibangun di background, capture tetap berjalan
+                self.migration_thread = migrations.start_deferred(self.connections, deferred)
+            else:
+                self.maintain()
+            self.logger.info("Database initialized successfully")
+                
+        except Exception as e:
+            self.logger.error(f"Error initializing database: {e}")
+            raise
+    
+    def get_schema_version(self) -> int:
+        """Versi schema yang sudah diterapkan"""
+        with self.connections.reader() as conn:
+            return migrations.current_version(conn.cursor())
+    
+    def _refresh_partitions(self, cursor):
+        """Muat ulang cache partisi jika schema database berubah (partisi dibuat/dihapus koneksi lain)"""
+        cookie = cursor.execute('PRAGMA schema_version').fetchone()[0]
+        if cookie != self._schema_cookie:
+            self._partitions = {(kind, day) for kind, day, _ in partitions.list_partitions(cursor) if day}
+            self._schema_cookie = cookie
+    
+    def _partition_tables(self, conn, kind: str, days) -> Dict[str, str]:
+        """
+        Tabel tujuan per hari untuk satu batch. Harus dipanggil sebelum statement lain
+        di transaksi writer. Partisi hari ini dan besok sudah dibuat oleh maintenance;
+        partisi hari lain (misalnya replay pcap lama) dibuat di sini sebagai fallback.
+        """
+        cursor = conn.cursor()
+        if not conn.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        if self.partition_schema < migrations.PARTITION_VERSION:
+            self.partition_schema = migrations.current_version(cursor)
+            if self.partition_schema < migrations.PARTITION_VERSION:
+                # Migrasi partisi masih berjalan di background: tulis ke tabel lama
+                return {day: partitions.table_name(kind, None) for day in days}
+        
+        self._refresh_partitions(cursor)
+        missing = [day for day in days if (kind, day) not in self._partitions]
+        if missing:
+            for day in missing:
+                partitions.create(cursor, kind, day)
+            partitions.rebuild_view(cursor)
+            self._refresh_partitions(cursor)
+        return {day: partitions.table_name(kind, day) for day in days}
+    
+    def create_partitions(self, days: List[str]) -> List[str]:
+        """Buat partisi packet dan flow untuk hari-hari ini di transaksi sendiri (di luar insert)"""
+        try:
+            with self.connections.writer() as conn:
                 cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                created = [partitions.table_name(kind, day) for day in days for kind in partitions.KINDS
+                           if partitions.create(cursor, kind, day)]
+                if created:
+                    partitions.rebuild_view(cursor)
+            return created
                 
-                # Tabel untuk menyimpan log koneksi
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS network_connections (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        source_ip TEXT NOT NULL,
-                        dest_ip TEXT NOT NULL,
-                        dest_port INTEGER,
-                        protocol TEXT,
-                        dest_domain TEXT,
-                        packet_size INTEGER,
-                        connection_type TEXT,
-                        country TEXT,
-                        is_suspicious BOOLEAN DEFAULT 0,
-                        raw_data TEXT
-                    )
-                ''')
-                
-                # Tabel untuk statistik harian
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS daily_stats (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        date DATE UNIQUE,
-                        total_connections INTEGER DEFAULT 0,
-                        unique_domains INTEGER DEFAULT 0,
-                        total_data_mb REAL DEFAULT 0,
-                        suspicious_connections INTEGER DEFAULT 0,
-                        top_domains TEXT
-                    )
-                ''')
-                
-                # Tabel untuk alert
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS alerts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        alert_type TEXT NOT NULL,
-                        message TEXT NOT NULL,
-                        severity TEXT DEFAULT 'INFO',
-                        is_resolved BOOLEAN DEFAULT 0
-                    )
-                ''')
+        except Exception as e:
+            self.logger.error(f"Error creating partitions: {e}")
+            return []
+    
+    def apply_retention(self, keep_days: int = None, now: datetime = None) -> List[str]:
+        """Hapus partisi harian yang lewat masa simpan (DROP TABLE per hari, bukan DELETE baris)"""
+        keep_days = DATABASE_CONFIG['partition_keep_days'] if keep_days is None else keep_days
+        try:
+            with self.connections.writer() as conn:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                dropped = partitions.drop_expired(cursor, keep_days, now)
+                if dropped:
+                    partitions.rebuild_view(cursor)
+            if dropped:
+                self.logger.info(f"Dropped {len(dropped)} expired partitions: {', '.join(dropped)}")
+            return dropped
                 
-                conn.commit()
-                self.logger.info("Database initialized successfully")
+        except Exception as e:
+            self.logger.error(f"Error applying retention: {e}")
+            return []
+    
+    def prune_rollups(self, now: datetime = None):
+        """Hapus rollup menit/jam yang lewat masa simpan"""
+        try:
+            with self.connections.writer() as conn:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                if migrations.current_version(cursor) >= migrations.ROLLUP_VERSION:
+                    rollups.prune(cursor, now or datetime.now(timezone.utc))
                 
         except Exception as e:
-            self.logger.error(f"Error initializing database: {e}")
-            raise
+            self.logger.error(f"Error pruning rollups: {e}")
+    
+    def maintain(self, now: datetime = None):
+        """
+        Satu putaran maintenance, masing-masing di transaksi sendiri agar DDL dan
+        DELETE besar tidak ikut di transaksi insert: buat partisi hari ini dan besok,
+        hapus partisi kedaluwarsa, prune rollup.
+        """
+        now = now or datetime.now(timezone.utc)
+        self.create_partitions([partitions.today(now), partitions.today(now + timedelta(days=1))])
+        self.apply_retention(now=now)
+        self.prune_rollups(now)
+    
+    def _ensure_maintenance(self):
+        if self.maintenance_thread and self.maintenance_thread.is_alive():
+            return
+        with self._maintenance_lock:
+            if self.maintenance_thread and self.maintenance_thread.is_alive():
+                return
+            self._stop_event.clear()
+            self.maintenance_thread = threading.Thread(target=self._maintenance_loop, name='db-maintenance')
+            self.maintenance_thread.daemon = True
+            self.maintenance_thread.start()
+    
+    def _maintenance_loop(self):
+        while not self._stop_event.wait(DATABASE_CONFIG['maintenance_interval']):
+            self.maintain()
+    
+    def _retained(self, kind: str, records: List[Dict], now: str) -> List[Dict]:
+        """
+        Buang record yang harinya di luar partition_keep_days (misalnya replay pcap lama).
+        Partisinya akan langsung dihapus retensi berikutnya dan rollup menit/jam
+        tidak lagi menyimpan bucket-nya, jadi record ditolak dengan warning.
+        """
+        keep_days = DATABASE_CONFIG['partition_keep_days']
+        if not keep_days:
+            return records
+        cutoff = partitions.retention_cutoff(keep_days)
+        kept = []
+        expired = {}
+        for record in records:
+            day = partitions.partition_day(record.get('timestamp') or now)
+            if day >= cutoff:
+                kept.append(record)
+            else:
+                expired[day] = expired.get(day, 0) + 1
+        for day, count in sorted(expired.items()):
+            self.stats['expired_rows'] += count
+            if day not in self._expired_days:
+                self._expired_days.add(day)
+                self.logger.warning(f"Skipping {kind} records from {day}: older than partition_keep_days "
+                                    f"({keep_days} days) and would be dropped by retention; "
+                                    f"set partition_keep_days to 0 to keep old captures")
+        return kept
+    
+    def _update_rollups(self, cursor, batch: rollups.RollupBatch):
+        """Gabungkan agregat batch ke tabel rollup dalam transaksi writer yang sama"""
+        if self.rollup_schema < migrations.ROLLUP_SEQUENCE_VERSION:
+            self.rollup_schema = migrations.current_version(cursor)
+            if self.rollup_schema < migrations.ROLLUP_VERSION:
+                return
+        batch.write(cursor, sequenced=self.rollup_schema >= migrations.ROLLUP_SEQUENCE_VERSION)
+        self.stats_cache.invalidate()
+    
+    def _connection_row(self, connection_data: Dict, timestamp: str) -> tuple:
+        """Konversi dict koneksi ke tuple untuk INSERT"""
+        return (
+            timestamp,
+            connection_data.get('source_ip'),
+            connection_data.get('dest_ip'),
+            connection_data.get('dest_port'),
+            connection_data.get('protocol'),
+            connection_data.get('dest_domain'),
+            connection_data.get('packet_size'),
+            connection_data.get('connection_type'),
+            connection_data.get('country'),
+            connection_data.get('is_suspicious', False),
+            json.dumps(connection_data['raw_data']) if connection_data.get('raw_data') else None,
+            connection_data.get('sample_rate', 1),
+            connection_data.get('raw_headers'),
+            connection_data.get('raw_ref')
+        )
     
     def insert_connection(self, connection_data: Dict) -> bool:
         """Insert data koneksi baru ke database"""
+        return self.insert_connections([connection_data]) == 1
+    
+    def insert_connections(self, connections: List[Dict]) -> int:
+        """
+        Insert banyak koneksi sekaligus dalam satu transaksi.
+        sqlite3.OperationalError "locked" diteruskan agar pemanggil bisa mencoba ulang.
+        """
+        if not connections:
+            return 0
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            # Waktu insert diisi di sini (bukan default database) agar bucket rollup sama
+            now = rollups.utc_now()
+            connections = self._retained('packet', connections, now)
+            if not connections:
+                return 0
+            batch = rollups.RollupBatch()
+            rows = {}
+            for data in connections:
+                timestamp = data.get('timestamp') or now
+                rate = data.get('sample_rate') or 1
+                batch.add(timestamp, data.get('dest_domain'), rate, connections=rate, packets=rate,
+                          data_bytes=(data.get('packet_size') or 0) * rate,
+                          suspicious=rate if data.get('is_suspicious') else 0)
+                rows.setdefault(partitions.partition_day(timestamp), []).append(
+                    self._connection_row(data, timestamp))
+            
+            self._ensure_maintenance()
+            with self.connections.writer() as conn:
+                tables = self._partition_tables(conn, 'packet', rows)
                 cursor = conn.cursor()
                 
-                cursor.execute('''
-                    INSERT INTO network_connections 
-                    (source_ip, dest_ip, dest_port, protocol, dest_domain, 
-                     packet_size, connection_type, country, is_suspicious, raw_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    connection_data.get('source_ip'),
-                    connection_data.get('dest_ip'),
-                    connection_data.get('dest_port'),
-                    connection_data.get('protocol'),
-                    connection_data.get('dest_domain'),
-                    connection_data.get('packet_size'),
-                    connection_data.get('connection_type'),
-                    connection_data.get('country'),
-                    connection_data.get('is_suspicious', False),
-                    json.dumps(connection_data.get('raw_data', {}))
+                for day, day_rows in rows.items():
+                    cursor.executemany(f'''
+                        INSERT INTO {tables[day]} 
+                        (timestamp, source_ip, dest_ip, dest_port, protocol, dest_domain, 
+                         packet_size, connection_type, country, is_suspicious, raw_data, sample_rate,
+                         raw_headers, raw_ref)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', day_rows)
+                self._update_rollups(cursor, batch)
+                return len(connections)
+                
+        except Exception as e:
+            if is_busy_error(e):
+                # Database dikunci proses lain/migrasi: batch writer menyimpan dan mencoba ulang
+                raise
+            self.logger.error(f"Error inserting connections: {e}")
+            return 0
+    
+    def insert_flows(self, flows: List[Dict]) -> int:
+        """Insert flow record yang sudah selesai dalam satu transaksi"""
+        if not flows:
+            return 0
+        
+        try:
+            now = rollups.utc_now()
+            flows = self._retained('flow', flows, now)
+            if not flows:
+                return 0
+            batch = rollups.RollupBatch()
+            rows = {}
+            for flow in flows:
+                timestamp = flow.get('timestamp') or now
+                rate = flow.get('sample_rate') or 1
+                batch.add(timestamp, flow.get('dest_domain'), rate, connections=rate,
+                          packets=(flow.get('packets') or 0) * rate,
+                          data_bytes=(flow.get('bytes') or 0) * rate,
+                          suspicious=rate if flow.get('is_suspicious') else 0)
+                rows.setdefault(partitions.partition_day(timestamp), []).append((
+                    timestamp,
+                    flow.get('source_ip'),
+                    flow.get('dest_ip'),
+                    flow.get('source_port'),
+                    flow.get('dest_port'),
+                    flow.get('protocol'),
+                    flow.get('dest_domain'),
+                    flow.get('packets', 0),
+                    flow.get('bytes', 0),
+                    flow.get('first_seen'),
+                    flow.get('last_seen'),
+                    flow.get('tcp_flags', 0),
+                    flow.get('end_reason'),
+                    flow.get('connection_type'),
+                    flow.get('country'),
+                    flow.get('is_suspicious', False),
+                    flow.get('sample_rate', 1),
+                    flow.get('raw_headers'),
+                    flow.get('raw_ref')
                 ))
+            
+            self._ensure_maintenance()
+            with self.connections.writer() as conn:
+                tables = self._partition_tables(conn, 'flow', rows)
+                cursor = conn.cursor()
                 
-                conn.commit()
-                return True
+                for day, day_rows in rows.items():
+                    cursor.executemany(f'''
+                        INSERT INTO {tables[day]} 
+                        (timestamp, source_ip, dest_ip, source_port, dest_port, protocol,
+                         dest_domain, packets, bytes, first_seen, last_seen, tcp_flags,
+                         end_reason, connection_type, country, is_suspicious, sample_rate,
+                         raw_headers, raw_ref)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', day_rows)
+                self._update_rollups(cursor, batch)
+                return len(flows)
                 
         except Exception as e:
-            self.logger.error(f"Error inserting connection: {e}")
-            return False
+            if is_busy_error(e):
+                # Database dikunci proses lain/migrasi: batch writer menyimpan dan mencoba ulang
+                raise
+            self.logger.error(f"Error inserting flows: {e}")
+            return 0
     
-    def get_recent_connections(self, limit: int = 100) -> List[Dict]:
-        """Ambil koneksi terbaru"""
+    def update_pending_domains(self, resolved: List[tuple]) -> int:
+        """Isi dest_domain yang masih kosong dari hasil reverse DNS (ip, domain, is_suspicious)"""
+        if not resolved:
+            return 0
+        
+        try:
+            batch = rollups.RollupBatch()
+            # IP pertama yang menang jika sama; baris yang sudah terisi tidak disentuh lagi
+            by_ip = {}
+            for ip, domain, is_suspicious in resolved:
+                by_ip.setdefault(ip, (domain, bool(is_suspicious)))
+            ips = list(by_ip)
+            # Reverse DNS selesai beberapa detik setelah insert: cukup partisi kemarin dan hari ini
+            since = partitions.today(datetime.now(timezone.utc) - timedelta(days=1))
+            with self.connections.writer() as conn:
+                cursor = conn.cursor()
+                tables = [table for _, day, table in partitions.list_partitions(cursor)
+                          if day is None or day >= since]
+                
+                for table in tables:
+                    # Baris yang akan diperbarui dibaca dulu (dalam transaksi yang sama) untuk
+                    # delta rollup: domain baru, dan suspicious untuk baris yang belum ditandai
+                    pending = set()
+                    for offset in range(0, len(ips), PENDING_DOMAIN_CHUNK):
+                        chunk = ips[offset:offset + PENDING_DOMAIN_CHUNK]
+                        cursor.execute(f'''
+                            SELECT dest_ip, MAX(timestamp), SUM(sample_rate), is_suspicious FROM {table}
+                            WHERE dest_ip IN ({', '.join('?' * len(chunk))}) AND dest_domain IS NULL
+                            GROUP BY dest_ip, substr(timestamp, 1, 16), is_suspicious
+                        ''', chunk)
+                        for ip, timestamp, rate, was_suspicious in cursor.fetchall():
+                            pending.add(ip)
+                            if not timestamp:
+                                continue
+                            domain, is_suspicious = by_ip[ip]
+                            rate = rate or 1
+                            batch.add(timestamp, domain, rate,
+                                      suspicious=rate if is_suspicious and not was_suspicious else 0)
+                    
+                    if pending:
+                        cursor.executemany(f'''
+                            UPDATE {table} SET dest_domain = ?, is_suspicious = (is_suspicious OR ?)
+                            WHERE dest_ip = ? AND dest_domain IS NULL
+                        ''', [(by_ip[ip][0], by_ip[ip][1], ip) for ip in pending])
+                self._update_rollups(cursor, batch)
+                return len(resolved)
+                
+        except Exception as e:
+            if is_busy_error(e):
+                # Database dikunci proses lain/migrasi: batch writer menyimpan dan mencoba ulang
+                raise
+            self.logger.error(f"Error updating pending domains: {e}")
+            return 0
+    
+    def save_passive_dns(self, entries: List[tuple]) -> int:
+        """Simpan entri passive DNS (ip, domain, expires_at), entri lama per IP ditimpa"""
+        if not entries:
+            return 0
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.connections.writer() as conn:
                 cursor = conn.cursor()
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO passive_dns (ip, domain, expires_at) VALUES (?, ?, ?)
+                ''', entries)
+                return len(entries)
                 
+        except Exception as e:
+            if is_busy_error(e):
+                # Database dikunci proses lain/migrasi: batch writer menyimpan dan mencoba ulang
+                raise
+            self.logger.error(f"Error saving passive DNS entries: {e}")
+            return 0
+    
+    def load_passive_dns(self, now: float, limit: int) -> List[tuple]:
+        """Hapus entri passive DNS yang kedaluwarsa, return sisanya (terlama dulu)"""
+        try:
+            with self.connections.writer() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM passive_dns WHERE expires_at <= ?', (now,))
                 cursor.execute('''
-                    SELECT * FROM network_connections 
-                    ORDER BY timestamp DESC 
-                    LIMIT ?
+                    SELECT ip, domain, expires_at FROM (
+                        SELECT ip, domain, expires_at FROM passive_dns
+                        ORDER BY expires_at DESC LIMIT ?
+                    ) ORDER BY expires_at
                 ''', (limit,))
-                
-                return [dict(row) for row in cursor.fetchall()]
+                return cursor.fetchall()
                 
         except Exception as e:
-            self.logger.error(f"Error getting recent connections: {e}")
+            self.logger.error(f"Error loading passive DNS entries: {e}")
             return []
     
-    def get_top_domains(self, limit: int = 10) -> List[Dict]:
-        """Ambil domain yang paling sering diakses"""
+    def get_recent_connections(self, limit: int = 100) -> List[Dict]:
+        """Ambil koneksi terbaru"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.connections.reader() as conn:
                 cursor = conn.cursor()
                 
-                cursor.execute('''
-                    SELECT dest_domain, COUNT(*) as access_count,
-                           MAX(timestamp) as last_access
-                    FROM network_connections 
-                    WHERE dest_domain IS NOT NULL AND dest_domain != ''
-                    GROUP BY dest_domain
-                    ORDER BY access_count DESC
-                    LIMIT ?
-                ''', (limit,))
+                # Partisi dibaca dari hari terbaru (index timestamp masing-masing);
+                # berhenti setelah cukup baris karena hari sebelumnya pasti lebih lama
+                rows = []
+                for day, tables in partitions.group_by_day(partitions.list_partitions(cursor)):
+                    for kind, table in tables:
+                        cursor.execute(f'''
+                            SELECT {partitions.PROJECTIONS[kind]} FROM {table}
+                            ORDER BY timestamp DESC
+                            LIMIT ?
+                        ''', (limit,))
+                        rows.extend(dict(row) for row in cursor.fetchall())
+                    if len(rows) >= limit:
+                        break
                 
-                return [dict(row) for row in cursor.fetchall()]
+                rows.sort(key=lambda row: row['timestamp'] or '', reverse=True)
+                return rows[:limit]
                 
         except Exception as e:
-            self.logger.error(f"Error getting top domains: {e}")
+            self.logger.error(f"Error getting recent connections: {e}")
             return []
     
-    def get_connection_stats(self, hours: int = 24) -> Dict:
-        """Ambil statistik koneksi dalam beberapa jam terakhir"""
+    def get_raw_record(self, record_type: str, record_id: int) -> Optional[Dict]:
+        """Ambil referensi raw capture untuk satu baris packet atau flow"""
+        # Partisi dihitung langsung dari ID (offset hari)
+        kind = 'flow' if record_type == 'flow' else 'packet'
+        table = partitions.table_name(kind, partitions.day_of_id(record_id))
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connections.reader() as conn:
                 cursor = conn.cursor()
                 
-                # Total koneksi
-                cursor.execute('''
-                    SELECT COUNT(*) FROM network_connections 
-                    WHERE timestamp >= datetime('now', '-{} hours')
-                '''.format(hours))
-                total_connections = cursor.fetchone()[0]
+                if not partitions.exists(cursor, table):
+                    # Partisi sudah dihapus oleh retensi
+                    return None
+                cursor.execute(f'SELECT * FROM {table} WHERE id = ?', (record_id,))
+                row = cursor.fetchone()
+                return dict(row) if row else None
                 
-                # Koneksi mencurigakan
-                cursor.execute('''
-                    SELECT COUNT(*) FROM network_connections 
-                    WHERE timestamp >= datetime('now', '-{} hours') 
-                    AND is_suspicious = 1
-                '''.format(hours))
-                suspicious_connections = cursor.fetchone()[0]
+        except Exception as e:
+            self.logger.error(f"Error getting raw record: {e}")
+            return None
+    
+    def get_top_domains(self, limit: int = 10) -> List[Dict]:
+        """Ambil domain yang paling sering diakses (gabungan top domain rollup harian dalam masa simpan)"""
+        try:
+            with self.connections.reader() as conn:
+                cursor = conn.cursor()
                 
-                # Domain unik
-                cursor.execute('''
-                    SELECT COUNT(DISTINCT dest_domain) FROM network_connections 
-                    WHERE timestamp >= datetime('now', '-{} hours')
-                    AND dest_domain IS NOT NULL AND dest_domain != ''
-                '''.format(hours))
-                unique_domains = cursor.fetchone()[0]
+                # Hanya hari di dalam masa simpan data (partisi, atau rollup jam jika disimpan selamanya)
+                keep_days = DATABASE_CONFIG['partition_keep_days'] or DATABASE_CONFIG['rollup_hour_retention_days']
+                since = (datetime.now(timezone.utc) - timedelta(days=keep_days - 1)).strftime('%Y-%m-%d')
+                domains = {}
+                cursor.execute('SELECT top_domains FROM daily_stats WHERE date >= ? AND top_domains IS NOT NULL',
+                               (since,))
+                for row in cursor.fetchall():
+                    rollups.merge_top_domains(domains, json.loads(row['top_domains']))
                 
-                # Total data
-                cursor.execute('''
-                    SELECT SUM(packet_size) FROM network_connections 
-                    WHERE timestamp >= datetime('now', '-{} hours')
-                '''.format(hours))
-                total_data = cursor.fetchone()[0] or 0
+                return [
+                    {'dest_domain': domain, 'access_count': hits, 'last_access': last_access}
+                    for domain, (hits, last_access) in rollups.top_domains(domains, limit)
+                ]
                 
-                return {
-                    'total_connections': total_connections,
-                    'suspicious_connections': suspicious_connections,
-                    'unique_domains': unique_domains,
-                    'total_data_mb': round(total_data / (1024 * 1024), 2)
-                }
+        except Exception as e:
+            self.logger.error(f"Error getting top domains: {e}")
+            return []
+    
+    def get_connection_stats(self, hours: int = 24) -> Dict:
+        """Ambil statistik koneksi dalam beberapa jam terakhir (dari rollup, di-cache per window)"""
+        try:
+            if not self._rollups_ready():
+                return self._raw_connection_stats(hours)
+            return self.stats_cache.get(hours)
                 
         except Exception as e:
             self.logger.error(f"Error getting connection stats: {e}")
             return {}
     
-    def insert_alert(self, alert_type: str, message: str, severity: str = 'INFO') -> bool:
-        """Insert alert baru"""
+    def _rollups_ready(self) -> bool:
+        """Migrasi rollup selesai; sebelumnya rollup belum lengkap dan statistik dihitung dari baris mentah"""
+        if self.rollup_schema < migrations.ROLLUP_SEQUENCE_VERSION:
+            with self.connections.reader() as conn:
+                self.rollup_schema = migrations.current_version(conn.cursor())
+        return self.rollup_schema >= migrations.ROLLUP_SEQUENCE_VERSION
+    
+    def _raw_connection_stats(self, hours: int) -> Dict:
+        """Statistik window langsung dari connection_log (selama migrasi rollup berjalan)"""
+        since = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime(rollups.TIME_FORMAT)
+        with self.connections.reader() as conn:
+            row = conn.execute('''
+                SELECT COALESCE(SUM(sample_rate), 0),
+                       COALESCE(SUM(CASE WHEN is_suspicious THEN sample_rate ELSE 0 END), 0),
+                       COUNT(DISTINCT dest_domain),
+                       COALESCE(SUM(packet_size), 0),
+                       COALESCE(SUM(packet_count), 0)
+                FROM connection_log WHERE timestamp >= ?
+            ''', (since,)).fetchone()
+        return {
+            'total_connections': row[0],
+            'suspicious_connections': row[1],
+            'unique_domains': row[2],
+            'total_data_mb': round(row[3] / (1024 * 1024), 2),
+            'total_packets': row[4]
+        }
+    
+    def insert_alert(self, alert_type: str, message: str, severity: str = 'INFO',
+                     dedup_key: str = None, timestamp: float = None) -> bool:
+        """
+        Catat alert lewat AlertManager (deduplikasi + tulis batch di background).
+        
+        Alert dengan dedup_key sama (default: tipe + pesan) dalam suppression
+        window hanya menambah count dan last_seen pada baris yang sudah ada.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO alerts (alert_type, message, severity)
-                    VALUES (?, ?, ?)
-                ''', (alert_type, message, severity))
-                
-                conn.commit()
-                return True
-                
+            self.alert_manager.raise_alert(alert_type, message, severity, dedup_key, timestamp)
+            return True
         except Exception as e:
             self.logger.error(f"Error inserting alert: {e}")
             return False
@@ -216,13 +557,12 @@ class DatabaseManager:
     def get_recent_alerts(self, limit: int = 50) -> List[Dict]:
         """Ambil alert terbaru"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.connections.reader() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
                     SELECT * FROM alerts 
-                    ORDER BY timestamp DESC 
+                    ORDER BY COALESCE(last_seen, timestamp) DESC 
                     LIMIT ?
                 ''', (limit,))
                 
@@ -231,3 +571,42 @@ class DatabaseManager:
         except Exception as e:
             self.logger.error(f"Error getting recent alerts: {e}")
             return []
+    
+    def get_hourly_connections(self, hours: int = 24) -> List[tuple]:
+        """Jumlah koneksi per jam (jam, estimasi koneksi) untuk chart dashboard"""
+        try:
+            since = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime(rollups.TIME_FORMAT)
+            if not self._rollups_ready():
+                with self.connections.reader() as conn:
+                    return [tuple(row) for row in conn.execute('''
+                        SELECT substr(timestamp, 12, 2) AS hour, SUM(sample_rate) FROM connection_log
+                        WHERE timestamp >= ? GROUP BY hour ORDER BY hour
+                    ''', (since,))]
+            with self.connections.reader() as conn:
+                rows = rollups.window(conn.cursor(), since, 'bucket, total_connections')
+            
+            counts = {}
+            for row in rows:
+                hour = row['bucket'][11:13]
+                counts[hour] = counts.get(hour, 0) + row['total_connections']
+            return sorted(counts.items())
+                
+        except Exception as e:
+            self.logger.error(f"Error getting hourly connections: {e}")
+            return []
+    
+    def get_stats(self) -> Dict:
+        """Statistik koneksi database (transaksi writer, waktu tunggu lock, reader) dan cache statistik"""
+        return {
+            **self.connections.get_stats(),
+            **self.stats,
+            **{f'stats_cache_{key}': value for key, value in self.stats_cache.get_stats().items()},
+        }
+    
+    def close(self):
+        """Hentikan maintenance, tulis sisa alert lalu tutup semua koneksi"""
+        self._stop_event.set()
+        if self.maintenance_thread and self.maintenance_thread.is_alive():
+            self.maintenance_thread.join(timeout=5)
+        self.alert_manager.stop()
+        self.connections.close()
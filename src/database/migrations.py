@@ -0,0 +1,402 @@
+"""
+Schema Migrations - Versi schema database dan migrasi berurutan
+
+Setiap migrasi punya nomor versi; versi yang sudah diterapkan dicatat di
+tabel schema_version. Database lama (tanpa schema_version) dimulai dari
+versi 0: migrasi awal memakai CREATE ... IF NOT EXISTS dan menambah kolom
+yang belum ada, sehingga aman dijalankan ulang pada schema yang sudah ada.
+
+Migrasi "online" (pembuatan index, pengisian ulang data) pada tabel besar
+dijalankan di thread background dengan koneksi sendiri. Migrasi online boleh
+berupa generator: setiap yield adalah batas transaksi, sehingga lock write
+database dilepas di antara langkah (misalnya satu index per transaksi) dan
+batch writer serta worker tetap bisa menulis. Dijalankan langsung (database
+kecil), semua langkah masuk satu transaksi.
+
+Besar-kecilnya ditentukan per migrasi dari tabel yang disentuhnya; migrasi
+yang tabelnya beririsan dengan migrasi yang ditunda ikut ditunda agar urutan
+tetap terjaga. Versi yang diterapkan dicatat per versi, dan versi schema
+adalah versi tertinggi yang semua versi sebelumnya sudah diterapkan.
+"""
+import inspect
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from config.config import DATABASE_CONFIG
+from src.database import partitions, rollups
+from src.database.connection import is_busy_error
+
+logger = logging.getLogger(__name__)
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable
+    online: bool = False   # Boleh ditunda ke background jika tabelnya besar
+    # Tabel dasar yang disentuh (partisi harian packet/flow ikut dihitung)
+    tables: Tuple[str, ...] = ()
+
+def ensure_columns(cursor, table: str, columns: Dict[str, str]):
+    """Tambahkan kolom yang belum ada ke tabel yang sudah terlanjur dibuat"""
+    existing = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+def _base_schema(cursor):
+    # Tabel untuk menyimpan log koneksi
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS network_connections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            source_ip TEXT NOT NULL,
+            dest_ip TEXT NOT NULL,
+            dest_port INTEGER,
+            protocol TEXT,
+            dest_domain TEXT,
+            packet_size INTEGER,
+            connection_type TEXT,
+            country TEXT,
+            is_suspicious BOOLEAN DEFAULT 0,
+            raw_data TEXT,
+            sample_rate INTEGER DEFAULT 1,
+            raw_headers BLOB,
+            raw_ref TEXT
+        )
+    ''')
+
+    # Tabel untuk flow (satu baris per 5-tuple flow)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS flows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            source_ip TEXT NOT NULL,
+            dest_ip TEXT NOT NULL,
+            source_port INTEGER,
+            dest_port INTEGER,
+            protocol TEXT,
+            dest_domain TEXT,
+            packets INTEGER DEFAULT 0,
+            bytes INTEGER DEFAULT 0,
+            first_seen REAL,
+            last_seen REAL,
+            tcp_flags INTEGER DEFAULT 0,
+            end_reason TEXT,
+            connection_type TEXT,
+            country TEXT,
+            is_suspicious BOOLEAN DEFAULT 0,
+            sample_rate INTEGER DEFAULT 1,
+            raw_headers BLOB,
+            raw_ref TEXT
+        )
+    ''')
+
+    # Database lama: kolom sample_rate (1 = tidak di-sampling) dan raw capture
+    for table in ('network_connections', 'flows'):
+        ensure_columns(cursor, table, {
+            'sample_rate': 'INTEGER DEFAULT 1',
+            'raw_headers': 'BLOB',
+            'raw_ref': 'TEXT',
+        })
+
+    # View gabungan packet dan flow untuk query dashboard.
+    # packet_size dan packet_count sudah diskalakan dengan sample_rate;
+    # jumlah koneksi diestimasi dengan SUM(sample_rate) bukan COUNT(*)
+    cursor.execute('DROP VIEW IF EXISTS connection_log')
+    cursor.execute('''
+        CREATE VIEW connection_log AS
+        SELECT id, timestamp, source_ip, dest_ip, dest_port, protocol,
+               dest_domain, packet_size * sample_rate AS packet_size,
+               sample_rate AS packet_count,
+               connection_type, country, is_suspicious,
+               'packet' AS record_type, sample_rate,
+               raw_ref IS NOT NULL AS has_raw
+        FROM network_connections
+        UNION ALL
+        SELECT id, timestamp, source_ip, dest_ip, dest_port, protocol,
+               dest_domain, bytes * sample_rate AS packet_size,
+               packets * sample_rate AS packet_count,
+               connection_type, country, is_suspicious,
+               'flow' AS record_type, sample_rate,
+               raw_ref IS NOT NULL AS has_raw
+        FROM flows
+    ''')
+
+    # Tabel untuk statistik harian
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE UNIQUE,
+            total_connections INTEGER DEFAULT 0,
+            unique_domains INTEGER DEFAULT 0,
+            total_data_mb REAL DEFAULT 0,
+            suspicious_connections INTEGER DEFAULT 0,
+            top_domains TEXT
+        )
+    ''')
+
+    # Tabel untuk alert
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            alert_type TEXT NOT NULL,
+            message TEXT NOT NULL,
+            severity TEXT DEFAULT 'INFO',
+            is_resolved BOOLEAN DEFAULT 0,
+            dedup_key TEXT,
+            first_seen DATETIME,
+            last_seen DATETIME,
+            count INTEGER DEFAULT 1
+        )
+    ''')
+
+def _alert_dedup_columns(cursor):
+    # Database lama: tambahkan kolom deduplikasi alert
+    ensure_columns(cursor, 'alerts', {
+        'dedup_key': 'TEXT',
+        'first_seen': 'DATETIME',
+        'last_seen': 'DATETIME',
+        'count': 'INTEGER DEFAULT 1',
+    })
+
+def _passive_dns_table(cursor):
+    # Peta passive DNS (IP -> domain dari jawaban DNS), bertahan saat restart
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS passive_dns (
+            ip TEXT PRIMARY KEY,
+            domain TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+
+def _connection_indexes(cursor):
+    # Index yang sama untuk tabel packet dan flow (kedua sisi view connection_log).
+    # sample_rate ikut di index agar SUM(sample_rate) per window/domain tidak membaca tabel
+    # Satu index per transaksi (yield) saat dijalankan di background
+    for table, prefix in (('network_connections', 'connections'), ('flows', 'flows')):
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{prefix}_timestamp ON {table} (timestamp)')
+        yield
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{prefix}_domain_time '
+                       f'ON {table} (dest_domain, timestamp, sample_rate)')
+        yield
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{prefix}_suspicious_time '
+                       f'ON {table} (is_suspicious, timestamp, sample_rate)')
+        yield
+        # Hanya baris yang domain-nya masih menunggu reverse DNS (update_pending_domains)
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{prefix}_pending_domain '
+                       f'ON {table} (dest_ip) WHERE dest_domain IS NULL')
+
+def _alert_indexes(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp)')
+    yield
+    # Urutan get_recent_alerts
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_recent ON alerts (COALESCE(last_seen, timestamp))')
+
+def _rollup_tables(cursor):
+    # Rollup menit/jam dan kolom tambahan daily_stats (rollup harian)
+    rollups.create_tables(cursor)
+    ensure_columns(cursor, 'daily_stats', {
+        'total_packets': 'INTEGER DEFAULT 0',
+        'total_bytes': 'INTEGER DEFAULT 0',
+        'domains_sketch': 'BLOB',
+    })
+    yield
+    # Isi dari baris yang sudah ada, satu hari per transaksi; penulisan baru baru
+    # memperbarui rollup setelah versi ini tercatat
+    yield from rollups.rebuild(cursor)
+
+def _rollup_sequence(cursor):
+    # Nomor urut perubahan rollup: cache statistik hanya membaca ulang bucket yang berubah
+    for table in ('rollup_minute', 'rollup_hour', 'daily_stats'):
+        ensure_columns(cursor, table, {'seq': 'INTEGER DEFAULT 0'})
+    for table in ('rollup_minute', 'rollup_hour'):
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_seq ON {table} (seq)')
+
+def _daily_partitions(cursor):
+    # Packet dan flow disimpan per hari (retensi = DROP TABLE partisi lama);
+    # baris lama dipindah ke partisi harinya per potongan, tabel tanpa partisi dihapus
+    yield from partitions.migrate_legacy(cursor, DATABASE_CONFIG['partition_migration_chunk'])
+
+CONNECTION_TABLES = ('network_connections', 'flows')
+ROLLUP_TABLES = ('rollup_minute', 'rollup_hour', 'daily_stats')
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'base schema', _base_schema,
+              tables=CONNECTION_TABLES + ('daily_stats', 'alerts')),
+    Migration(2, 'alert deduplication columns', _alert_dedup_columns, tables=('alerts',)),
+    Migration(3, 'passive DNS table', _passive_dns_table, tables=('passive_dns',)),
+    Migration(4, 'connection and flow indexes', _connection_indexes, online=True,
+              tables=CONNECTION_TABLES),
+    Migration(5, 'alert indexes', _alert_indexes, online=True, tables=('alerts',)),
+    Migration(6, 'connection rollups', _rollup_tables, online=True,
+              tables=CONNECTION_TABLES + ROLLUP_TABLES),
+    Migration(7, 'rollup change sequence', _rollup_sequence, tables=ROLLUP_TABLES),
+    Migration(8, 'daily partitions for packets and flows', _daily_partitions, online=True,
+              tables=CONNECTION_TABLES),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+ROLLUP_VERSION = 6
+ROLLUP_SEQUENCE_VERSION = 7
+PARTITION_VERSION = 8
+
+def _ensure_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def applied_versions(cursor) -> Set[int]:
+    """Versi yang sudah diterapkan (tidak membuat tabel, aman untuk koneksi reader)"""
+    try:
+        return {row[0] for row in cursor.execute('SELECT version FROM schema_version')}
+    except sqlite3.OperationalError:
+        return set()
+
+def current_version(cursor) -> int:
+    """Versi tertinggi yang semua versi sebelumnya sudah diterapkan"""
+    applied = applied_versions(cursor)
+    version = 0
+    while version + 1 in applied:
+        version += 1
+    return version
+
+def _table_rows(cursor, tables: Iterable[str]) -> int:
+    """Perkiraan jumlah baris terbesar di antara tabel (MAX(rowid) memakai B-tree, tanpa scan)"""
+    tables = set(tables)
+    # ID partisi harian dimulai dari offset hari (partitions.id_base)
+    found = [(table, partitions.id_base(day) if day else 0)
+             for kind, day, table in partitions.list_partitions(cursor) if partitions.KINDS[kind] in tables]
+    found += [(table, 0) for table in sorted(tables - set(partitions.KINDS.values()))
+              if partitions.exists(cursor, table)]
+    rows = 0
+    for table, base in found:
+        rows = max(rows, cursor.execute(f'SELECT COALESCE(MAX(rowid), ?) FROM {table}', (base,)).fetchone()[0] - base)
+    return rows
+
+def _plan(cursor, pending: List[Migration]) -> Tuple[List[Migration], List[Migration]]:
+    """Bagi migrasi menjadi (diterapkan sekarang, ditunda ke background)"""
+    now, deferred = [], []
+    blocked = set()
+    for migration in pending:
+        tables = set(migration.tables)
+        if tables & blocked or (migration.online and
+                                _table_rows(cursor, tables) > DATABASE_CONFIG['online_migration_rows']):
+            # Migrasi berikutnya atas tabel yang sama menunggu migrasi ini selesai
+            deferred.append(migration)
+            blocked |= tables
+        else:
+            now.append(migration)
+    return now, deferred
+
+def _steps(cursor, migration: Migration):
+    """Langkah migrasi; migrasi biasa (bukan generator) adalah satu langkah"""
+    result = migration.apply(cursor)
+    if inspect.isgenerator(result):
+        yield from result
+
+def _record(cursor, migration: Migration, started: float):
+    cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                   (migration.version, migration.description))
+    logger.info(f"Applied schema migration {migration.version} ({migration.description}) "
+                f"in {time.monotonic() - started:.2f}s")
+
+def _apply(cursor, migration: Migration):
+    """Terapkan semua langkah migrasi dalam transaksi pemanggil"""
+    started = time.monotonic()
+    for _ in _steps(cursor, migration):
+        pass
+    _record(cursor, migration, started)
+
+def _begin(cursor):
+    """BEGIN IMMEDIATE, menunggu selama proses lain memegang lock write"""
+    while True:
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            return
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e):
+                raise
+            logger.info("Database is locked by another writer, waiting to run schema migrations")
+
+def migrate(connections, migrations: List[Migration] = None) -> List[Migration]:
+    """
+    Terapkan migrasi yang belum ada. Return migrasi yang ditunda karena
+    tabelnya besar (dijalankan dengan apply_deferred, biasanya di background).
+    """
+    migrations = migrations or MIGRATIONS
+    # Cek tanpa lock dulu: proses lain mungkin sedang menjalankan langkah migrasi online
+    # (memegang lock write), proses ini cukup ikut menunda jika tidak ada yang bisa diterapkan
+    with connections.reader() as conn:
+        cursor = conn.cursor()
+        applied = applied_versions(cursor)
+        pending = [migration for migration in migrations if migration.version not in applied]
+        if not pending:
+            return []
+        if applied and not _plan(cursor, pending)[0]:
+            return pending
+
+    with connections.writer() as conn:
+        cursor = conn.cursor()
+        # Satu transaksi: beberapa proses worker bisa inisialisasi bersamaan
+        _begin(cursor)
+        _ensure_version_table(cursor)
+        applied = applied_versions(cursor)
+        now, deferred = _plan(cursor, [migration for migration in migrations
+                                       if migration.version not in applied])
+        for migration in now:
+            _apply(cursor, migration)
+    return deferred
+
+def _apply_online(conn, migration: Migration) -> bool:
+    """
+    Jalankan satu migrasi di koneksi conn dengan commit di setiap langkah, sehingga
+    lock write database dilepas di antara langkah. Return False jika proses lain
+    sudah menerapkannya.
+    """
+    cursor = conn.cursor()
+    _begin(cursor)
+    if migration.version in applied_versions(cursor):
+        conn.rollback()
+        return False
+    logger.info(f"Running schema migration {migration.version} ({migration.description}) in background")
+    started = time.monotonic()
+    for _ in _steps(cursor, migration):
+        conn.commit()
+        # Beri kesempatan batch writer dan worker yang menunggu lock untuk menulis
+        time.sleep(DATABASE_CONFIG['online_migration_pause'])
+        _begin(cursor)
+        if migration.version in applied_versions(cursor):
+            conn.rollback()
+            return False
+    _record(cursor, migration, started)
+    conn.commit()
+    return True
+
+def apply_deferred(connections, pending: List[Migration]):
+    """Jalankan migrasi yang ditunda berurutan dengan koneksi sendiri (bukan writer bersama)"""
+    conn = connections.dedicated()
+    try:
+        for migration in pending:
+            try:
+                _apply_online(conn, migration)
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                logger.error(f"Schema migration {migration.version} failed: {e}")
+                return
+    finally:
+        conn.close()
+
+def start_deferred(connections, pending: List[Migration]) -> threading.Thread:
+    thread = threading.Thread(target=apply_deferred, args=(connections, pending), name='schema-migrations')
+    thread.daemon = True
+    thread.start()
+    return thread
@@ -0,0 +1,229 @@
+"""
+Partitions - Tabel harian untuk data packet dan flow
+
+Baris packet dan flow disimpan di satu tabel per hari (UTC) menurut
+timestamp-nya: network_connections_YYYYMMDD dan flows_YYYYMMDD. Retensi cukup
+DROP TABLE partisi yang lewat DATABASE_CONFIG['partition_keep_days'], tanpa
+DELETE besar yang mengunci database dan memecah file.
+
+ID baris unik antar partisi: sequence AUTOINCREMENT setiap partisi dimulai
+dari (nomor hari sejak 1970-01-01) << 32, sehingga partisi sebuah ID bisa
+dihitung langsung tanpa mencari. View connection_log (gabungan semua partisi)
+dibuat ulang setiap kali partisi ditambah atau dihapus.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+ID_SHIFT = 32
+EPOCH = date(1970, 1, 1)
+
+# Jenis record -> tabel dasar (tabel lama tanpa partisi memakai nama yang sama)
+KINDS = {
+    'packet': 'network_connections',
+    'flow': 'flows',
+}
+
+SCHEMAS = {
+    'packet': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        source_ip TEXT NOT NULL,
+        dest_ip TEXT NOT NULL,
+        dest_port INTEGER,
+        protocol TEXT,
+        dest_domain TEXT,
+        packet_size INTEGER,
+        connection_type TEXT,
+        country TEXT,
+        is_suspicious BOOLEAN DEFAULT 0,
+        raw_data TEXT,
+        sample_rate INTEGER DEFAULT 1,
+        raw_headers BLOB,
+        raw_ref TEXT
+    ''',
+    'flow': '''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        source_ip TEXT NOT NULL,
+        dest_ip TEXT NOT NULL,
+        source_port INTEGER,
+        dest_port INTEGER,
+        protocol TEXT,
+        dest_domain TEXT,
+        packets INTEGER DEFAULT 0,
+        bytes INTEGER DEFAULT 0,
+        first_seen REAL,
+        last_seen REAL,
+        tcp_flags INTEGER DEFAULT 0,
+        end_reason TEXT,
+        connection_type TEXT,
+        country TEXT,
+        is_suspicious BOOLEAN DEFAULT 0,
+        sample_rate INTEGER DEFAULT 1,
+        raw_headers BLOB,
+        raw_ref TEXT
+    ''',
+}
+
+# Kolom connection_log per jenis record. packet_size dan packet_count sudah
+# diskalakan dengan sample_rate; jumlah koneksi diestimasi dengan SUM(sample_rate)
+PROJECTIONS = {
+    'packet': '''id, timestamp, source_ip, dest_ip, dest_port, protocol,
+        dest_domain, packet_size * sample_rate AS packet_size,
+        sample_rate AS packet_count,
+        connection_type, country, is_suspicious,
+        'packet' AS record_type, sample_rate,
+        raw_ref IS NOT NULL AS has_raw''',
+    'flow': '''id, timestamp, source_ip, dest_ip, dest_port, protocol,
+        dest_domain, bytes * sample_rate AS packet_size,
+        packets * sample_rate AS packet_count,
+        connection_type, country, is_suspicious,
+        'flow' AS record_type, sample_rate,
+        raw_ref IS NOT NULL AS has_raw''',
+}
+
+def column_names(kind: str) -> List[str]:
+    return [line.split()[0] for line in SCHEMAS[kind].strip().splitlines()]
+
+def partition_day(timestamp: str) -> str:
+    """'YYYY-MM-DD HH:MM:SS' -> 'YYYYMMDD'"""
+    return timestamp[:4] + timestamp[5:7] + timestamp[8:10]
+
+def today(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now(timezone.utc)).strftime('%Y%m%d')
+
+def table_name(kind: str, day: Optional[str]) -> str:
+    """Nama tabel partisi; day None = tabel lama tanpa partisi"""
+    return f'{KINDS[kind]}_{day}' if day else KINDS[kind]
+
+def id_base(day: str) -> int:
+    return (datetime.strptime(day, '%Y%m%d').date() - EPOCH).days << ID_SHIFT
+
+def day_of_id(record_id: int) -> Optional[str]:
+    """Hari partisi dari ID baris; None untuk baris tabel lama"""
+    days = record_id >> ID_SHIFT
+    return (EPOCH + timedelta(days=days)).strftime('%Y%m%d') if days else None
+
+def list_partitions(cursor) -> List[Tuple[str, Optional[str], str]]:
+    """(jenis, hari, tabel) untuk semua partisi, terbaru dulu; tabel lama (hari None) paling akhir"""
+    names = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    found = []
+    for kind, base in KINDS.items():
+        for name in names:
+            if name == base:
+                found.append((kind, None, name))
+            elif name.startswith(base + '_') and name[len(base) + 1:].isdigit():
+                found.append((kind, name[len(base) + 1:], name))
+    return sorted(found, key=lambda item: item[1] or '', reverse=True)
+
+def group_by_day(found: List[Tuple[str, Optional[str], str]]) -> List[Tuple[Optional[str], List[Tuple[str, str]]]]:
+    """[(hari, [(jenis, tabel), ...]), ...] terbaru dulu"""
+    groups: Dict[Optional[str], List[Tuple[str, str]]] = {}
+    for kind, day, table in found:
+        groups.setdefault(day, []).append((kind, table))
+    return sorted(groups.items(), key=lambda item: item[0] or '', reverse=True)
+
+def exists(cursor, table: str) -> bool:
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (table,)).fetchone() is not None
+
+def create(cursor, kind: str, day: str) -> bool:
+    """
+    Buat partisi jika belum ada. Return True jika baru dibuat.
+    Pemanggil harus sudah memegang transaksi write (BEGIN IMMEDIATE) agar
+    sequence ID di-set sebelum proses lain menulis ke partisi ini.
+    """
+    table = table_name(kind, day)
+    if exists(cursor, table):
+        return False
+    cursor.execute(f'CREATE TABLE {table} ({SCHEMAS[kind]})')
+    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, id_base(day)))
+    cursor.execute(f'CREATE INDEX idx_{table}_timestamp ON {table} (timestamp)')
+    # Hanya baris yang domain-nya masih menunggu reverse DNS (update_pending_domains)
+    cursor.execute(f'CREATE INDEX idx_{table}_pending_domain ON {table} (dest_ip) WHERE dest_domain IS NULL')
+    return True
+
+def rebuild_view(cursor):
+    """Buat ulang view connection_log atas semua partisi yang ada"""
+    selects = [f'SELECT {PROJECTIONS[kind]} FROM {table}' for kind, _, table in list_partitions(cursor)]
+    if not selects:
+        # Belum ada partisi: view kosong dengan kolom yang sama
+        empty = ', '.join(f'NULL AS {column}' for column in column_names('packet'))
+        selects = [f"SELECT {PROJECTIONS['packet']} FROM (SELECT {empty}) WHERE 0"]
+    cursor.execute('DROP VIEW IF EXISTS connection_log')
+    cursor.execute('CREATE VIEW connection_log AS ' + '\nUNION ALL\n'.join(selects))
+
+def retention_cutoff(keep_days: int, now: Optional[datetime] = None) -> str:
+    """Hari partisi tertua yang masih disimpan ('YYYYMMDD')"""
+    return today((now or datetime.now(timezone.utc)) - timedelta(days=keep_days - 1))
+
+def drop_expired(cursor, keep_days: int, now: Optional[datetime] = None) -> List[str]:
+    """Hapus partisi yang lebih lama dari keep_days hari (0 = simpan selamanya)"""
+    if not keep_days:
+        return []
+    cutoff = retention_cutoff(keep_days, now)
+    dropped = []
+    for kind, day, table in list_partitions(cursor):
+        if day is not None and day < cutoff:
+            cursor.execute(f'DROP TABLE {table}')
+            cursor.execute('DELETE FROM sqlite_sequence WHERE name = ?', (table,))
+            dropped.append(table)
+    return dropped
+
+def _move_chunk(cursor, kind: str, chunk_rows: int) -> int:
+    """
+    Pindahkan satu potongan tabel lama ke satu partisi: baris dengan id di
+    [MIN(id), MIN(id) + chunk_rows) yang harinya sama dengan baris MIN(id).
+    Return jumlah baris yang dipindah.
+    """
+    base = KINDS[kind]
+    first = cursor.execute(f'SELECT id, timestamp FROM {base} ORDER BY id LIMIT 1').fetchone()
+    if first is None:
+        return 0
+    low, timestamp = first
+    if timestamp is None:
+        # Baris tanpa timestamp ikut partisi hari ini
+        day = today()
+        condition, params = 'timestamp IS NULL', ()
+    else:
+        day = partition_day(timestamp)
+        next_day = (datetime.strptime(day, '%Y%m%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        # Rentang prefix tanggal (juga cocok untuk timestamp format ISO 'YYYY-MM-DDTHH:MM:SS')
+        condition, params = 'timestamp >= ? AND timestamp < ?', (timestamp[:10], next_day)
+    if create(cursor, kind, day):
+        rebuild_view(cursor)
+    columns = ', '.join(column_names(kind)[1:])
+    where = f'id >= ? AND id < ? AND {condition}'
+    params = (low, low + chunk_rows) + params
+    cursor.execute(f'''
+        INSERT INTO {table_name(kind, day)} ({columns})
+        SELECT {columns} FROM {base} WHERE {where} ORDER BY id
+    ''', params)
+    moved = cursor.rowcount
+    cursor.execute(f'DELETE FROM {base} WHERE {where}', params)
+    return moved
+
+def migrate_legacy(cursor, chunk_rows: int):
+    """
+    Pindahkan baris tabel lama ke partisi harian per potongan id (maksimal
+    chunk_rows baris dari satu hari per langkah), lalu hapus tabel lama.
+    Generator: setiap yield adalah batas transaksi saat dijalankan di background.
+    """
+    while True:
+        moved = 0
+        for kind, base in KINDS.items():
+            if exists(cursor, base):
+                moved = _move_chunk(cursor, kind, chunk_rows)
+                if moved:
+                    break
+        if not moved:
+            break
+        yield
+    # Tabel lama sudah kosong: dihapus di transaksi yang sama dengan pengecekan terakhir,
+    # sehingga tidak ada insert ke tabel lama yang terlewat
+    for kind, base in KINDS.items():
+        if exists(cursor, base):
+            cursor.execute(f'DROP TABLE {base}')
+    for kind in KINDS:
+        create(cursor, kind, today())
+    rebuild_view(cursor)
@@ -0,0 +1,311 @@
+"""
+Rollups - Agregat koneksi per menit, jam dan hari
+
+Setiap batch penulisan (insert koneksi/flow, backfill domain dari reverse DNS)
+diagregasi per menit di memori lalu digabung ke tabel rollup_minute,
+rollup_hour dan daily_stats dalam transaksi writer yang sama dengan baris
+mentahnya. Statistik dan chart dashboard membaca rollup (O(bucket)), bukan
+memindai baris mentah (O(baris)).
+
+Domain unik disimpan sebagai sketch HyperLogLog (digabung dengan max per
+register). Top domain disimpan sebagai JSON {domain: [akses, akses terakhir]}
+yang dibatasi DATABASE_CONFIG['rollup_top_domains'] entri per bucket, sehingga
+jumlah akses domain di luar daftar teratas bersifat perkiraan.
+"""
+import hashlib
+import heapq
+import json
+import math
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from config.config import DATABASE_CONFIG
+from src.database import partitions
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+SKETCH_BITS = 10
+SKETCH_SIZE = 1 << SKETCH_BITS   # 1024 register, standard error ~3%
+
+# Level rollup: (tabel, kolom bucket)
+LEVELS = {
+    'minute': ('rollup_minute', 'bucket'),
+    'hour': ('rollup_hour', 'bucket'),
+    'day': ('daily_stats', 'date'),
+}
+
+COLUMNS = ('total_connections', 'total_packets', 'total_bytes', 'suspicious_connections',
+           'unique_domains', 'domains_sketch', 'top_domains')
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).strftime(TIME_FORMAT)
+
+def _bucket_keys(minute: str) -> Dict[str, str]:
+    """Kunci bucket tiap level dari kunci menit 'YYYY-MM-DD HH:MM'"""
+    return {
+        'minute': f'{minute}:00',
+        'hour': f'{minute[:13]}:00:00',
+        'day': minute[:10],
+    }
+
+@lru_cache(maxsize=65536)
+def _register(domain: str) -> tuple:
+    """(index register, rank) untuk satu domain; domain yang sama berulang di setiap batch dan level"""
+    value = int.from_bytes(hashlib.blake2b(domain.encode(), digest_size=8).digest(), 'big')
+    rest = value & ((1 << (64 - SKETCH_BITS)) - 1)
+    return value >> (64 - SKETCH_BITS), (64 - SKETCH_BITS) - rest.bit_length() + 1
+
+class DomainSketch:
+    """HyperLogLog kecil untuk estimasi jumlah domain unik"""
+
+    def __init__(self, data: Optional[bytes] = None):
+        self.registers = bytearray(data) if data else bytearray(SKETCH_SIZE)
+
+    def add(self, domain: str):
+        index, rank = _register(domain)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, data: Optional[bytes]):
+        if data:
+            self.registers = bytearray(map(max, self.registers, data))
+
+    def estimate(self) -> int:
+        zeros = self.registers.count(0)
+        if zeros == SKETCH_SIZE:
+            return 0
+        alpha = 0.7213 / (1 + 1.079 / SKETCH_SIZE)
+        estimate = alpha * SKETCH_SIZE * SKETCH_SIZE / sum(2.0 ** -rank for rank in self.registers)
+        if estimate <= 2.5 * SKETCH_SIZE and zeros:
+            # Koreksi rentang kecil (linear counting)
+            estimate = SKETCH_SIZE * math.log(SKETCH_SIZE / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+def merge_top_domains(target: Dict[str, list], source: Dict[str, list]):
+    """Gabungkan {domain: [akses, akses terakhir]} ke target"""
+    for domain, (hits, last_access) in source.items():
+        entry = target.get(domain)
+        if entry is None:
+            target[domain] = [hits, last_access]
+        else:
+            entry[0] += hits
+            if last_access > entry[1]:
+                entry[1] = last_access
+
+def top_domains(domains: Dict[str, list], limit: int) -> List[tuple]:
+    """(domain, [akses, akses terakhir]) terbanyak"""
+    return heapq.nlargest(limit, domains.items(), key=lambda item: item[1][0])
+
+def _new_bucket() -> Dict:
+    return {'connections': 0, 'packets': 0, 'bytes': 0, 'suspicious': 0, 'domains': {}}
+
+class RollupBatch:
+    """Agregat per menit dari satu transaksi penulisan"""
+
+    def __init__(self):
+        self.minutes: Dict[str, Dict] = {}
+
+    def add(self, timestamp: str, domain: Optional[str] = None, hits: int = 0, connections: int = 0,
+            packets: int = 0, data_bytes: int = 0, suspicious: int = 0):
+        minute = f'{timestamp[:10]} {timestamp[11:16]}'
+        bucket = self.minutes.get(minute)
+        if bucket is None:
+            bucket = self.minutes[minute] = _new_bucket()
+        bucket['connections'] += connections
+        bucket['packets'] += packets
+        bucket['bytes'] += data_bytes
+        bucket['suspicious'] += suspicious
+        if domain:
+            entry = bucket['domains'].get(domain)
+            if entry is None:
+                bucket['domains'][domain] = [hits, timestamp]
+            else:
+                entry[0] += hits
+                if timestamp > entry[1]:
+                    entry[1] = timestamp
+
+    def _levels(self) -> Dict[str, Dict[str, Dict]]:
+        levels = {level: {} for level in LEVELS}
+        for minute, bucket in self.minutes.items():
+            for level, key in _bucket_keys(minute).items():
+                target = levels[level].get(key)
+                if target is None:
+                    target = levels[level][key] = _new_bucket()
+                for field in ('connections', 'packets', 'bytes', 'suspicious'):
+                    target[field] += bucket[field]
+                merge_top_domains(target['domains'], bucket['domains'])
+        return levels
+
+    def write(self, cursor, sequenced: bool = False):
+        """
+        Gabungkan batch ke baris rollup yang sudah ada (dalam transaksi writer pemanggil).
+        sequenced: isi kolom seq (schema versi 7 ke atas) dengan nomor urut transaksi ini
+        """
+        limit = DATABASE_CONFIG['rollup_top_domains']
+        seq = None
+        if sequenced:
+            # Baris harian ikut ditulis di setiap batch dan tidak pernah dihapus, jadi MAX selalu naik
+            seq = cursor.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM daily_stats').fetchone()[0]
+        cutoffs = retention_cutoffs(datetime.now(timezone.utc))
+        for level, buckets in self._levels().items():
+            table, key = LEVELS[level]
+            for bucket_key, bucket in buckets.items():
+                if level in cutoffs and bucket_key < cutoffs[level]:
+                    # Sudah lewat masa simpan (backfill baris lama)
+                    continue
+                row = cursor.execute(f'''
+                    SELECT total_connections, total_packets, total_bytes, suspicious_connections,
+                           domains_sketch, top_domains
+                    FROM {table} WHERE {key} = ?
+                ''', (bucket_key,)).fetchone()
+                domains = json.loads(row[5]) if row and row[5] else {}
+                merge_top_domains(domains, bucket['domains'])
+                sketch = DomainSketch(row[4] if row else None)
+                for domain in bucket['domains']:
+                    sketch.add(domain)
+
+                values = {
+                    'total_connections': (row[0] if row else 0) + bucket['connections'],
+                    'total_packets': (row[1] if row else 0) + bucket['packets'],
+                    'total_bytes': (row[2] if row else 0) + bucket['bytes'],
+                    'suspicious_connections': (row[3] if row else 0) + bucket['suspicious'],
+                    'unique_domains': sketch.estimate(),
+                    'domains_sketch': sketch.to_bytes() if domains else None,
+                    'top_domains': json.dumps(dict(top_domains(domains, limit))) if domains else None,
+                }
+                if seq is not None:
+                    values['seq'] = seq
+                if level == 'day':
+                    # Kolom lama daily_stats
+                    values['total_data_mb'] = round(values['total_bytes'] / (1024 * 1024), 2)
+                columns = ', '.join(values)
+                cursor.execute(f'''
+                    INSERT INTO {table} ({key}, {columns}) VALUES (?{', ?' * len(values)})
+                    ON CONFLICT ({key}) DO UPDATE SET
+                    {', '.join(f'{column} = excluded.{column}' for column in values)}
+                ''', (bucket_key, *values.values()))
+
+def create_tables(cursor):
+    for table in ('rollup_minute', 'rollup_hour'):
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT PRIMARY KEY,
+                total_connections INTEGER DEFAULT 0,
+                total_packets INTEGER DEFAULT 0,
+                total_bytes INTEGER DEFAULT 0,
+                suspicious_connections INTEGER DEFAULT 0,
+                unique_domains INTEGER DEFAULT 0,
+                domains_sketch BLOB,
+                top_domains TEXT
+            )
+        ''')
+
+# Jenis record -> (jumlah packet, jumlah byte) yang sudah diskalakan sample_rate
+_REBUILD_SOURCES = {
+    'packet': ('sample_rate', 'packet_size * sample_rate'),
+    'flow': ('packets * sample_rate', 'bytes * sample_rate'),
+}
+
+def _next_day(day: str) -> str:
+    return (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+def _first_day(cursor, tables: List[str], since: str) -> Optional[str]:
+    """Hari (YYYY-MM-DD) baris paling awal dengan timestamp >= since (memakai index timestamp)"""
+    days = []
+    for table in tables:
+        first = cursor.execute(f'SELECT MIN(timestamp) FROM {table} WHERE timestamp >= ?', (since,)).fetchone()[0]
+        if first:
+            days.append(first[:10])
+    return min(days) if days else None
+
+def rebuild(cursor):
+    """
+    Hitung ulang rollup dari baris mentah (migrasi untuk database lama), satu hari per langkah.
+
+    Generator: setiap yield adalah batas transaksi saat migrasi berjalan di background.
+    Setiap langkah menghapus lalu menghitung ulang bucket harinya, jadi aman diulang.
+    Hari terakhir tidak dibatasi di atas dan tidak diikuti yield, sehingga baris yang
+    masuk selama migrasi ikut terhitung dalam transaksi yang sama dengan pencatatan versi.
+    """
+    sources = [(kind, table) for kind, _, table in partitions.list_partitions(cursor)]
+    tables = [table for _, table in sources]
+    day = _first_day(cursor, tables, '')
+    if day is None:
+        for table, _ in LEVELS.values():
+            cursor.execute(f'DELETE FROM {table}')
+        return
+
+    # Langkah pertama juga menghapus bucket sebelum hari pertama (daily_stats lama)
+    start = ''
+    while day is not None:
+        next_day = _next_day(day)
+        following = _first_day(cursor, tables, next_day)
+        # Hari terakhir: tanpa batas atas (bucket hari berikutnya ikut dihapus)
+        until = next_day if following is not None else None
+        for table, key in LEVELS.values():
+            if until is None:
+                cursor.execute(f'DELETE FROM {table} WHERE {key} >= ?', (start,))
+            else:
+                cursor.execute(f'DELETE FROM {table} WHERE {key} >= ? AND {key} < ?', (start, until))
+
+        batch = RollupBatch()
+        upper = '' if until is None else ' AND timestamp < ?'
+        for kind, table in sources:
+            packets, data_bytes = _REBUILD_SOURCES[kind]
+            cursor.execute(f'''
+                SELECT MAX(timestamp), dest_domain, SUM(sample_rate), SUM({packets}), SUM({data_bytes}),
+                       SUM(CASE WHEN is_suspicious THEN sample_rate ELSE 0 END)
+                FROM {table}
+                WHERE timestamp >= ?{upper}
+                GROUP BY strftime('%Y-%m-%d %H:%M', timestamp), dest_domain
+            ''', (day,) if until is None else (day, until))
+            for timestamp, domain, connections, packet_count, total_bytes, suspicious in cursor.fetchall():
+                if timestamp:
+                    batch.add(timestamp, domain, connections, connections=connections,
+                              packets=packet_count or 0, data_bytes=total_bytes or 0, suspicious=suspicious)
+        batch.write(cursor)
+
+        if until is None:
+            return
+        yield
+        start, day = until, following
+
+def retention_cutoffs(now: datetime) -> Dict[str, str]:
+    """Bucket menit dan jam yang lebih lama dari ini tidak disimpan"""
+    return {
+        'minute': (now - timedelta(hours=DATABASE_CONFIG['rollup_minute_retention_hours'])).strftime(TIME_FORMAT),
+        'hour': (now - timedelta(days=DATABASE_CONFIG['rollup_hour_retention_days'])).strftime(TIME_FORMAT),
+    }
+
+def prune(cursor, now: Optional[datetime] = None):
+    """Hapus rollup menit dan jam yang lewat masa simpan"""
+    for level, cutoff in retention_cutoffs(now or datetime.now(timezone.utc)).items():
+        table, key = LEVELS[level]
+        cursor.execute(f'DELETE FROM {table} WHERE {key} < ?', (cutoff,))
+
+def first_full_hour(since: str) -> str:
+    """Awal jam penuh pertama di window yang dimulai pada since"""
+    first_hour = since[:13] + ':00:00'
+    if since > first_hour:
+        first_hour = (datetime.strptime(first_hour, TIME_FORMAT) + timedelta(hours=1)).strftime(TIME_FORMAT)
+    return first_hour
+
+def window(cursor, since: str, columns: str = 'bucket, ' + ', '.join(COLUMNS),
+           after_seq: Optional[int] = None) -> List:
+    """
+    Baris rollup yang menutupi [since, sekarang] dengan resolusi menit:
+    rollup menit untuk jam pertama yang terpotong, lalu rollup jam penuh.
+    after_seq: hanya bucket yang berubah setelah nomor urut ini
+    """
+    first_hour = first_full_hour(since)
+    changed = '' if after_seq is None else ' AND seq > ?'
+    extra = () if after_seq is None else (after_seq,)
+    cursor.execute(f'''
+        SELECT {columns} FROM rollup_minute WHERE bucket >= ? AND bucket < ?{changed}
+        UNION ALL
+        SELECT {columns} FROM rollup_hour WHERE bucket >= ?{changed}
+    ''', (since[:16] + ':00', first_hour, *extra, first_hour, *extra))
+    return cursor.fetchall()
@@ -0,0 +1,122 @@
+"""
+Stats Cache - Statistik koneksi per window dari rollup, di-cache per ukuran window
+
+Bucket rollup yang menutupi window disimpan di memori per ukuran window (jam).
+Refresh hanya membaca bucket yang berubah sejak nomor urut (seq) terakhir yang
+terlihat, lalu menghitung ulang total dalam satu lintasan atas bucket di
+memori. Polling dashboard dalam stats_cache_min_refresh detik memakai hasil
+yang sama, sehingga banyak dashboard terbuka tidak menambah query.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from config.config import DATABASE_CONFIG
+from src.database import rollups
+
+COLUMNS = 'bucket, seq, ' + ', '.join(rollups.COLUMNS)
+
+def summarize(rows) -> Dict:
+    """Total window dari baris rollup (jumlah sudah diskalakan sample_rate saat ditulis)"""
+    totals = {'total_connections': 0, 'suspicious_connections': 0, 'total_bytes': 0, 'total_packets': 0}
+    sketch = rollups.DomainSketch()
+    for row in rows:
+        for field in totals:
+            totals[field] += row[field]
+        sketch.merge(row['domains_sketch'])
+
+    return {
+        'total_connections': totals['total_connections'],
+        'suspicious_connections': totals['suspicious_connections'],
+        'unique_domains': sketch.estimate(),
+        'total_data_mb': round(totals['total_bytes'] / (1024 * 1024), 2),
+        'total_packets': totals['total_packets']
+    }
+
+class StatsCache:
+    def __init__(self, connections, min_refresh: float = None):
+        self.connections = connections
+        self.min_refresh = DATABASE_CONFIG['stats_cache_min_refresh'] if min_refresh is None else min_refresh
+        self._windows: Dict[int, Dict] = {}
+        # Naik setiap kali proses ini menulis rollup: hasil cache tidak lagi dipakai tanpa refresh
+        self.generation = 0
+        # Satu refresh pada satu waktu; pemanggil lain menunggu lalu memakai hasilnya
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'hits': 0,
+            'refreshes': 0,
+            'full_loads': 0,
+            'buckets_read': 0,
+        }
+
+    def get(self, hours: int) -> Dict:
+        """Statistik koneksi dalam hours jam terakhir"""
+        with self._lock:
+            now = time.monotonic()
+            generation = self.generation
+            state = self._windows.get(hours)
+            if state and state['generation'] == generation and now - state['checked_at'] < self.min_refresh:
+                self.stats['hits'] += 1
+                return state['result']
+
+            since = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime(rollups.TIME_FORMAT)
+            with self.connections.reader() as conn:
+                cursor = conn.cursor()
+                # Baca seq dulu: perubahan yang masuk sesudahnya terbaca ulang di refresh berikutnya
+                seq = cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM daily_stats').fetchone()[0]
+                if state is None or state['first_hour'] != rollups.first_full_hour(since):
+                    # Window pertama kali diminta atau bergeser melewati batas jam
+                    state = self._load(cursor, since, seq)
+                    self._windows[hours] = state
+                else:
+                    self._refresh(cursor, state, since, seq)
+
+            state['checked_at'] = now
+            state['generation'] = generation
+            return state['result']
+
+    def invalidate(self):
+        """Tandai ada penulisan baru dari proses ini (dipanggil setelah rollup ditulis)"""
+        self.generation += 1
+
+    def _load(self, cursor, since: str, seq: int) -> Dict:
+        rows = rollups.window(cursor, since, COLUMNS)
+        self.stats['full_loads'] += 1
+        self.stats['buckets_read'] += len(rows)
+        buckets = {row['bucket']: row for row in rows}
+        return {
+            'first_hour': rollups.first_full_hour(since),
+            'since_minute': since[:16] + ':00',
+            'seq': seq,
+            'buckets': buckets,
+            'result': summarize(buckets.values()),
+        }
+
+    def _refresh(self, cursor, state: Dict, since: str, seq: int):
+        changed = False
+        if seq != state['seq']:
+            # Baris rollup berisi nilai absolut, jadi membaca ulang bucket yang sama aman
+            rows = rollups.window(cursor, since, COLUMNS, after_seq=state['seq'])
+            self.stats['refreshes'] += 1
+            self.stats['buckets_read'] += len(rows)
+            for row in rows:
+                state['buckets'][row['bucket']] = row
+            state['seq'] = seq
+            changed = bool(rows)
+
+        since_minute = since[:16] + ':00'
+        if since_minute != state['since_minute']:
+            # Tepi awal window maju: buang bucket menit yang sudah keluar
+            state['since_minute'] = since_minute
+            expired = [bucket for bucket in state['buckets'] if bucket < since_minute]
+            for bucket in expired:
+                del state['buckets'][bucket]
+            changed = changed or bool(expired)
+
+        if changed:
+            state['result'] = summarize(state['buckets'].values())
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'windows': len(self._windows)}
@@ -0,0 +1,329 @@
+"""
+Capture Backends - Sumber packet untuk NetworkMonitor
+
+- scapy     : AsyncSniffer + dissection penuh scapy (fallback, paling fleksibel)
+- af_packet : socket AF_PACKET mentah + decoder header cepat (packet_decoder)
+- tpacket_v3: ring buffer PACKET_RX_RING (TPACKET_V3) yang di-mmap, tanpa syscall per packet
+"""
+import mmap
+import select
+import socket
+import struct
+import logging
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from config.config import MONITORING_CONFIG
+
+ETH_P_ALL = 0x0003
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+# struct tpacket_req3
+_TPACKET_REQ3 = struct.Struct('IIIIIII')
+# struct tpacket_block_desc + tpacket_hdr_v1: block_status, num_pkts, offset_to_first_pkt
+_BLOCK_HEADER = struct.Struct('III')
+_BLOCK_STATUS_OFFSET = 8
+# struct tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac
+_PACKET_HEADER = struct.Struct('IIIIIIH')
+
+def read_block(view: memoryview, block_offset: int) -> Optional[List[Tuple[memoryview, int]]]:
+    """
+    Frame (view ke ring, panjang di wire) dari satu block TPACKET_V3.
+    None jika block masih milik kernel (belum TP_STATUS_USER).
+    """
+    status, num_packets, offset = _BLOCK_HEADER.unpack_from(view, block_offset + _BLOCK_STATUS_OFFSET)
+    if not status & TP_STATUS_USER:
+        return None
+
+    batch = []
+    position = block_offset + offset
+    for _ in range(num_packets):
+        next_offset, _sec, _nsec, snaplen, wire_length, _status, mac = \
+            _PACKET_HEADER.unpack_from(view, position)
+        start = position + mac
+        batch.append((view[start:start + snaplen], wire_length))
+        position += next_offset
+    return batch
+
+def release_block(view: memoryview, block_offset: int):
+    """Serahkan block kembali ke kernel"""
+    struct.pack_into('I', view, block_offset + _BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+
+class CaptureBackend:
+    """Base class: capture berjalan di thread sendiri sampai stop() dipanggil"""
+
+    name = 'base'
+
+    def __init__(self, interface: str, bpf_filter: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.interface = interface
+        self.bpf_filter = bpf_filter
+        self.exception: Optional[Exception] = None
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        self._stop_event.clear()
+        self.exception = None
+        self.thread = threading.Thread(target=self._run_catch, name=f'capture-{self.name}')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run_catch(self):
+        try:
+            self.run()
+        except Exception as e:
+            self.exception = e
+
+    def run(self):
+        raise NotImplementedError
+
+    def stop(self, timeout: float = 5):
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+
+    def is_alive(self) -> bool:
+        return bool(self.thread and self.thread.is_alive())
+
+    def last_error(self) -> Optional[Exception]:
+        """Exception yang menghentikan thread capture, jika ada"""
+        return self.exception
+
+    def get_stats(self) -> dict:
+        return {'backend': self.name}
+
+class ScapyCapture(CaptureBackend):
+    """Capture lewat scapy AsyncSniffer, setiap packet di-dissect penuh oleh scapy"""
+
+    name = 'scapy'
+
+    def __init__(self, interface: str, bpf_filter: Optional[str], packet_handler: Callable):
+        super().__init__(interface, bpf_filter)
+        self.packet_handler = packet_handler
+        self.sniffer = None
+
+    def start(self):
+        from scapy.sendrecv import AsyncSniffer
+
+        self.exception = None
+        self.sniffer = AsyncSniffer(
+            iface=self.interface,
+            prn=self.packet_handler,
+            filter=self.bpf_filter,
+            store=False
+        )
+        self.sniffer.start()
+        self.thread = self.sniffer.thread
+
+    def stop(self, timeout: float = 5):
+        if self.is_alive():
+            self.sniffer.stop()
+
+    def last_error(self) -> Optional[Exception]:
+        return getattr(self.sniffer, 'exception', None) if self.sniffer else None
+
+class AFPacketCapture(CaptureBackend):
+    """Capture lewat socket AF_PACKET, frame diteruskan mentah ke frame_handler"""
+
+    name = 'af_packet'
+
+    def __init__(self, interface: str, bpf_filter: Optional[str], frame_handler: Callable,
+                 snaplen: int = 65535, buffer_size: int = None):
+        super().__init__(interface, bpf_filter)
+        self.frame_handler = frame_handler
+        self.snaplen = snaplen
+        self.buffer_size = buffer_size or MONITORING_CONFIG['af_packet_buffer_size']
+        self.sock = None
+        self.filter_attached = False
+        self.kernel_packets = 0
+        self.kernel_drops = 0
+
+    def open_socket(self) -> socket.socket:
+        """Buka socket AF_PACKET pada interface dan pasang BPF filter jika ada"""
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.buffer_size)
+            sock.bind((self.interface, ETH_P_ALL))
+            sock.settimeout(0.5)
+            if self.bpf_filter:
+                self.filter_attached = attach_bpf_filter(sock, self.bpf_filter, self.interface)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def run(self):
+        self.sock = self.open_socket()
+        buffer = bytearray(self.snaplen)
+        view = memoryview(buffer)
+        recv_into = self.sock.recv_into
+        handler = self.frame_handler
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    size = recv_into(buffer)
+                except socket.timeout:
+                    continue
+                handler(view[:size])
+        finally:
+            self.read_kernel_stats()
+            self.sock.close()
+
+    def read_kernel_stats(self):
+        """Akumulasi counter PACKET_STATISTICS (kernel me-reset counter setiap dibaca)"""
+        if self.sock is None or self.sock.fileno() < 0:
+            return
+        try:
+            packets, drops = struct.unpack('II', self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+        except OSError:
+            return
+        self.kernel_packets += packets
+        self.kernel_drops += drops
+
+    def get_stats(self) -> dict:
+        self.read_kernel_stats()
+        return {
+            'backend': self.name,
+            'filter_attached': self.filter_attached,
+            'kernel_packets': self.kernel_packets,
+            'kernel_drops': self.kernel_drops,
+        }
+
+class TPacketV3Capture(AFPacketCapture):
+    """
+    Capture lewat ring buffer TPACKET_V3 (block mode).
+
+    Kernel mengisi block di memori yang di-mmap bersama; setiap block yang sudah
+    diserahkan ke user (TP_STATUS_USER) di-decode di tempat, diteruskan sebagai
+    satu batch ke batch_handler, lalu dikembalikan ke kernel (TP_STATUS_KERNEL).
+    """
+
+    name = 'tpacket_v3'
+
+    def __init__(self, interface: str, bpf_filter: Optional[str], batch_handler: Callable,
+                 block_size: int = None, block_count: int = None, block_timeout_ms: int = None,
+                 frame_size: int = None):
+        super().__init__(interface, bpf_filter, frame_handler=None)
+        self.batch_handler = batch_handler
+        self.block_size = block_size or MONITORING_CONFIG['tpacket_block_size']
+        self.block_count = block_count or MONITORING_CONFIG['tpacket_block_count']
+        self.block_timeout_ms = block_timeout_ms or MONITORING_CONFIG['tpacket_block_timeout_ms']
+        self.frame_size = frame_size or MONITORING_CONFIG['tpacket_frame_size']
+        self.kernel_queue_freezes = 0
+        self.blocks_processed = 0
+
+    def open_socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            sock.setsockopt(SOL_PACKET, PACKET_RX_RING, _TPACKET_REQ3.pack(
+                self.block_size,
+                self.block_count,
+                self.frame_size,
+                self.block_size * self.block_count // self.frame_size,
+                self.block_timeout_ms,
+                0,
+                0
+            ))
+            sock.bind((self.interface, ETH_P_ALL))
+            if self.bpf_filter:
+                self.filter_attached = attach_bpf_filter(sock, self.bpf_filter, self.interface)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def run(self):
+        self.sock = self.open_socket()
+        ring = mmap.mmap(self.sock.fileno(), self.block_size * self.block_count,
+                         mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        view = memoryview(ring)
+        poller = select.poll()
+        poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+        block_index = 0
+
+        try:
+            while not self._stop_event.is_set():
+                block_offset = block_index * self.block_size
+                batch = read_block(view, block_offset)
+                if batch is None:
+                    events = poller.poll(500)
+                    for _, event in events:
+                        if event & select.POLLERR:
+                            raise OSError(f"Capture socket error on {self.interface}")
+                    continue
+
+                try:
+                    self.batch_handler(batch)
+                finally:
+                    for frame, _ in batch:
+                        frame.release()
+                    # Kembalikan block ke kernel setelah semua frame di-decode
+                    release_block(view, block_offset)
+
+                self.blocks_processed += 1
+                block_index = (block_index + 1) % self.block_count
+        finally:
+            self.read_kernel_stats()
+            view.release()
+            try:
+                ring.close()
+            except BufferError:
+                # Masih ada view frame yang dipegang di luar batch; mmap dilepas oleh GC
+                self.logger.warning("Ring buffer still referenced, deferring unmap")
+            self.sock.close()
+
+    def read_kernel_stats(self):
+        """Akumulasi tpacket_stats_v3 (tp_packets, tp_drops, tp_freeze_q_cnt)"""
+        if self.sock is None or self.sock.fileno() < 0:
+            return
+        try:
+            packets, drops, freezes = struct.unpack('III', self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 12))
+        except OSError:
+            return
+        self.kernel_packets += packets
+        self.kernel_drops += drops
+        self.kernel_queue_freezes += freezes
+
+    def get_stats(self) -> dict:
+        stats = super().get_stats()
+        stats.update({
+            'kernel_queue_freezes': self.kernel_queue_freezes,
+            'blocks_processed': self.blocks_processed,
+            'block_size': self.block_size,
+            'block_count': self.block_count,
+        })
+        return stats
+
+def attach_bpf_filter(sock: socket.socket, bpf_filter: str, interface: str) -> bool:
+    """Pasang filter BPF ke socket (butuh libpcap untuk compile ekspresi)"""
+    logger = logging.getLogger(__name__)
+    try:
+        from scapy.arch.linux import attach_filter
+        attach_filter(sock, bpf_filter, interface)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not attach BPF filter to AF_PACKET socket, capturing unfiltered: {e}")
+        return False
+
+def create_capture_backend(name: str, interface: str, bpf_filter: Optional[str],
+                           packet_handler: Callable, frame_handler: Callable,
+                           batch_handler: Callable = None) -> CaptureBackend:
+    """Buat backend capture sesuai MONITORING_CONFIG['capture_backend']"""
+    if name in ('af_packet', 'tpacket_v3'):
+        if not hasattr(socket, 'AF_PACKET'):
+            logging.getLogger(__name__).warning("AF_PACKET is not supported on this platform, falling back to scapy")
+        elif name == 'tpacket_v3' and batch_handler is not None:
+            return TPacketV3Capture(interface, bpf_filter, batch_handler)
+        else:
+            return AFPacketCapture(interface, bpf_filter, frame_handler)
+    elif name != 'scapy':
+        logging.getLogger(__name__).warning(f"Unknown capture backend '{name}', falling back to scapy")
+    return ScapyCapture(interface, bpf_filter, packet_handler)
@@ -0,0 +1,76 @@
+"""
+Capture Filter - Menyusun BPF filter agar traffic yang tidak relevan dibuang di kernel
+"""
+import ipaddress
+from typing import Iterable, List, Optional
+
+from config.config import MONITORING_CONFIG, FILTERED_DOMAINS, DETECTION_RULES
+
+def _host_clauses(hosts: Iterable[str]) -> List[str]:
+    """Ubah entri FILTERED_DOMAINS yang berupa IP literal menjadi klausa 'host'"""
+    clauses = []
+    for host in hosts:
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            # Nama seperti 'localhost' tidak bisa dipakai di BPF tanpa resolve
+            continue
+        clauses.append(f'host {host}')
+    return clauses
+
+def _join(clauses: List[str], operator: str) -> str:
+    if len(clauses) == 1:
+        return clauses[0]
+    return f' {operator} '.join(f'({clause})' for clause in clauses)
+
+def build_bpf_filter(filtered_hosts: Iterable[str] = None,
+                     suspicious_ports: Iterable[int] = None,
+                     include: Iterable[str] = None,
+                     exclude: Iterable[str] = None) -> Optional[str]:
+    """
+    Susun ekspresi BPF dari konfigurasi.
+
+    - Hanya IPv4/IPv6 (ARP dan protokol non-IP lain dibuang di kernel)
+    - Host di FILTERED_DOMAINS dibuang
+    - Rule include/exclude dari user diterapkan, tetapi traffic ke port
+      mencurigakan selalu tetap ditangkap agar deteksi tidak terlewat
+
+    Jika MONITORING_CONFIG['bpf_filter'] diisi, ekspresi tersebut dipakai apa adanya.
+    """
+    override = MONITORING_CONFIG.get('bpf_filter')
+    if override:
+        return override
+
+    filtered_hosts = FILTERED_DOMAINS if filtered_hosts is None else filtered_hosts
+    suspicious_ports = DETECTION_RULES['suspicious_ports'] if suspicious_ports is None else suspicious_ports
+    include = list(MONITORING_CONFIG.get('bpf_include', []) if include is None else include)
+    exclude = list(MONITORING_CONFIG.get('bpf_exclude', []) if exclude is None else exclude)
+
+    clauses = ['ip or ip6']
+    clauses.extend(f'not {clause}' for clause in _host_clauses(filtered_hosts))
+
+    if include or exclude:
+        user_clauses = []
+        if include:
+            user_clauses.append(_join(include, 'or'))
+        if exclude:
+            user_clauses.append(f'not ({_join(exclude, "or")})')
+        user_rule = _join(user_clauses, 'and')
+
+        ports = sorted(set(suspicious_ports))
+        if ports:
+            port_rule = ' or '.join(f'port {port}' for port in ports)
+            user_rule = f'({user_rule}) or ({port_rule})'
+        clauses.append(user_rule)
+
+    return _join(clauses, 'and')
+
+def validate_bpf_filter(expression: str) -> Optional[str]:
+    """Compile filter dengan libpcap, return pesan error atau None jika valid"""
+    try:
+        from scapy.arch.common import compile_filter
+        compile_filter(expression)
+    except Exception as e:
+        # Termasuk ImportError jika libpcap tidak tersedia: filter tidak bisa dipasang
+        return str(e)
+    return None
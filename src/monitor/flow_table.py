@@ -0,0 +1,143 @@
+"""
+Flow Table - Agregasi packet menjadi flow berdasarkan 5-tuple
+"""
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from config.config import MONITORING_CONFIG
+
+# TCP flags yang menandakan flow selesai
+TCP_FIN = 0x01
+TCP_RST = 0x04
+
+FlowKey = Tuple[str, str, Optional[int], Optional[int], str]
+
+class FlowTable:
+    def __init__(self, idle_timeout: float = None, active_timeout: float = None,
+                 max_flows: int = None):
+        self.logger = logging.getLogger(__name__)
+        self.idle_timeout = idle_timeout or MONITORING_CONFIG['flow_idle_timeout']
+        self.active_timeout = active_timeout or MONITORING_CONFIG['flow_active_timeout']
+        self.max_flows = max_flows or MONITORING_CONFIG['flow_table_max_flows']
+
+        # Diurutkan berdasarkan last_seen (paling lama di depan) untuk idle timeout & eviction
+        self.flows: "OrderedDict[FlowKey, Dict]" = OrderedDict()
+        # Diurutkan berdasarkan first_seen (urutan insert) untuk active timeout
+        self._start_order: Dict[FlowKey, float] = {}
+
+        self.stats = {
+            'flows_created': 0,
+            'flows_emitted': 0,
+            'closed_fin_rst': 0,
+            'expired_idle': 0,
+            'expired_active': 0,
+            'evicted': 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.flows)
+
+    def update(self, key: FlowKey, packet_size: int, tcp_flags: int = 0,
+               now: float = None) -> Tuple[Dict, bool, List[Dict]]:
+        """
+        Tambahkan satu packet ke flow-nya.
+
+        Return (flow, is_new, finished) dimana finished berisi flow record
+        yang selesai karena FIN/RST atau dikeluarkan karena tabel penuh.
+        """
+        now = now or time.time()
+        finished = []
+
+        flow = self.flows.get(key)
+        is_new = flow is None
+        if is_new:
+            if len(self.flows) >= self.max_flows:
+                oldest_key = next(iter(self.flows))
+                finished.append(self._emit(oldest_key, 'evicted'))
+
+            source_ip, dest_ip, source_port, dest_port, protocol = key
+            flow = {
+                'source_ip': source_ip,
+                'dest_ip': dest_ip,
+                'source_port': source_port,
+                'dest_port': dest_port,
+                'protocol': protocol,
+                'packets': 0,
+                'bytes': 0,
+                'first_seen': now,
+                'last_seen': now,
+                'tcp_flags': 0,
+                'is_suspicious': False,
+            }
+            self.flows[key] = flow
+            self._start_order[key] = now
+            self.stats['flows_created'] += 1
+        else:
+            self.flows.move_to_end(key)
+
+        flow['packets'] += 1
+        flow['bytes'] += packet_size
+        flow['last_seen'] = now
+        flow['tcp_flags'] |= tcp_flags
+
+        if tcp_flags & (TCP_FIN | TCP_RST):
+            finished.append(self._emit(key, 'fin_rst'))
+
+        return flow, is_new, finished
+
+    def expire(self, now: float = None) -> List[Dict]:
+        """Keluarkan flow yang melewati idle timeout atau active timeout"""
+        now = now or time.time()
+        finished = []
+
+        # Idle timeout: flow paling lama tidak aktif ada di depan
+        while self.flows:
+            key, flow = next(iter(self.flows.items()))
+            if now - flow['last_seen'] < self.idle_timeout:
+                break
+            finished.append(self._emit(key, 'idle'))
+
+        # Active timeout: flow paling lama dimulai ada di depan
+        while self._start_order:
+            key, first_seen = next(iter(self._start_order.items()))
+            if now - first_seen < self.active_timeout:
+                break
+            finished.append(self._emit(key, 'active'))
+
+        return finished
+
+    def flush_all(self) -> List[Dict]:
+        """Keluarkan semua flow yang masih aktif (misalnya saat monitoring berhenti)"""
+        return [self._emit(key, 'flush') for key in list(self.flows.keys())]
+
+    def _emit(self, key: FlowKey, reason: str) -> Dict:
+        """Hapus flow dari tabel dan kembalikan sebagai record"""
+        flow = self.flows.pop(key)
+        self._start_order.pop(key, None)
+        flow['end_reason'] = reason
+        flow['timestamp'] = datetime.fromtimestamp(
+            flow['last_seen'], tz=timezone.utc
+        ).strftime('%Y-%m-%d %H:%M:%S')
+
+        self.stats['flows_emitted'] += 1
+        if reason == 'fin_rst':
+            self.stats['closed_fin_rst'] += 1
+        elif reason == 'idle':
+            self.stats['expired_idle'] += 1
+        elif reason == 'active':
+            self.stats['expired_active'] += 1
+        elif reason == 'evicted':
+            self.stats['evicted'] += 1
+
+        return flow
+
+    def get_stats(self) -> Dict:
+        """Dapatkan statistik flow table"""
+        return {
+            **self.stats,
+            'active_flows': len(self.flows),
+            'max_flows': self.max_flows,
+        }
@@ -0,0 +1,132 @@
+"""
+Hostname Parser - Ambil nama host dari payload pertama sebuah flow
+
+- TLS : server_name (SNI) dari ClientHello
+- HTTP: header Host dari request plaintext
+
+Parser hanya membaca satu packet (tanpa reassembly stream). ClientHello
+yang terpotong ke beberapa segment tetap di-parse sejauh data yang ada;
+jika SNI berada di luar packet pertama, hasilnya None.
+"""
+import struct
+import time
+from typing import Dict, Optional, Tuple
+
+TLS_HANDSHAKE = 0x16
+TLS_CLIENT_HELLO = 0x01
+TLS_EXT_SERVER_NAME = 0x0000
+SNI_HOST_NAME = 0x00
+
+HTTP_METHODS = (b'GET ', b'POST ', b'HEAD ', b'PUT ', b'DELETE ', b'OPTIONS ',
+                b'PATCH ', b'CONNECT ')
+# Header HTTP yang dibaca dibatasi agar request besar tidak di-scan seluruhnya
+HTTP_HEADER_LIMIT = 4096
+
+_U16 = struct.Struct('!H')
+
+def _valid_hostname(name: str) -> bool:
+    return 0 < len(name) <= 253 and all(c.isalnum() or c in '.-_:' for c in name)
+
+def extract_tls_sni(payload) -> Optional[str]:
+    """Return SNI dari TLS ClientHello, None jika payload bukan ClientHello/tanpa SNI"""
+    # Record header (5) + handshake header (4) + version (2) + random (32)
+    if len(payload) < 44 or payload[0] != TLS_HANDSHAKE or payload[1] != 0x03:
+        return None
+    if payload[5] != TLS_CLIENT_HELLO:
+        return None
+
+    end = len(payload)
+    offset = 5 + 4 + 2 + 32
+    try:
+        # session_id
+        offset += 1 + payload[offset]
+        # cipher_suites
+        offset += 2 + _U16.unpack_from(payload, offset)[0]
+        # compression_methods
+        offset += 1 + payload[offset]
+        extensions_end = min(end, offset + 2 + _U16.unpack_from(payload, offset)[0])
+        offset += 2
+
+        while offset + 4 <= extensions_end:
+            ext_type, ext_length = struct.unpack_from('!HH', payload, offset)
+            offset += 4
+            if ext_type == TLS_EXT_SERVER_NAME:
+                # server_name_list: length (2), lalu name_type (1) + length (2) + nama
+                position = offset + 2
+                list_end = min(extensions_end, position + _U16.unpack_from(payload, offset)[0])
+                while position + 3 <= list_end:
+                    name_type = payload[position]
+                    name_length = _U16.unpack_from(payload, position + 1)[0]
+                    position += 3
+                    if position + name_length > list_end:
+                        return None
+                    if name_type == SNI_HOST_NAME:
+                        name = bytes(payload[position:position + name_length]).decode('ascii').lower()
+                        return name if _valid_hostname(name) else None
+                    position += name_length
+                return None
+            offset += ext_length
+    except (struct.error, IndexError, UnicodeDecodeError):
+        return None
+    return None
+
+def extract_http_host(payload) -> Optional[str]:
+    """Return header Host dari request HTTP plaintext (tanpa port), None jika tidak ada"""
+    if len(payload) < 16:
+        return None
+    head = bytes(payload[:HTTP_HEADER_LIMIT])
+    if not head.startswith(HTTP_METHODS):
+        return None
+
+    headers_end = head.find(b'\r\n\r\n')
+    if headers_end >= 0:
+        head = head[:headers_end]
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'host':
+            host = value.strip().decode('ascii', 'replace').lower()
+            if host.startswith('['):
+                host = host[1:host.find(']')]
+            elif host.count(':') == 1:
+                host = host.partition(':')[0]
+            return host if _valid_hostname(host) else None
+    return None
+
+class HostnameExtractor:
+    """Parser SNI/Host dengan statistik jumlah hasil dan biaya parse"""
+
+    def __init__(self):
+        self.stats = {
+            'inspected': 0,
+            'tls_sni': 0,
+            'http_host': 0,
+            'no_match': 0,
+            'parse_seconds': 0.0,
+        }
+
+    def extract(self, payload) -> Optional[Tuple[str, str]]:
+        """Return (hostname, sumber 'tls'/'http') dari satu payload"""
+        started = time.perf_counter()
+        result = None
+        name = extract_tls_sni(payload)
+        if name:
+            result = (name, 'tls')
+            self.stats['tls_sni'] += 1
+        else:
+            name = extract_http_host(payload)
+            if name:
+                result = (name, 'http')
+                self.stats['http_host'] += 1
+            else:
+                self.stats['no_match'] += 1
+        self.stats['inspected'] += 1
+        self.stats['parse_seconds'] += time.perf_counter() - started
+        return result
+
+    def get_stats(self) -> Dict:
+        inspected = self.stats['inspected']
+        return {
+            **self.stats,
+            'parse_seconds': round(self.stats['parse_seconds'], 6),
+            'avg_parse_us': round(self.stats['parse_seconds'] / inspected * 1e6, 2) if inspected else 0.0,
+        }
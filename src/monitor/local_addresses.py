@@ -0,0 +1,181 @@
+"""
+Local Address Registry - Tabel alamat lokal untuk klasifikasi arah koneksi
+
+Semua alamat IPv4/IPv6 di semua interface disimpan dalam satu set sehingga
+klasifikasi INBOUND/OUTBOUND cukup berupa hash lookup. Tabel dibangun ulang
+saat kernel mengirim event netlink RTM_NEWADDR/RTM_DELADDR, dengan timer
+sebagai fallback (dan sebagai satu-satunya mekanisme di luar Linux).
+"""
+import ipaddress
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional
+
+import netifaces
+
+from config.config import MONITORING_CONFIG
+
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+_NLMSG_HEADER = struct.Struct('=IHHII')
+
+def _normalize(address: str) -> Optional[str]:
+    """Bentuk kanonik alamat (tanpa scope '%eth0'), sama dengan output packet decoder"""
+    try:
+        return ipaddress.ip_address(address.split('%', 1)[0]).compressed
+    except ValueError:
+        return None
+
+class LocalAddressRegistry:
+    def __init__(self, refresh_interval: float = None):
+        self.logger = logging.getLogger(__name__)
+        self.refresh_interval = refresh_interval or MONITORING_CONFIG['local_address_refresh_interval']
+        self.addresses: FrozenSet[str] = frozenset()
+        self.interfaces: Dict[str, Dict[str, List[Dict]]] = {}
+        self.refresh_count = 0
+        self.netlink_events = 0
+        self.last_refresh = None
+        self.using_netlink = False
+        self.watch_thread = None
+        self._stop_event = threading.Event()
+        self.refresh()
+
+    def refresh(self):
+        """Bangun ulang tabel dari netifaces lalu ganti secara atomik"""
+        interfaces = {}
+        addresses = set()
+        try:
+            for iface in netifaces.interfaces():
+                entry = {'ipv4': [], 'ipv6': []}
+                try:
+                    addrs = netifaces.ifaddresses(iface)
+                except ValueError:
+                    # Interface hilang di antara interfaces() dan ifaddresses()
+                    continue
+                for family, key in ((netifaces.AF_INET, 'ipv4'), (netifaces.AF_INET6, 'ipv6')):
+                    for info in addrs.get(family, []):
+                        address = _normalize(info.get('addr', ''))
+                        if address is None:
+                            continue
+                        addresses.add(address)
+                        entry[key].append({
+                            'addr': address,
+                            'netmask': info.get('netmask'),
+                            'broadcast': info.get('broadcast'),
+                        })
+                interfaces[iface] = entry
+        except Exception as e:
+            self.logger.error(f"Error reading local addresses: {e}")
+            return
+
+        self.interfaces = interfaces
+        self.addresses = frozenset(addresses)
+        self.refresh_count += 1
+        self.last_refresh = time.time()
+
+    def is_local(self, ip_address: str) -> bool:
+        return ip_address in self.addresses
+
+    def classify(self, source_ip: str, dest_ip: str) -> str:
+        """Arah koneksi dilihat dari host ini"""
+        if source_ip in self.addresses:
+            return 'OUTBOUND'
+        if dest_ip in self.addresses:
+            return 'INBOUND'
+        # Traffic yang hanya lewat (mode promiscuous / port mirror)
+        return 'TRANSIT'
+
+    def primary_ip(self, interface: str = None) -> str:
+        """IPv4 pertama pada interface, atau alamat non-loopback pertama jika tidak ada"""
+        entry = self.interfaces.get(interface)
+        if entry:
+            for key in ('ipv4', 'ipv6'):
+                if entry[key]:
+                    return entry[key][0]['addr']
+        for iface, entry in self.interfaces.items():
+            if iface != 'lo' and entry['ipv4']:
+                return entry['ipv4'][0]['addr']
+        return "127.0.0.1"
+
+    def start(self):
+        """Mulai thread yang memantau perubahan alamat (idempotent)"""
+        if self.watch_thread and self.watch_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self.watch_thread = threading.Thread(target=self._watch_loop, name='local-addresses')
+        self.watch_thread.daemon = True
+        self.watch_thread.start()
+
+    def stop(self, timeout: float = 2):
+        self._stop_event.set()
+        if self.watch_thread and self.watch_thread.is_alive():
+            self.watch_thread.join(timeout=timeout)
+
+    def _open_netlink(self) -> Optional[socket.socket]:
+        if not hasattr(socket, 'AF_NETLINK'):
+            return None
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+            return sock
+        except OSError as e:
+            self.logger.warning(f"Netlink unavailable, refreshing local addresses every {self.refresh_interval}s: {e}")
+            return None
+
+    def _watch_loop(self):
+        sock = self._open_netlink()
+        self.using_netlink = sock is not None
+        next_refresh = time.monotonic() + self.refresh_interval
+        try:
+            while not self._stop_event.is_set():
+                timeout = max(0.0, min(next_refresh - time.monotonic(), 1.0))
+                if sock is None:
+                    self._stop_event.wait(timeout)
+                    changed = False
+                else:
+                    readable, _, _ = select.select([sock], [], [], timeout)
+                    changed = bool(readable) and self._read_events(sock)
+
+                if changed or time.monotonic() >= next_refresh:
+                    self.refresh()
+                    next_refresh = time.monotonic() + self.refresh_interval
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _read_events(self, sock: socket.socket) -> bool:
+        """Baca pesan netlink yang tersedia, True jika ada perubahan alamat"""
+        changed = False
+        while True:
+            try:
+                data = sock.recv(65536, socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return changed
+            except OSError as e:
+                # ENOBUFS: event terlewat, anggap berubah
+                self.logger.warning(f"Netlink receive error: {e}")
+                return True
+            position = 0
+            while position + _NLMSG_HEADER.size <= len(data):
+                length, message_type, _, _, _ = _NLMSG_HEADER.unpack_from(data, position)
+                if length < _NLMSG_HEADER.size:
+                    break
+                if message_type in (RTM_NEWADDR, RTM_DELADDR):
+                    self.netlink_events += 1
+                    changed = True
+                position += (length + 3) & ~3
+
+    def get_stats(self) -> Dict:
+        return {
+            'addresses': sorted(self.addresses),
+            'refresh_count': self.refresh_count,
+            'last_refresh': self.last_refresh,
+            'netlink_events': self.netlink_events,
+            'source': 'netlink' if self.using_netlink else 'timer',
+        }
@@ -0,0 +1,168 @@
+"""
+Pipeline Metrics - Histogram latency dan counter per tahap pemrosesan packet
+
+Histogram memakai bucket log-linear ala HDR Histogram: setiap pangkat dua
+dibagi 2^SUB_BUCKET_BITS sub-bucket, sehingga error relatif percentile
+dibatasi (~6%) dengan memori tetap per tahap berapapun jumlah sampelnya.
+
+Pengukuran bisa dinyalakan/dimatikan saat runtime. Saat mati, setiap titik
+ukur hanya memeriksa satu atribut boolean.
+"""
+import threading
+import time
+from typing import Dict, List
+
+from config.config import METRICS_CONFIG
+
+# Tahap pipeline yang diukur (nanodetik)
+STAGES = ('decode', 'filter', 'resolve', 'geo', 'detect', 'hostname', 'persist', 'alert', 'pipeline')
+SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_BUCKET_COUNT = (65 - SUB_BUCKET_BITS) << SUB_BUCKET_BITS
+PERCENTILES = (50, 90, 99, 99.9)
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * _BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        """Index bucket untuk nilai (nilai kecil tepat, nilai besar log-linear)"""
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        if shift <= 0:
+            return value
+        return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def bucket_high(index: int) -> int:
+        """Nilai tertinggi yang masuk ke bucket"""
+        if index < 2 * _SUB_BUCKETS:
+            return index
+        shift = (index >> SUB_BUCKET_BITS) - 1
+        mantissa = (index & (_SUB_BUCKETS - 1)) + _SUB_BUCKETS
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+        self.counts[self.bucket(value)] += 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, percent: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                seen += count
+                if seen >= target:
+                    return min(self.bucket_high(index), self.max)
+        return self.max
+
+    def export(self) -> Dict:
+        """State ringkas (hanya bucket terisi) untuk digabung antar proses"""
+        return {
+            'counts': {index: count for index, count in enumerate(self.counts) if count},
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    def merge(self, state: Dict):
+        if not state['count']:
+            return
+        for index, count in state['counts'].items():
+            self.counts[int(index)] += count
+        self.min = state['min'] if not self.count else min(self.min, state['min'])
+        self.max = max(self.max, state['max'])
+        self.count += state['count']
+        self.total += state['total']
+
+    def summary(self) -> Dict:
+        """Ringkasan dalam mikrodetik"""
+        summary = {
+            'count': self.count,
+            'mean_us': round(self.total / self.count / 1000, 2) if self.count else 0.0,
+            'total_ms': round(self.total / 1e6, 2),
+            'max_us': round(self.max / 1000, 2),
+        }
+        for percent in PERCENTILES:
+            summary[f'p{percent:g}_us'.replace('.', '')] = round(self.percentile(percent) / 1000, 2)
+        return summary
+
+class PipelineMetrics:
+    def __init__(self, enabled: bool = None):
+        self.enabled = METRICS_CONFIG['enabled'] if enabled is None else enabled
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.counters: Dict[str, int] = {}
+        # Export/reset dari thread lain (dashboard, tick capture)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, nanoseconds: int):
+        """Catat durasi satu tahap (pemanggil sudah memeriksa enabled)"""
+        self.histograms[stage].record(nanoseconds)
+
+    def record_since(self, stage: str, started_ns: int):
+        self.histograms[stage].record(time.perf_counter_ns() - started_ns)
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+            self.counters = {}
+
+    def export(self) -> Dict:
+        with self._lock:
+            return {
+                'stages': {stage: histogram.export() for stage, histogram in self.histograms.items()
+                           if histogram.count},
+                'counters': dict(self.counters),
+            }
+
+    def totals(self) -> Dict:
+        """Jumlah sampel dan total durasi per tahap tanpa bucket (murah, untuk scrape)"""
+        with self._lock:
+            return {
+                'stages': {stage: {'count': histogram.count, 'total': histogram.total}
+                           for stage, histogram in self.histograms.items() if histogram.count},
+                'counters': dict(self.counters),
+            }
+
+    def merge(self, state: Dict):
+        with self._lock:
+            for stage, histogram in state['stages'].items():
+                if stage in self.histograms:
+                    self.histograms[stage].merge(histogram)
+            for name, value in state['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    @classmethod
+    def combine(cls, states: List[Dict], enabled: bool = False) -> 'PipelineMetrics':
+        """Gabungkan state dari beberapa proses (misalnya worker pool)"""
+        combined = cls(enabled)
+        for state in states:
+            combined.merge(state)
+        return combined
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'stages': {stage: histogram.summary() for stage, histogram in self.histograms.items()},
+                'counters': dict(self.counters),
+            }
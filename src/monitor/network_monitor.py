@@ -1,41 +1,100 @@
 """
 Network Monitor - Modul utama untuk monitoring traffic jaringan
 """
+import os
+import json
 import time
 import logging
 import threading
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
 import socket
 import struct
 import psutil
-import netifaces
 
 try:
     from scapy.all import *
     from scapy.layers.inet import IP, TCP, UDP
-    from scapy.layers.dns import DNS
 except ImportError:
     print("Scapy tidak terinstall. Jalankan: pip install scapy")
     exit(1)
 
-from config.config import MONITORING_CONFIG, FILTERED_DOMAINS, ALERT_THRESHOLDS
+from config.config import MONITORING_CONFIG, DNS_CONFIG, METRICS_CONFIG, FILTERED_DOMAINS, ALERT_THRESHOLDS
 from src.database.db_manager import DatabaseManager
+from src.database.batch_writer import BatchWriter
+from src.monitor.flow_table import FlowTable
+from src.monitor.rule_engine import RuleEngine
+from src.monitor.capture_filter import build_bpf_filter, validate_bpf_filter
+from src.monitor.capture_backends import create_capture_backend
+from src.monitor.packet_decoder import DecodedPacket, LINKTYPE_ETHERNET, LINKTYPE_RAW, decode_frame
+from src.monitor.pcap_reader import read_pcap
+from src.monitor.local_addresses import LocalAddressRegistry
+from src.monitor.rate_tracker import RateTracker
+from src.monitor.sampler import PacketSampler
+from src.monitor.raw_capture import RawCaptureStore
+from src.monitor.hostname_parser import HostnameExtractor
+from src.monitor.worker_pool import WorkerPool, MERGED_STATS
+from src.monitor.metrics import PipelineMetrics
 from src.utils.geo_utils import GeoLocationUtils
+from src.utils.dns_resolver import DNSResolver
+from src.utils.passive_dns import PassiveDNS, DNS_PORT
+
+# Callable yang mengembalikan (frame mentah, link type pcap) untuk raw capture
+FrameSource = Callable[[], Tuple[bytes, int]]
 
 class NetworkMonitor:
     def __init__(self, interface: str = None):
         self.interface = interface or MONITORING_CONFIG['interface']
         self.db_manager = DatabaseManager()
-        self.geo_utils = GeoLocationUtils()
-        self.logger = logging.getLogger(__name__)
+        self.metrics = PipelineMetrics()
+        self.batch_writer = BatchWriter(self.db_manager, metrics=self.metrics)
+        self.batch_writer.register_handler('flow', self.db_manager.insert_flows)
+        self.batch_writer.register_handler('domain', self.db_manager.update_pending_domains)
+        self.batch_writer.register_handler('passive_dns', self.db_manager.save_passive_dns)
+        self._init_pipeline()
+        self.rates = RateTracker()
+        self.capture_filter = build_bpf_filter()
+        self.resolver = DNSResolver()
+        self.resolver.add_listener(self._on_domain_resolved)
+        if self.passive_dns.enabled:
+            # Peta dari sesi sebelumnya, lalu setiap jawaban baru ikut disimpan
+            self.passive_dns.load(self.db_manager.load_passive_dns(time.time(), DNS_CONFIG['passive_cache_size']))
+            self.passive_dns.add_listener(
+                lambda ip, domain, expires_at: self.batch_writer.submit('passive_dns', (ip, domain, expires_at))
+            )
         self.is_monitoring = False
         self.monitor_thread = None
-        self.connection_count = 0
-        self.connections_per_minute = {}
+        self.capture = None
+        self._stop_event = threading.Event()
+        self.worker_pool = None
+        self._next_metrics_snapshot = 0.0
+        
+        # Statistik capture service
+        self.started_at = None
+        self.capture_restarts = 0
+        self.capture_rates = {'packets_per_second': 0.0, 'bytes_per_second': 0.0,
+                              'connections_per_second': 0.0}
+        self._rate_sample = (time.monotonic(), 0, 0, 0, 0.0)
         
         # Setup logging
         self.setup_logging()
+    
+    def _init_pipeline(self):
+        """Komponen pipeline packet (decode sampai flow table), juga dipakai WorkerPipeline"""
+        self.logger = logging.getLogger(__name__)
+        self.flow_table = FlowTable()
+        self._flow_lock = threading.Lock()
+        self.rule_engine = RuleEngine()
+        self.geo_utils = GeoLocationUtils()
+        self.local_addresses = LocalAddressRegistry()
+        self.passive_dns = PassiveDNS()
+        self.sampler = PacketSampler()
+        self.raw_capture = RawCaptureStore()
+        self.hostnames = HostnameExtractor()
+        self.connection_count = 0
+        self.packets_captured = 0
+        self.bytes_captured = 0
+        self._busy_time = 0.0
         
     def setup_logging(self):
         """Setup logging configuration"""
@@ -51,145 +110,551 @@ class NetworkMonitor:
     def get_network_interfaces(self) -> List[str]:
         """Dapatkan daftar network interface yang tersedia"""
         try:
-            interfaces = netifaces.interfaces()
-            return [iface for iface in interfaces if iface != 'lo']
+            return [iface for iface in self.local_addresses.interfaces if iface != 'lo']
         except Exception as e:
             self.logger.error(f"Error getting network interfaces: {e}")
             return []
     
-    def resolve_domain(self, ip_address: str) -> Optional[str]:
-        """Resolve IP address ke domain name"""
-        try:
-            if ip_address in FILTERED_DOMAINS:
-                return None
-                
-            # Coba reverse DNS lookup
-            domain = socket.gethostbyaddr(ip_address)[0]
-            return domain if domain != ip_address else None
-        except:
+    def resolve_domain(self, ip_address: str, timestamp: float = None) -> Optional[str]:
+        """
+        Resolve IP address ke domain name tanpa blocking (None jika masih pending).
+        
+        Jawaban DNS yang terlihat di jaringan dipakai lebih dulu; PTR lookup
+        hanya untuk IP yang tidak ada di peta passive DNS.
+        """
+        if ip_address in FILTERED_DOMAINS:
             return None
+        
+        domain = self.passive_dns.lookup(ip_address, timestamp)
+        if domain:
+            return domain
+        return self.resolver.lookup(ip_address)
+    
+    def is_suspicious_domain(self, domain: Optional[str]) -> bool:
+        """Cek apakah domain termasuk daftar domain mencurigakan"""
+        return self.rule_engine.match_domain(domain) is not None
     
-    def is_suspicious_connection(self, dest_ip: str, dest_port: int, protocol: str) -> bool:
-        """Cek apakah koneksi mencurigakan"""
+    def is_suspicious_connection(self, dest_ip: str, dest_port: int, protocol: str,
+                                 dest_domain: Optional[str] = None) -> bool:
+        """Cek apakah koneksi mencurigakan (domain yang masih pending dicek saat resolve selesai)"""
         try:
-            # Cek port yang mencurigakan
-            suspicious_ports = [22, 23, 135, 139, 445, 1433, 3389, 5900]
-            if dest_port in suspicious_ports:
-                return True
-            
-            # Cek IP private yang tidak seharusnya diakses dari luar
-            if dest_ip.startswith('192.168.') or dest_ip.startswith('10.'):
-                return False
-                
-            # Cek domain yang mencurigakan
-            domain = self.resolve_domain(dest_ip)
-            if domain and any(susp in domain.lower() for susp in ALERT_THRESHOLDS['suspicious_domains']):
-                return True
-                
+            return self.rule_engine.evaluate(dest_ip, dest_port, dest_domain) is not None
+        except Exception as e:
+            self.logger.error(f"Error evaluating detection rules: {e}")
             return False
-        except:
+    
+    def _on_domain_resolved(self, ip_address: str, domain: Optional[str]):
+        """Isi dest_domain yang pending setelah PTR lookup selesai (dipanggil dari worker resolver)"""
+        if not domain:
+            return
+        
+        is_suspicious = self.is_suspicious_domain(domain)
+        self.batch_writer.submit('domain', (ip_address, domain, is_suspicious))
+        
+        if is_suspicious:
+            self.logger.warning(f"Suspicious domain resolved: {ip_address} ({domain})")
+            self._raise_alert(
+                'SUSPICIOUS_CONNECTION',
+                f'Suspicious domain resolved: {ip_address} ({domain})',
+                'CRITICAL',
+                dedup_key=f'SUSPICIOUS_DOMAIN:{ip_address}'
+            )
+    
+    def _enrich_connection(self, source_ip: str, dest_ip: str, dest_port: Optional[int],
+                           protocol_name: str, timestamp: float = None) -> Dict:
+        """Resolve domain, deteksi mencurigakan dan geolocation untuk satu koneksi"""
+        timed = self.metrics.enabled
+        if timed:
+            started = time.perf_counter_ns()
+        dest_domain = self.resolve_domain(dest_ip, timestamp)
+        if timed:
+            resolved = time.perf_counter_ns()
+        is_suspicious = self.is_suspicious_connection(dest_ip, dest_port, protocol_name, dest_domain)
+        if timed:
+            detected = time.perf_counter_ns()
+        country = self.geo_utils.get_country(dest_ip)
+        if timed:
+            self.metrics.record('resolve', resolved - started)
+            self.metrics.record('detect', detected - resolved)
+            self.metrics.record_since('geo', detected)
+        return {
+            'dest_domain': dest_domain,
+            'is_suspicious': is_suspicious,
+            'country': country,
+            'connection_type': self.local_addresses.classify(source_ip, dest_ip),
+        }
+    
+    def _report_suspicious(self, source_ip: str, dest_ip: str, dest_port: Optional[int],
+                           dest_domain: Optional[str], timestamp: float = None):
+        """Log dan simpan alert untuk koneksi mencurigakan (timestamp = waktu capture packet)"""
+        self.logger.warning(f"Suspicious connection detected: {source_ip} -> {dest_ip}:{dest_port}")
+        self._raise_alert(
+            'SUSPICIOUS_CONNECTION',
+            f'Suspicious connection: {source_ip} -> {dest_ip}:{dest_port} ({dest_domain or "Unknown"})',
+            'CRITICAL',
+            dedup_key=f'SUSPICIOUS_CONNECTION:{source_ip}:{dest_ip}:{dest_port}',
+            timestamp=timestamp
+        )
+    
+    def _raise_alert(self, alert_type: str, message: str, severity: str,
+                     dedup_key: str = None, timestamp: float = None):
+        """Simpan alert lewat alert manager (durasi dicatat sebagai tahap 'alert')"""
+        timed = self.metrics.enabled
+        if timed:
+            started = time.perf_counter_ns()
+        self.db_manager.insert_alert(alert_type, message, severity, dedup_key=dedup_key, timestamp=timestamp)
+        if timed:
+            self.metrics.record_since('alert', started)
+    
+    def _inspect_payload(self, record: Dict, info: DecodedPacket) -> bool:
+        """
+        Isi dest_domain dari TLS SNI / HTTP Host pada payload TCP.
+        
+        Nama dari payload lebih spesifik daripada DNS/PTR (IP CDN dipakai banyak
+        domain), jadi menimpa dest_domain. Return True jika record baru menjadi
+        mencurigakan karena nama tersebut.
+        """
+        timed = self.metrics.enabled
+        if timed:
+            started = time.perf_counter_ns()
+        result = self.hostnames.extract(info.payload)
+        if timed:
+            self.metrics.record_since('hostname', started)
+        if not result:
             return False
+        
+        record['dest_domain'] = result[0]
+        if not record['is_suspicious'] and self.is_suspicious_domain(result[0]):
+            record['is_suspicious'] = True
+            return True
+        return False
+    
+    def _capture_raw(self, info: DecodedPacket, frame_source: FrameSource,
+                     timestamp: float = None) -> Optional[Tuple[str, bytes]]:
+        """Simpan packet ke pcap side-file, return (referensi, blob header) atau None"""
+        frame, linktype = frame_source()
+        ref = self.raw_capture.append(frame, info.length, linktype, timestamp)
+        if not ref:
+            return None
+        return ref, self.raw_capture.headers(frame, len(info.payload))
+    
+    @staticmethod
+    def _attach_raw(record: Dict, raw: Optional[Tuple[str, bytes]]):
+        """Record menyimpan header dan referensi packet pertama yang disimpan mentah"""
+        if raw and not record.get('raw_ref'):
+            record['raw_ref'], record['raw_headers'] = raw
+    
+    def _process_flow_packet(self, info: DecodedPacket, frame_source: FrameSource,
+                             timestamp: float = None, sample_rate: int = 1):
+        """Agregasi packet ke flow table, enrichment hanya pada packet pertama flow"""
+        key = (info.source_ip, info.dest_ip, info.source_port, info.dest_port, info.protocol)
+        with self._flow_lock:
+            flow, is_new, finished = self.flow_table.update(key, info.length, info.tcp_flags, timestamp)
+            if is_new:
+                flow['sample_rate'] = sample_rate
+                # Enrichment (DNS, GeoIP online) berjalan di luar lock; sampai selesai
+                # flow tidak di-export oleh expiry/eviction, penyelesai enrichment yang mengirimnya
+                flow['enriching'] = True
+                newly_suspicious = capture = False
+            else:
+                newly_suspicious, capture = self._inspect_flow_packet(flow, info)
+            finished = self._ready_flows(finished)
+        
+        if is_new:
+            enrichment = self._enrich_connection(info.source_ip, info.dest_ip, info.dest_port,
+                                                 info.protocol, timestamp)
+            with self._flow_lock:
+                # Packet lain dari flow ini mungkin sudah mengisi nama dari payload (lebih spesifik)
+                if flow.get('dest_domain'):
+                    enrichment['dest_domain'] = flow['dest_domain']
+                enrichment['is_suspicious'] = enrichment['is_suspicious'] or flow['is_suspicious']
+                flow.update(enrichment)
+                del flow['enriching']
+                _, capture = self._inspect_flow_packet(flow, info)
+                # Flow sudah keluar dari tabel selama enrichment (FIN, timeout, eviction)
+                emitted = 'end_reason' in flow
+            if emitted:
+                finished.append(flow)
+        
+        # Tulis pcap di luar lock; hanya referensi yang dipasang di bawah lock
+        if capture:
+            raw = self._capture_raw(info, frame_source, timestamp)
+            if raw:
+                with self._flow_lock:
+                    self._attach_raw(flow, raw)
+        
+        if (is_new or newly_suspicious) and flow['is_suspicious']:
+            self._report_suspicious(info.source_ip, info.dest_ip, info.dest_port, flow['dest_domain'],
+                                    timestamp)
+        
+        for record in finished:
+            self._submit_flow(record)
+    
+    def _inspect_flow_packet(self, flow: Dict, info: DecodedPacket) -> Tuple[bool, bool]:
+        """
+        Parse payload satu packet flow (dipanggil dengan _flow_lock).
+        Return (flow baru menjadi mencurigakan, packet perlu disimpan mentah).
+        """
+        # Hanya packet pertama yang membawa payload di setiap flow yang di-parse
+        newly_suspicious = False
+        if info.payload and info.protocol == 'TCP' and not flow.get('payload_inspected'):
+            flow['payload_inspected'] = True
+            newly_suspicious = self._inspect_payload(flow, info)
+        capture = self.raw_capture.enabled and self.raw_capture.wants(flow['is_suspicious'])
+        return newly_suspicious, capture
+    
+    @staticmethod
+    def _ready_flows(records: List[Dict]) -> List[Dict]:
+        """Flow selesai yang bisa dikirim (yang masih di-enrich dikirim oleh thread enrichment)"""
+        return [record for record in records if not record.get('enriching')]
+    
+    def _process_single_packet(self, info: DecodedPacket, frame_source: FrameSource,
+                               timestamp: float = None, sample_rate: int = 1):
+        """Simpan satu baris per packet (mode tanpa agregasi flow)"""
+        connection_data = {
+            'source_ip': info.source_ip,
+            'dest_ip': info.dest_ip,
+            'dest_port': info.dest_port,
+            'protocol': info.protocol,
+            'packet_size': info.length,
+            'sample_rate': sample_rate
+        }
+        if timestamp:
+            # Replay PCAP: pakai waktu capture, bukan waktu insert
+            connection_data['timestamp'] = datetime.fromtimestamp(
+                timestamp, tz=timezone.utc
+            ).strftime('%Y-%m-%d %H:%M:%S')
+        connection_data.update(self._enrich_connection(info.source_ip, info.dest_ip, info.dest_port,
+                                                       info.protocol, timestamp))
+        # Tanpa flow table tidak ada state per flow; parser menolak payload lain dari byte pertama
+        if info.payload and info.protocol == 'TCP':
+            self._inspect_payload(connection_data, info)
+        
+        if self.raw_capture.enabled and self.raw_capture.wants(connection_data['is_suspicious']):
+            self._attach_raw(connection_data, self._capture_raw(info, frame_source, timestamp))
+        
+        # Simpan ke database lewat antrian write-behind
+        self.batch_writer.submit('connection', connection_data)
+        
+        if connection_data['is_suspicious']:
+            self._report_suspicious(info.source_ip, info.dest_ip, info.dest_port,
+                                    connection_data['dest_domain'], timestamp)
+    
+    def _submit_flow(self, record: Dict):
+        """Kirim flow yang selesai ke batch writer, isi domain jika lookup sudah selesai"""
+        if not record.get('dest_domain') and 'dest_ip' in record:
+            record['dest_domain'] = (self.passive_dns.lookup(record['dest_ip'], record.get('last_seen'))
+                                     or self.resolver.get_cached(record['dest_ip']))
+        self.batch_writer.submit('flow', record)
+    
+    def expire_flows(self, now: float = None):
+        """Export flow yang melewati idle/active timeout"""
+        with self._flow_lock:
+            finished = self._ready_flows(self.flow_table.expire(now))
+        for record in finished:
+            self._submit_flow(record)
+    
+    def flush_flows(self):
+        """Export semua flow yang masih aktif ke database"""
+        with self._flow_lock:
+            finished = self._ready_flows(self.flow_table.flush_all())
+        for record in finished:
+            self._submit_flow(record)
     
     def process_packet(self, packet):
-        """Process setiap packet yang ditangkap"""
+        """Process packet scapy (backend scapy): ambil field yang dibutuhkan lalu masuk pipeline"""
         try:
+            self.packets_captured += 1
+            packet_length = len(packet)
+            self.bytes_captured += packet_length
+            timed = self.metrics.enabled
+            if timed:
+                started = time.perf_counter_ns()
             if not packet.haslayer(IP):
+                if timed:
+                    self.metrics.count('not_ip')
                 return
             
             ip_layer = packet[IP]
-            source_ip = ip_layer.src
-            dest_ip = ip_layer.dst
-            protocol = ip_layer.proto
-            
-            # Skip traffic internal
-            if source_ip in FILTERED_DOMAINS or dest_ip in FILTERED_DOMAINS:
-                return
             
             # Extract port information
+            source_port = None
             dest_port = None
+            tcp_flags = 0
+            payload = b''
             if packet.haslayer(TCP):
+                source_port = packet[TCP].sport
                 dest_port = packet[TCP].dport
+                tcp_flags = int(packet[TCP].flags)
                 protocol_name = "TCP"
+                if source_port == DNS_PORT:
+                    payload = bytes(packet[TCP].payload)
+                elif packet.haslayer(Raw):
+                    payload = packet[Raw].load
             elif packet.haslayer(UDP):
+                source_port = packet[UDP].sport
                 dest_port = packet[UDP].dport
                 protocol_name = "UDP"
+                if source_port == DNS_PORT:
+                    payload = bytes(packet[UDP].payload)
             else:
                 protocol_name = "OTHER"
             
-            # Resolve domain
-            dest_domain = self.resolve_domain(dest_ip)
-            
-            # Cek apakah mencurigakan
-            is_suspicious = self.is_suspicious_connection(dest_ip, dest_port, protocol_name)
-            
-            # Get country information
-            country = self.geo_utils.get_country(dest_ip)
-            
-            # Prepare connection data
-            connection_data = {
-                'source_ip': source_ip,
-                'dest_ip': dest_ip,
-                'dest_port': dest_port,
-                'protocol': protocol_name,
-                'dest_domain': dest_domain,
-                'packet_size': len(packet),
-                'connection_type': 'OUTBOUND' if source_ip != self.get_local_ip() else 'INBOUND',
-                'country': country,
-                'is_suspicious': is_suspicious,
-                'raw_data': {
-                    'timestamp': datetime.now().isoformat(),
-                    'packet_summary': packet.summary()
-                }
-            }
-            
-            # Simpan ke database
-            self.db_manager.insert_connection(connection_data)
-            
-            # Update connection count
-            self.connection_count += 1
-            current_minute = int(time.time() / 60)
-            self.connections_per_minute[current_minute] = self.connections_per_minute.get(current_minute, 0) + 1
-            
-            # Cek threshold alert
-            if self.connections_per_minute[current_minute] > ALERT_THRESHOLDS['max_connections_per_minute']:
-                self.db_manager.insert_alert(
-                    'HIGH_TRAFFIC',
-                    f'High traffic detected: {self.connections_per_minute[current_minute]} connections in last minute',
-                    'WARNING'
-                )
-            
-            # Log suspicious connections
-            if is_suspicious:
-                self.logger.warning(f"Suspicious connection detected: {source_ip} -> {dest_ip}:{dest_port}")
-                self.db_manager.insert_alert(
-                    'SUSPICIOUS_CONNECTION',
-                    f'Suspicious connection: {source_ip} -> {dest_ip}:{dest_port} ({dest_domain or "Unknown"})',
-                    'CRITICAL'
-                )
-            
-            # Log setiap 100 koneksi
-            if self.connection_count % 100 == 0:
-                self.logger.info(f"Processed {self.connection_count} connections")
+            info = DecodedPacket(ip_layer.src, ip_layer.dst, source_port, dest_port,
+                                 protocol_name, packet_length, tcp_flags, memoryview(payload))
+            if timed:
+                self.metrics.record_since('decode', started)
+            self._process_decoded(info, lambda: (
+                bytes(packet), LINKTYPE_ETHERNET if isinstance(packet, Ether) else LINKTYPE_RAW
+            ))
                 
         except Exception as e:
+            self.metrics.count('errors')
             self.logger.error(f"Error processing packet: {e}")
     
-    def get_local_ip(self) -> str:
-        """Dapatkan IP lokal"""
+    def process_frame(self, frame, wire_length: int = None, linktype: int = LINKTYPE_ETHERNET,
+                      timestamp: float = None):
+        """Process frame mentah (backend cepat / PCAP replay) tanpa dissection scapy"""
         try:
-            # Coba dapatkan IP dari interface yang sedang digunakan
-            addrs = netifaces.ifaddresses(self.interface)
-            if netifaces.AF_INET in addrs:
-                return addrs[netifaces.AF_INET][0]['addr']
+            self.packets_captured += 1
+            self.bytes_captured += wire_length or len(frame)
+            timed = self.metrics.enabled
+            if timed:
+                started = time.perf_counter_ns()
+            info = decode_frame(frame, linktype, wire_length)
+            if timed:
+                self.metrics.record_since('decode', started)
+            if info is None:
+                if timed:
+                    self.metrics.count('not_ip')
+                return
+            
+            self._process_decoded(info, lambda: (frame, linktype), timestamp)
             
-            # Fallback ke method lain
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
-            return local_ip
-        except:
-            return "127.0.0.1"
+        except Exception as e:
+            self.metrics.count('errors')
+            self.logger.error(f"Error processing frame: {e}")
+    
+    def process_frames(self, frames: List):
+        """Process satu batch (frame, wire_length) dari backend ring buffer"""
+        process_frame = self.process_frame
+        for frame, wire_length in frames:
+            process_frame(frame, wire_length)
+    
+    def _process_decoded(self, info: DecodedPacket, frame_source: FrameSource,
+                         timestamp: float = None):
+        """
+        Pipeline bersama untuk semua backend capture (timestamp diisi saat replay PCAP).
+        
+        frame_source mengembalikan (frame, linktype) dan hanya dipanggil jika
+        packet perlu disimpan mentah.
+        """
+        # Passive DNS: catat jawaban DNS sebelum filter/sampling agar peta tetap lengkap
+        if info.source_port == DNS_PORT and info.payload:
+            self.passive_dns.ingest(info.payload, info.protocol == 'TCP', timestamp)
+        
+        metrics = self.metrics
+        timed = metrics.enabled
+        if timed:
+            filter_started = time.perf_counter_ns()
+        
+        # Skip traffic internal
+        if info.source_ip in FILTERED_DOMAINS or info.dest_ip in FILTERED_DOMAINS:
+            if timed:
+                metrics.count('filtered')
+            return
+        
+        # Sampling: packet yang tidak terpilih dilewati, yang terpilih mewakili sample_rate packet
+        sample_rate = self.sampler.sample(info.source_ip, info.dest_ip, info.source_port,
+                                          info.dest_port, info.protocol)
+        if not sample_rate:
+            if timed:
+                metrics.count('sampled_out')
+            return
+        
+        if timed:
+            metrics.record_since('filter', filter_started)
+        started = time.perf_counter()
+        if MONITORING_CONFIG['flow_aggregation']:
+            self._process_flow_packet(info, frame_source, timestamp, sample_rate)
+        else:
+            self._process_single_packet(info, frame_source, timestamp, sample_rate)
+        
+        # Update connection count (rate tracker menyimpan estimasi yang sudah diskalakan)
+        self.connection_count += 1
+        self.rates.record(info.source_ip, info.dest_ip, timestamp, sample_rate)
+        self._check_high_traffic(timestamp, sample_rate)
+        
+        # Log setiap 100 koneksi
+        if self.connection_count % 100 == 0:
+            self.logger.info(f"Processed {self.connection_count} connections")
+        
+        elapsed = time.perf_counter() - started
+        self._busy_time += elapsed
+        if timed:
+            metrics.record('pipeline', int(elapsed * 1e9))
+    
+    def _check_high_traffic(self, timestamp: float, added: int):
+        """Alert sekali per menit saat threshold terlewati, bukan setiap packet"""
+        connections_this_minute = self.rates.current('minute', timestamp)
+        threshold = ALERT_THRESHOLDS['max_connections_per_minute']
+        if connections_this_minute - added <= threshold < connections_this_minute:
+            self._raise_alert(
+                'HIGH_TRAFFIC',
+                f'High traffic detected: {connections_this_minute} connections in last minute',
+                'WARNING',
+                dedup_key='HIGH_TRAFFIC',
+                timestamp=timestamp
+            )
+    
+    def _start_workers(self, block_when_full: bool = False):
+        """Jalankan worker pool jika MONITORING_CONFIG['workers'] > 0"""
+        if MONITORING_CONFIG['workers'] <= 0:
+            self.worker_pool = None
+            return
+        self.worker_pool = WorkerPool(MONITORING_CONFIG['workers'], self.interface,
+                                      block_when_full=block_when_full,
+                                      metrics_enabled=self.metrics.enabled,
+                                      output_handler=self._handle_worker_output,
+                                      passive_entries=self.passive_dns.dump())
+        self.worker_pool.start()
+    
+    def _stop_workers(self, timeout: float = 10):
+        if self.worker_pool and self.worker_pool.running:
+            self._merge_worker_stats(self.worker_pool.stop(timeout))
+    
+    def _handle_worker_output(self, items: List[Tuple[str, object]]):
+        """
+        Hasil worker (record, alert, jawaban DNS) diteruskan dari proses ini, sehingga
+        hanya ada satu writer database dan deduplikasi alert tidak terbagi antar proses.
+        """
+        for kind, item in items:
+            if kind == 'alert':
+                self._raise_alert(*item)
+            elif kind == 'passive_dns':
+                self.passive_dns.load([item])
+                self.batch_writer.submit('passive_dns', item)
+            else:
+                if not item.get('dest_domain'):
+                    # Reverse DNS hanya di proses utama; baris di-backfill saat lookup selesai
+                    item['dest_domain'] = self.resolver.lookup(item['dest_ip'])
+                self.batch_writer.submit(kind, item)
+    
+    def _merge_worker_stats(self, snapshots: List[Dict]):
+        """Gabung ringkasan worker: delta laju ke rate tracker utama, counter kumulatif dijumlah"""
+        for snapshot in snapshots:
+            for (second, source_ip, dest_ip), count in sorted(snapshot['rates'].items(),
+                                                              key=lambda item: item[0][0]):
+                self.rates.record(source_ip, dest_ip, second, count)
+                self._check_high_traffic(second, count)
+        if snapshots:
+            self.connection_count = self.worker_pool.total('connections')
+    
+    def _dispatch_packet(self, packet):
+        """Backend scapy dengan worker pool: kirim bytes packet ke worker"""
+        self.packets_captured += 1
+        frame = bytes(packet)
+        self.bytes_captured += len(frame)
+        self.worker_pool.dispatch(frame, len(frame),
+                                  LINKTYPE_ETHERNET if isinstance(packet, Ether) else LINKTYPE_RAW)
+    
+    def _dispatch_frame(self, frame, wire_length: int = None, linktype: int = LINKTYPE_ETHERNET,
+                        timestamp: float = None):
+        """Proses capture hanya membaca frame; decode dan pemrosesan di worker"""
+        self.packets_captured += 1
+        self.bytes_captured += wire_length or len(frame)
+        self.worker_pool.dispatch(frame, wire_length, linktype, timestamp)
+    
+    def _dispatch_frames(self, frames: List):
+        dispatch = self._dispatch_frame
+        for frame, wire_length in frames:
+            dispatch(frame, wire_length)
+    
+    def replay_pcap(self, path: str, speed: float = 0.0,
+                    progress: Callable[[Dict], None] = None) -> Dict:
+        """
+        Alirkan file pcap/pcapng melalui pipeline yang sama dengan capture live.
+        
+        speed 0 memproses secepat mungkin (backfill/benchmark), 1 mengikuti
+        timing asli capture, nilai lain mempercepat/memperlambat timing tersebut.
+        Timeout flow dihitung dari timestamp packet sehingga hasilnya sama
+        berapapun kecepatan replay.
+        """
+        self.logger.info(f"Replaying {path} (speed: {speed or 'max'})")
+        self.batch_writer.block_when_full = True
+        self.batch_writer.start()
+        self._start_workers(block_when_full=True)
+        
+        packets_before = self.packets_captured
+        connections_before = self.connection_count
+        total_bytes = 0
+        first_ts = None
+        last_ts = None
+        next_expire = None
+        started = time.monotonic()
+        next_progress = started + 1
+        next_poll = started
+        process_frame = self._dispatch_frame if self.worker_pool else self.process_frame
+        
+        try:
+            for timestamp, data, wire_length, linktype in read_pcap(path):
+                # timestamp None: SPB pcapng di awal file, pipeline memakai jam dinding
+                if first_ts is None and timestamp is not None:
+                    first_ts = timestamp
+                    next_expire = timestamp + 1
+                
+                if speed > 0 and timestamp is not None:
+                    delay = (timestamp - first_ts) / speed - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                
+                process_frame(data, wire_length, linktype, timestamp)
+                total_bytes += wire_length
+                
+                # Expire flow menurut jam capture, bukan jam dinding
+                if timestamp is not None:
+                    last_ts = timestamp
+                    if timestamp >= next_expire:
+                        self.expire_flows(timestamp)
+                        next_expire = timestamp + 1
+                
+                now = time.monotonic()
+                if self.worker_pool and now >= next_poll:
+                    # Record hasil worker ditulis oleh proses ini, ambil sebelum menumpuk
+                    next_poll = now + 0.1
+                    self._merge_worker_stats(self.worker_pool.poll())
+                if now >= next_progress:
+                    next_progress = now + 1
+                    if progress:
+                        progress({'packets': self.packets_captured - packets_before,
+                                  'elapsed_seconds': time.monotonic() - started})
+        finally:
+            self._stop_workers(timeout=None)
+            self.flush_flows()
+            self.resolver.shutdown()
+            self.batch_writer.stop(timeout=None)
+            self.batch_writer.block_when_full = False
+            self.db_manager.alert_manager.stop()
+            self.raw_capture.close()
+            if self.metrics.enabled:
+                self.write_metrics_snapshot()
+        
+        elapsed = time.monotonic() - started
+        packets = self.packets_captured - packets_before
+        return {
+            'file': str(path),
+            'packets': packets,
+            'connections': self.connection_count - connections_before,
+            'bytes': total_bytes,
+            'capture_seconds': round(last_ts - first_ts, 3) if first_ts is not None else 0,
+            'elapsed_seconds': round(elapsed, 3),
+            'packets_per_second': round(packets / elapsed, 1) if elapsed > 0 else 0.0,
+            'write_queue': self.get_component_stats()['write_queue'],
+        }
+    
+    def get_local_ip(self) -> str:
+        """Dapatkan IP lokal utama dari interface yang dimonitor"""
+        return self.local_addresses.primary_ip(self.interface)
     
     def start_monitoring(self):
         """Mulai monitoring network traffic"""
@@ -199,43 +664,210 @@ class NetworkMonitor:
         
         self.logger.info(f"Starting network monitoring on interface: {self.interface}")
         self.is_monitoring = True
+        self._stop_event.clear()
+        self.started_at = time.time()
+        self.batch_writer.start()
+        self.local_addresses.start()
+        self.rule_engine.start()
+        self._start_workers()
         
         # Start monitoring in separate thread
         self.monitor_thread = threading.Thread(target=self._monitor_loop)
         self.monitor_thread.daemon = True
         self.monitor_thread.start()
     
+    def _capture_tick(self):
+        """Pekerjaan periodik (sekitar sekali per detik) selama capture berjalan"""
+        now = time.monotonic()
+        last_time, last_packets, last_bytes, last_connections, last_busy = self._rate_sample
+        elapsed = now - last_time
+        if elapsed > 0:
+            self.capture_rates = {
+                'packets_per_second': round((self.packets_captured - last_packets) / elapsed, 2),
+                'bytes_per_second': round((self.bytes_captured - last_bytes) / elapsed, 2),
+                'connections_per_second': round((self.connection_count - last_connections) / elapsed, 2),
+            }
+            # Beban = fraksi waktu pipeline sibuk atau isi antrian write, mana yang lebih tinggi
+            queue_stats = self.batch_writer.get_stats()
+            busy = (self._busy_time - last_busy) / elapsed
+            self.sampler.adjust(max(busy, queue_stats['queue_depth'] / queue_stats['queue_capacity']))
+        self._rate_sample = (now, self.packets_captured, self.bytes_captured,
+                             self.connection_count, self._busy_time)
+        
+        if self.worker_pool:
+            self.worker_pool.flush()
+            self._merge_worker_stats(self.worker_pool.poll())
+        self.expire_flows()
+        
+        if self.metrics.enabled and now >= self._next_metrics_snapshot:
+            self._next_metrics_snapshot = now + METRICS_CONFIG['snapshot_interval']
+            self.write_metrics_snapshot()
+    
     def _monitor_loop(self):
-        """Loop monitoring utama"""
+        """Loop capture kontinu: backend di-restart otomatis sampai stop_monitoring dipanggil"""
+        # Filter BPF dipasang di kernel sehingga traffic yang tidak relevan tidak sampai ke Python
+        if self.capture_filter:
+            error = validate_bpf_filter(self.capture_filter)
+            if error:
+                self.logger.error(f"Invalid capture filter '{self.capture_filter}': {error}")
+                self.capture_filter = None
+        
+        restart_delay = MONITORING_CONFIG['capture_restart_delay']
         try:
-            # Sniff packets
-            sniff(
-                iface=self.interface,
-                prn=self.process_packet,
-                timeout=MONITORING_CONFIG['capture_timeout'],
-                count=MONITORING_CONFIG['max_packets']
-            )
-        except Exception as e:
-            self.logger.error(f"Error in monitoring loop: {e}")
+            while not self._stop_event.is_set():
+                self.capture = create_capture_backend(
+                    MONITORING_CONFIG['capture_backend'],
+                    self.interface,
+                    self.capture_filter,
+                    packet_handler=self._dispatch_packet if self.worker_pool else self.process_packet,
+                    frame_handler=self._dispatch_frame if self.worker_pool else self.process_frame,
+                    batch_handler=self._dispatch_frames if self.worker_pool else self.process_frames
+                )
+                started = time.monotonic()
+                try:
+                    self.capture.start()
+                    while not self._stop_event.wait(1):
+                        self._capture_tick()
+                        # Thread capture mati tanpa stop(): interface hilang atau error socket
+                        if not self.capture.is_alive():
+                            break
+                except Exception as e:
+                    self.logger.error(f"Error in monitoring loop: {e}")
+                finally:
+                    if self.capture.is_alive():
+                        try:
+                            self.capture.stop()
+                        except Exception as e:
+                            self.logger.error(f"Error stopping capture: {e}")
+                
+                if self._stop_event.is_set():
+                    break
+                
+                # Capture berhenti sendiri (misalnya interface hilang): restart dengan backoff
+                error = self.capture.last_error()
+                self.capture_restarts += 1
+                if time.monotonic() - started > MONITORING_CONFIG['capture_restart_max_delay']:
+                    restart_delay = MONITORING_CONFIG['capture_restart_delay']
+                self.logger.warning(
+                    f"Capture on {self.interface} stopped ({error or 'capture thread exited'}), "
+                    f"restarting in {restart_delay}s"
+                )
+                self._stop_event.wait(restart_delay)
+                restart_delay = min(restart_delay * 2, MONITORING_CONFIG['capture_restart_max_delay'])
         finally:
+            self.flush_flows()
             self.is_monitoring = False
     
     def stop_monitoring(self):
         """Stop monitoring"""
         self.logger.info("Stopping network monitoring...")
-        self.is_monitoring = False
+        self._stop_event.set()
         
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join(timeout=5)
+        self.is_monitoring = False
+        self._stop_workers()
+        self.resolver.shutdown()
+        
+        # Flush sisa antrian ke database
+        self.batch_writer.stop()
+        self.db_manager.alert_manager.stop()
+        self.local_addresses.stop()
+        self.rule_engine.stop()
+        self.raw_capture.close()
+        if self.metrics.enabled:
+            self.write_metrics_snapshot()
+    
+    def set_metrics_enabled(self, enabled: bool):
+        """Nyalakan/matikan instrumentasi per tahap saat runtime (termasuk worker)"""
+        self.metrics.enabled = enabled
+        if self.worker_pool:
+            self.worker_pool.set_metrics_enabled(enabled)
+        self.logger.info(f"Pipeline metrics {'enabled' if enabled else 'disabled'}")
+    
+    def get_pipeline_metrics(self) -> Dict:
+        """Histogram latency dan counter per tahap (digabung dari semua worker)"""
+        if not self.worker_pool:
+            return self.metrics.get_stats()
+        states = [self.metrics.export()] + [
+            stats['metrics'] for stats in self.worker_pool.worker_stats.values() if stats.get('metrics')
+        ]
+        return PipelineMetrics.combine(states, self.metrics.enabled).get_stats()
+    
+    def get_pipeline_totals(self) -> Dict:
+        """Count dan total durasi per tahap (digabung dari semua worker), tanpa percentile"""
+        totals = self.metrics.totals()
+        if self.worker_pool:
+            for stats in self.worker_pool.worker_stats.values():
+                state = stats.get('metrics') or {'stages': {}, 'counters': {}}
+                for stage, histogram in state['stages'].items():
+                    merged = totals['stages'].setdefault(stage, {'count': 0, 'total': 0})
+                    merged['count'] += histogram['count']
+                    merged['total'] += histogram['total']
+                for name, value in state['counters'].items():
+                    totals['counters'][name] = totals['counters'].get(name, 0) + value
+        return totals
+    
+    def write_metrics_snapshot(self, path=None):
+        """Tulis snapshot metrics ke file JSON (dibaca main.py --stats dari proses lain)"""
+        path = str(path or METRICS_CONFIG['snapshot_path'])
+        try:
+            snapshot = {**self.get_pipeline_metrics(), 'written_at': time.time()}
+            with open(path + '.tmp', 'w') as fh:
+                json.dump(snapshot, fh)
+            os.replace(path + '.tmp', path)
+        except Exception as e:
+            self.logger.error(f"Error writing metrics snapshot: {e}")
+    
+    def get_component_stats(self) -> Dict:
+        """Statistik komponen pipeline (komponen packet digabung dari semua worker jika worker pool aktif)"""
+        stats = {
+            'flow_table': self.flow_table.get_stats(),
+            'write_queue': self.batch_writer.get_stats(),
+            'alerts': self.db_manager.alert_manager.get_stats(),
+            'database': self.db_manager.get_stats(),
+            'sampling': self.sampler.get_stats(),
+            'raw_capture': self.raw_capture.get_stats(),
+            'dns_resolver': self.resolver.get_stats(),
+            'passive_dns': self.passive_dns.get_stats(),
+            'hostname_parser': self.hostnames.get_stats(),
+            # Top hit lebih banyak agar gabungan antar worker tetap akurat untuk /api/rules
+            'detection_rules': self.rule_engine.get_stats(top=100),
+        }
+        if self.worker_pool and self.worker_pool.worker_stats:
+            # Pipeline packet berjalan di worker; database, alert dan resolver tetap milik proses ini
+            stats.update({name: self.worker_pool.merged_stats(name) for name in MERGED_STATS})
+        return stats
+    
+    def get_rule_stats(self, top: int = 20) -> Dict:
+        """Statistik detection rules (hit counter digabung dari semua worker jika worker pool aktif)"""
+        if not (self.worker_pool and self.worker_pool.worker_stats):
+            return self.rule_engine.get_stats(top=top)
+        stats = self.worker_pool.merged_stats('detection_rules')
+        top_hits = sorted(stats.get('top_hits', {}).items(), key=lambda item: item[1], reverse=True)
+        stats['top_hits'] = dict(top_hits[:top])
+        return stats
     
     def get_monitoring_stats(self) -> Dict:
         """Dapatkan statistik monitoring"""
         return {
             'is_monitoring': self.is_monitoring,
             'total_connections': self.connection_count,
-            'connections_per_minute': dict(self.connections_per_minute),
+            'connection_rates': self.rates.get_stats(),
             'interface': self.interface,
-            'local_ip': self.get_local_ip()
+            'local_ip': self.get_local_ip(),
+            'local_addresses': self.local_addresses.get_stats(),
+            'capture_filter': self.capture_filter,
+            'uptime_seconds': round(time.time() - self.started_at, 1) if self.is_monitoring and self.started_at else 0,
+            'capture_restarts': self.capture_restarts,
+            'packets_captured': self.packets_captured,
+            'bytes_captured': self.bytes_captured,
+            'capture_rates': dict(self.capture_rates),
+            'capture_backend': self.capture.get_stats() if self.capture else {'backend': MONITORING_CONFIG['capture_backend']},
+            **self.get_component_stats(),
+            'workers': self.worker_pool.get_stats() if self.worker_pool else None,
+            'metrics_enabled': self.metrics.enabled,
+            'detection_rules': self.get_rule_stats()
         }
     
     def get_network_info(self) -> Dict:
@@ -245,17 +877,15 @@ class NetworkMonitor:
             interface_info = {}
             
             for iface in interfaces:
-                try:
-                    addrs = netifaces.ifaddresses(iface)
-                    if netifaces.AF_INET in addrs:
-                        ip_info = addrs[netifaces.AF_INET][0]
-                        interface_info[iface] = {
-                            'ip': ip_info.get('addr'),
-                            'netmask': ip_info.get('netmask'),
-                            'broadcast': ip_info.get('broadcast')
-                        }
-                except:
-                    continue
+                entry = self.local_addresses.interfaces.get(iface)
+                if entry and entry['ipv4']:
+                    ip_info = entry['ipv4'][0]
+                    interface_info[iface] = {
+                        'ip': ip_info['addr'],
+                        'netmask': ip_info['netmask'],
+                        'broadcast': ip_info['broadcast'],
+                        'ipv6': [info['addr'] for info in entry['ipv6']]
+                    }
             
             return {
                 'available_interfaces': interfaces,
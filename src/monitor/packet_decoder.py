@@ -0,0 +1,206 @@
+"""
+Packet Decoder - Decode header Ethernet/IPv4/IPv6/TCP/UDP langsung dari bytes
+
+Dipakai oleh backend capture cepat (AF_PACKET, ring buffer, PCAP replay) sebagai
+pengganti dissection scapy. Hanya field yang dibutuhkan pipeline yang di-parse,
+memakai struct.unpack_from pada memoryview sehingga frame tidak disalin.
+"""
+import socket
+import struct
+import zlib
+from typing import NamedTuple, Optional, Tuple
+
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+
+# Link type pcap (DLT) yang didukung decode_frame
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+# BSD loopback: address family dalam byte order host pembuat capture
+_NULL_AF_INET6 = {24, 28, 30}
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+# Extension header IPv6 yang dilewati untuk mencari header transport
+IPV6_EXTENSION_HEADERS = {0, 43, 60, 51}
+IPV6_FRAGMENT = 44
+
+_ETHERTYPE = struct.Struct('!H')
+_IPV4_HEADER = struct.Struct('!BxHxxHxB')      # ver_ihl, total_len, flags_frag, proto
+_IPV6_HEADER = struct.Struct('!xxxxHB')        # payload_len, next_header
+_PORTS = struct.Struct('!HH')
+_TCP_OFFSET_FLAGS = struct.Struct('!BB')
+
+class DecodedPacket(NamedTuple):
+    source_ip: str
+    dest_ip: str
+    source_port: Optional[int]
+    dest_port: Optional[int]
+    protocol: str          # "TCP", "UDP" atau "OTHER"
+    length: int            # Panjang frame di wire
+    tcp_flags: int
+    # Payload transport; hanya valid selama callback pemrosesan (bisa menunjuk ke buffer yang dipakai ulang)
+    payload: memoryview
+
+def _transport(view: memoryview, offset: int, proto: int, end: int):
+    """Parse header TCP/UDP, return (sport, dport, nama protocol, tcp_flags, payload)"""
+    if proto == IPPROTO_TCP and end - offset >= 20:
+        sport, dport = _PORTS.unpack_from(view, offset)
+        data_offset, flags = _TCP_OFFSET_FLAGS.unpack_from(view, offset + 12)
+        payload_start = offset + (data_offset >> 4) * 4
+        return sport, dport, 'TCP', flags, view[payload_start:end]
+    if proto == IPPROTO_UDP and end - offset >= 8:
+        sport, dport = _PORTS.unpack_from(view, offset)
+        return sport, dport, 'UDP', 0, view[offset + 8:end]
+    return None, None, 'OTHER', 0, view[offset:offset]
+
+def decode_ip(view: memoryview, offset: int, version_hint: int, frame_length: int) -> Optional[DecodedPacket]:
+    """Decode packet IP mulai dari offset tertentu"""
+    if version_hint == ETH_P_IP:
+        if len(view) - offset < 20:
+            return None
+        ver_ihl, total_length, flags_frag, proto = _IPV4_HEADER.unpack_from(view, offset)
+        header_length = (ver_ihl & 0x0F) * 4
+        end = min(len(view), offset + total_length) if total_length else len(view)
+        source_ip = socket.inet_ntoa(view[offset + 12:offset + 16])
+        dest_ip = socket.inet_ntoa(view[offset + 16:offset + 20])
+
+        if flags_frag & 0x1FFF:
+            # Fragment lanjutan tidak punya header transport
+            return DecodedPacket(source_ip, dest_ip, None, None, 'OTHER', frame_length, 0, view[end:end])
+        sport, dport, name, flags, payload = _transport(view, offset + header_length, proto, end)
+        return DecodedPacket(source_ip, dest_ip, sport, dport, name, frame_length, flags, payload)
+
+    if version_hint == ETH_P_IPV6:
+        if len(view) - offset < 40:
+            return None
+        payload_length, next_header = _IPV6_HEADER.unpack_from(view, offset)
+        source_ip = socket.inet_ntop(socket.AF_INET6, view[offset + 8:offset + 24])
+        dest_ip = socket.inet_ntop(socket.AF_INET6, view[offset + 24:offset + 40])
+        end = min(len(view), offset + 40 + payload_length) if payload_length else len(view)
+
+        position = offset + 40
+        while next_header in IPV6_EXTENSION_HEADERS or next_header == IPV6_FRAGMENT:
+            if end - position < 8:
+                return DecodedPacket(source_ip, dest_ip, None, None, 'OTHER', frame_length, 0, view[end:end])
+            header_next = view[position]
+            if next_header == IPV6_FRAGMENT:
+                fragment_offset = _ETHERTYPE.unpack_from(view, position + 2)[0] >> 3
+                if fragment_offset:
+                    return DecodedPacket(source_ip, dest_ip, None, None, 'OTHER', frame_length, 0, view[end:end])
+                length = 8
+            elif next_header == 51:
+                length = (view[position + 1] + 2) * 4
+            else:
+                length = (view[position + 1] + 1) * 8
+            next_header = header_next
+            position += length
+
+        sport, dport, name, flags, payload = _transport(view, position, next_header, end)
+        return DecodedPacket(source_ip, dest_ip, sport, dport, name, frame_length, flags, payload)
+
+    return None
+
+def link_offset(view: memoryview, linktype: int) -> Optional[Tuple[int, int]]:
+    """Return (ethertype IP, offset header IP) sesuai link type, None jika tidak didukung"""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(view) < 14:
+            return None
+        offset = 12
+        ethertype = _ETHERTYPE.unpack_from(view, offset)[0]
+        while ethertype in (ETH_P_8021Q, ETH_P_8021AD) and len(view) >= offset + 6:
+            offset += 4
+            ethertype = _ETHERTYPE.unpack_from(view, offset)[0]
+        return ethertype, offset + 2
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if not view:
+            return None
+        version = view[0] >> 4
+        return (ETH_P_IP if version == 4 else ETH_P_IPV6 if version == 6 else None), 0
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(view) < 16:
+            return None
+        return _ETHERTYPE.unpack_from(view, 14)[0], 16
+    if linktype == LINKTYPE_LINUX_SLL2:
+        if len(view) < 20:
+            return None
+        return _ETHERTYPE.unpack_from(view, 0)[0], 20
+    if linktype == LINKTYPE_NULL:
+        if len(view) < 4:
+            return None
+        family = struct.unpack_from('<I', view, 0)[0]
+        if family > 0xFFFF:
+            family = struct.unpack_from('>I', view, 0)[0]
+        return (ETH_P_IP if family == 2 else ETH_P_IPV6 if family in _NULL_AF_INET6 else None), 4
+    return None
+
+def decode_frame(frame, linktype: int = LINKTYPE_ETHERNET, wire_length: int = None) -> Optional[DecodedPacket]:
+    """
+    Decode frame sesuai link type pcap, None jika bukan IPv4/IPv6 atau link type tidak didukung.
+
+    wire_length dipakai jika frame terpotong oleh snaplen.
+    """
+    view = frame if isinstance(frame, memoryview) else memoryview(frame)
+    link = link_offset(view, linktype)
+    if link is None:
+        return None
+
+    try:
+        return decode_ip(view, link[1], link[0], wire_length or len(view))
+    except (struct.error, ValueError, IndexError, OSError):
+        # Frame terpotong atau rusak
+        return None
+
+def decode_ethernet(frame, wire_length: int = None) -> Optional[DecodedPacket]:
+    """Decode frame Ethernet (termasuk VLAN tag)"""
+    return decode_frame(frame, LINKTYPE_ETHERNET, wire_length)
+
+def decode_raw_ip(packet, wire_length: int = None) -> Optional[DecodedPacket]:
+    """Decode packet IP tanpa header link layer (DLT_RAW)"""
+    return decode_frame(packet, LINKTYPE_RAW, wire_length)
+
+def flow_shard(frame, linktype: int = LINKTYPE_ETHERNET) -> Tuple[int, bool]:
+    """
+    Hash flow simetris langsung dari bytes header, tanpa decode penuh.
+
+    Kedua arah flow mendapat hash yang sama sehingga bisa dipakai untuk
+    membagi packet ke worker. Return (hash, apakah packet berasal dari port 53).
+    """
+    view = frame if isinstance(frame, memoryview) else memoryview(frame)
+    try:
+        link = link_offset(view, linktype)
+        if link is None:
+            return 0, False
+        ethertype, offset = link
+        if ethertype == ETH_P_IP:
+            proto = view[offset + 9]
+            source, dest = view[offset + 12:offset + 16], view[offset + 16:offset + 20]
+            transport = offset + (view[offset] & 0x0F) * 4
+            fragmented = _ETHERTYPE.unpack_from(view, offset + 6)[0] & 0x1FFF
+        elif ethertype == ETH_P_IPV6:
+            proto = view[offset + 6]
+            source, dest = view[offset + 8:offset + 24], view[offset + 24:offset + 40]
+            transport = offset + 40
+            fragmented = False
+        else:
+            return 0, False
+
+        source_key, dest_key = bytes(source), bytes(dest)
+        source_port = 0
+        if proto in (IPPROTO_TCP, IPPROTO_UDP) and not fragmented and len(view) >= transport + 4:
+            source_key += bytes(view[transport:transport + 2])
+            dest_key += bytes(view[transport + 2:transport + 4])
+            source_port = _ETHERTYPE.unpack_from(view, transport)[0]
+    except (struct.error, IndexError):
+        return 0, False
+
+    if source_key > dest_key:
+        source_key, dest_key = dest_key, source_key
+    return zlib.crc32(source_key + dest_key + bytes((proto,))), source_port == 53
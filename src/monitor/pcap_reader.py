@@ -0,0 +1,139 @@
+"""
+PCAP Reader - Membaca file pcap/pcapng secara streaming
+
+File dibaca lewat buffer berukuran tetap sehingga capture multi-GB tidak pernah
+dimuat penuh ke memori. Setiap record dikembalikan sebagai PcapRecord berisi
+timestamp, data frame, panjang asli di wire dan link type.
+
+Simple Packet Block (pcapng) tidak membawa timestamp: record-nya memakai
+timestamp packet sebelumnya, atau None jika belum ada packet bertimestamp
+(pipeline lalu memakai jam dinding).
+"""
+import struct
+from typing import BinaryIO, Dict, Iterator, NamedTuple, Optional
+
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+PCAPNG_IDB = 0x00000001
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+PCAPNG_OPT_IF_TSRESOL = 9
+
+READ_BUFFER_SIZE = 1 << 20
+
+class PcapRecord(NamedTuple):
+    timestamp: Optional[float]
+    data: bytes
+    wire_length: int
+    linktype: int
+
+class PcapFormatError(ValueError):
+    pass
+
+def _read_exact(fh: BinaryIO, size: int) -> bytes:
+    data = fh.read(size)
+    if len(data) != size:
+        raise EOFError
+    return data
+
+def _iter_pcap(fh: BinaryIO, header: bytes) -> Iterator[PcapRecord]:
+    """Format pcap klasik (microsecond/nanosecond, little/big endian)"""
+    for endian in ('<', '>'):
+        magic = struct.unpack(endian + 'I', header[:4])[0]
+        if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+            break
+    else:
+        raise PcapFormatError("Not a pcap file")
+
+    divisor = 1e9 if magic == PCAP_MAGIC_NS else 1e6
+    rest = _read_exact(fh, 20)
+    linktype = struct.unpack(endian + 'I', rest[16:20])[0] & 0x0FFFFFFF
+    record_header = struct.Struct(endian + 'IIII')
+
+    while True:
+        try:
+            seconds, fraction, captured, original = record_header.unpack(_read_exact(fh, 16))
+            data = _read_exact(fh, captured)
+        except EOFError:
+            return
+        yield PcapRecord(seconds + fraction / divisor, data, original, linktype)
+
+def _parse_tsresol(options: bytes, endian: str) -> float:
+    """Ambil if_tsresol dari opsi Interface Description Block"""
+    position = 0
+    while position + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, position)
+        position += 4
+        if code == 0:
+            break
+        if code == PCAPNG_OPT_IF_TSRESOL and length >= 1:
+            value = options[position]
+            if value & 0x80:
+                return 2.0 ** -(value & 0x7F)
+            return 10.0 ** -value
+        position += (length + 3) & ~3
+    return 1e-6
+
+def _iter_pcapng(fh: BinaryIO, header: bytes) -> Iterator[PcapRecord]:
+    """Format pcapng: SHB, IDB, EPB dan SPB; block lain dilewati"""
+    endian = '<'
+    interfaces: Dict[int, tuple] = {}
+    pending = header
+    # Timestamp EPB terakhir, dipakai untuk SPB yang tidak punya timestamp
+    last_timestamp = None
+
+    while True:
+        try:
+            block_header = pending if pending else _read_exact(fh, 8)
+            pending = b''
+            block_type = struct.unpack('<I', block_header[:4])[0]
+
+            if block_type == PCAPNG_SHB:
+                byte_order = _read_exact(fh, 4)
+                if struct.unpack('<I', byte_order)[0] == PCAPNG_BYTE_ORDER_MAGIC:
+                    endian = '<'
+                elif struct.unpack('>I', byte_order)[0] == PCAPNG_BYTE_ORDER_MAGIC:
+                    endian = '>'
+                else:
+                    raise PcapFormatError("Invalid pcapng byte-order magic")
+                block_length = struct.unpack(endian + 'I', block_header[4:8])[0]
+                _read_exact(fh, block_length - 12)
+                # Section baru: daftar interface di-reset
+                interfaces = {}
+                continue
+
+            block_type, block_length = struct.unpack(endian + 'II', block_header)
+            if block_length < 12:
+                raise PcapFormatError(f"Invalid pcapng block length {block_length}")
+            body = _read_exact(fh, block_length - 8)[:-4]
+        except EOFError:
+            return
+
+        if block_type == PCAPNG_IDB:
+            linktype, _reserved, _snaplen = struct.unpack_from(endian + 'HHI', body, 0)
+            interfaces[len(interfaces)] = (linktype, _parse_tsresol(body[8:], endian))
+
+        elif block_type == PCAPNG_EPB:
+            interface_id, ts_high, ts_low, captured, original = struct.unpack_from(endian + 'IIIII', body, 0)
+            linktype, resolution = interfaces.get(interface_id, (1, 1e-6))
+            last_timestamp = ((ts_high << 32) | ts_low) * resolution
+            yield PcapRecord(last_timestamp, body[20:20 + captured], original, linktype)
+
+        elif block_type == PCAPNG_SPB:
+            original = struct.unpack_from(endian + 'I', body, 0)[0]
+            linktype, _ = interfaces.get(0, (1, 1e-6))
+            yield PcapRecord(last_timestamp, body[4:4 + original], original, linktype)
+
+def read_pcap(path, buffer_size: int = READ_BUFFER_SIZE) -> Iterator[PcapRecord]:
+    """Iterasi record dari file pcap atau pcapng (format dideteksi dari magic)"""
+    with open(path, 'rb', buffering=buffer_size) as fh:
+        header = fh.read(4)
+        if len(header) < 4:
+            return
+        if struct.unpack('<I', header)[0] == PCAPNG_SHB:
+            yield from _iter_pcapng(fh, header + _read_exact(fh, 4))
+        else:
+            yield from _iter_pcap(fh, header)
@@ -0,0 +1,193 @@
+"""
+Prometheus Exporter - Metrics monitor dalam format text exposition (/metrics)
+
+Semua nilai dibaca dari counter dan gauge di memori yang sudah diperbarui
+pipeline secara incremental (packet, bytes, flow, drop, antrian, cache,
+alert, laju capture), sehingga satu scrape tidak menyentuh SQLite dan tidak
+menghitung ulang percentile histogram.
+"""
+from typing import Dict, List, Optional
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'netmon'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        return repr(value)
+    return str(int(value))
+
+class MetricsWriter:
+    """Penyusun output exposition; sampel dengan nama sama harus ditulis berurutan"""
+
+    def __init__(self, prefix: str = PREFIX):
+        self.prefix = prefix
+        self.lines: List[str] = []
+        self._declared = set()
+
+    def _declare(self, name: str, metric_type: str, help_text: str) -> str:
+        name = f'{self.prefix}_{name}'
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f'# HELP {name} {help_text}')
+            self.lines.append(f'# TYPE {name} {metric_type}')
+        return name
+
+    def _sample(self, name: str, value, labels: Optional[Dict] = None):
+        if labels:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            name = f'{name}{{{label_text}}}'
+        self.lines.append(f'{name} {_format_value(value)}')
+
+    def counter(self, name: str, help_text: str, value, labels: Optional[Dict] = None):
+        if value is not None:
+            self._sample(self._declare(f'{name}_total', 'counter', help_text), value, labels)
+
+    def gauge(self, name: str, help_text: str, value, labels: Optional[Dict] = None):
+        if value is not None:
+            self._sample(self._declare(name, 'gauge', help_text), value, labels)
+
+    def summary(self, name: str, help_text: str, count: int, total: float,
+                labels: Optional[Dict] = None):
+        """Summary tanpa quantile (hanya _sum dan _count)"""
+        name = self._declare(name, 'summary', help_text)
+        self._sample(f'{name}_sum', total, labels)
+        self._sample(f'{name}_count', count, labels)
+
+    def render(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+def _ratio(hits: int, total: int) -> float:
+    return round(hits / total, 4) if total else 0.0
+
+def render_metrics(monitor) -> str:
+    """Render metrics NetworkMonitor dalam format Prometheus text exposition 0.0.4"""
+    out = MetricsWriter()
+    iface = {'interface': monitor.interface}
+    components = monitor.get_component_stats()
+
+    # Capture
+    out.gauge('monitoring', 'Whether packet capture is running', monitor.is_monitoring, iface)
+    out.counter('capture_restarts', 'Capture backend restarts after failure', monitor.capture_restarts, iface)
+    out.counter('packets_captured', 'Packets read from the interface', monitor.packets_captured, iface)
+    out.counter('bytes_captured', 'Bytes on the wire read from the interface', monitor.bytes_captured, iface)
+    out.counter('packets_processed', 'Packets that went through the full pipeline',
+                monitor.connection_count, iface)
+    out.counter('connections', 'Connections recorded (scaled by sampling rate)', monitor.rates.total, iface)
+    rates = monitor.capture_rates
+    out.gauge('capture_packets_per_second', 'Packet capture rate over the last tick',
+              rates['packets_per_second'], iface)
+    out.gauge('capture_bytes_per_second', 'Byte capture rate over the last tick',
+              rates['bytes_per_second'], iface)
+    out.gauge('connections_per_second', 'Processed packet rate over the last tick',
+              rates['connections_per_second'], iface)
+    out.gauge('connections_last_minute', 'Connections recorded in the last 60 seconds',
+              monitor.rates.count(60), iface)
+
+    if monitor.capture is not None:
+        capture = monitor.capture.get_stats()
+        labels = {**iface, 'backend': capture['backend']}
+        out.counter('kernel_packets', 'Packets received by the kernel socket', capture.get('kernel_packets'), labels)
+        out.counter('kernel_drops', 'Packets dropped by the kernel before capture', capture.get('kernel_drops'), labels)
+        out.counter('kernel_queue_freezes', 'TPACKET_V3 ring queue freezes', capture.get('kernel_queue_freezes'), labels)
+
+    # Flow table
+    flows = components['flow_table']
+    out.gauge('flows_active', 'Flows currently held in the flow table', flows['active_flows'])
+    out.counter('flows_created', 'Flows created', flows['flows_created'])
+    out.counter('flows_emitted', 'Flows exported to the write queue', flows['flows_emitted'])
+    for reason in ('closed_fin_rst', 'expired_idle', 'expired_active', 'evicted'):
+        out.counter('flows_closed', 'Flows closed by reason', flows[reason], {'reason': reason})
+
+    # Antrian penulisan database
+    writes = components['write_queue']
+    out.gauge('write_queue_depth', 'Records waiting in the database write queue', writes['queue_depth'])
+    out.gauge('write_queue_capacity', 'Database write queue capacity', writes['queue_capacity'])
+    out.counter('write_enqueued', 'Records submitted to the write queue', writes['enqueued'])
+    out.counter('write_rows', 'Records written to the database', writes['written'])
+    out.counter('write_dropped', 'Records dropped because the write queue was full', writes['dropped'])
+    out.counter('write_batches', 'Database write batches', writes['batches'])
+    out.counter('write_errors', 'Failed database write batches', writes['write_errors'])
+
+    database = components['database']
+    out.counter('db_write_transactions', 'SQLite write transactions committed', database['write_transactions'])
+    out.counter('db_write_errors', 'SQLite write transactions rolled back', database['write_errors'])
+    out.counter('db_write_seconds', 'Time spent inside SQLite write transactions', database['write_seconds'])
+    out.counter('db_write_wait_seconds', 'Time spent waiting for the shared writer connection',
+                database['write_wait_seconds'])
+    out.counter('db_reads', 'Read queries served from the reader pool', database['reads'])
+
+    # Worker pool
+    if monitor.worker_pool:
+        pool = monitor.worker_pool.get_stats()
+        out.gauge('workers', 'Configured packet worker processes', pool['workers'])
+        out.gauge('workers_alive', 'Packet worker processes alive', pool['alive'])
+        out.gauge('worker_pending_frames', 'Frames buffered in unsent worker batches', pool['pending'])
+        out.counter('worker_dispatched', 'Frames dispatched to packet workers', pool['dispatched'])
+        out.counter('worker_dropped', 'Frames dropped because a worker queue was full', pool['dropped'])
+        for worker in pool['per_worker']:
+            out.counter('worker_packets', 'Packets processed per worker', worker['connections'],
+                        {'worker': worker['worker_id']})
+
+    # Sampling
+    sampling = components['sampling']
+    out.gauge('sampling_rate', 'Current 1-in-N sampling rate', sampling['rate'])
+    out.counter('sampling_seen', 'Packets offered to the sampler', sampling['seen'])
+    out.counter('sampling_selected', 'Packets selected by the sampler', sampling['sampled'])
+
+    # Cache DNS (rasio dihitung ulang dari counter agar benar saat digabung antar worker)
+    resolver = components['dns_resolver']
+    for result in ('hits', 'negative_hits', 'misses'):
+        out.counter('dns_cache_requests', 'Reverse DNS cache requests by result', resolver[result],
+                    {'result': result})
+    out.gauge('dns_cache_hit_ratio', 'Reverse DNS cache hit ratio',
+              _ratio(resolver['hits'] + resolver['negative_hits'],
+                     resolver['hits'] + resolver['negative_hits'] + resolver['misses']))
+    out.gauge('dns_cache_entries', 'Reverse DNS cache entries', resolver['cache_entries'])
+    out.gauge('dns_pending_lookups', 'Reverse DNS lookups in flight', resolver['pending'])
+    out.counter('dns_lookups', 'Reverse DNS lookups sent', resolver['lookups'])
+    out.counter('dns_lookup_failures', 'Reverse DNS lookups that failed', resolver['failures'])
+
+    passive = components['passive_dns']
+    for result in ('hits', 'misses'):
+        out.counter('passive_dns_lookups', 'Passive DNS map lookups by result', passive[result],
+                    {'result': result})
+    out.gauge('passive_dns_hit_ratio', 'Passive DNS map hit ratio',
+              _ratio(passive['hits'], passive['hits'] + passive['misses']))
+    out.gauge('passive_dns_entries', 'Passive DNS map entries', passive['entries'])
+    out.counter('passive_dns_answers', 'Address records learned from DNS responses', passive['answers'])
+    out.counter('passive_dns_parse_errors', 'DNS responses that failed to parse', passive['parse_errors'])
+
+    hostnames = components['hostname_parser']
+    out.counter('hostname_inspected', 'First flow payloads inspected for a hostname', hostnames['inspected'])
+    for source, key in (('tls', 'tls_sni'), ('http', 'http_host')):
+        out.counter('hostname_matches', 'Hostnames extracted by source', hostnames[key], {'source': source})
+
+    # Alert
+    alerts = components['alerts']
+    out.counter('alerts_raised', 'Alerts raised (new rows)', alerts['raised'])
+    out.counter('alerts_suppressed', 'Alerts merged into an existing row', alerts['suppressed'])
+    out.counter('alert_write_errors', 'Failed alert write batches', alerts['write_errors'])
+    out.gauge('alert_active_keys', 'Alert dedup keys tracked in memory', alerts['active_keys'])
+
+    raw = components['raw_capture']
+    out.counter('raw_capture_packets', 'Packets written to raw pcap files', raw['packets_written'])
+    out.counter('raw_capture_bytes', 'Bytes written to raw pcap files', raw['bytes_written'])
+
+    # Latency per tahap (hanya sum/count; percentile tersedia di /api/internal/metrics)
+    totals = monitor.get_pipeline_totals()
+    out.gauge('stage_metrics_enabled', 'Whether per-stage latency instrumentation is on',
+              monitor.metrics.enabled)
+    for stage, histogram in totals['stages'].items():
+        out.summary('stage_duration_seconds', 'Time spent per pipeline stage',
+                    histogram['count'], histogram['total'] / 1e9, {'stage': stage})
+    for name, value in sorted(totals['counters'].items()):
+        out.counter('pipeline_events', 'Packets leaving the pipeline early by reason', value, {'event': name})
+
+    return out.render()
@@ -0,0 +1,159 @@
+"""
+Rate Tracker - Counter sliding window berukuran tetap untuk laju koneksi
+
+Setiap counter adalah ring buffer dengan jumlah slot tetap: slot lama ditimpa
+saat waktu bergeser, sehingga memori tidak bertambah berapapun lamanya
+monitoring berjalan. Global dicatat di tiga resolusi (detik, menit, jam);
+per source/destination IP dicatat per menit dengan jumlah IP dibatasi (LRU).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config.config import MONITORING_CONFIG
+
+# nama resolusi -> (detik per slot, jumlah slot)
+RESOLUTIONS = {
+    'second': (1, 300),      # 5 menit
+    'minute': (60, 1440),    # 24 jam
+    'hour': (3600, 720),     # 30 hari
+}
+# Counter per IP: per menit selama 1 jam
+KEY_RESOLUTION = (60, 60)
+
+class RingCounter:
+    """Jumlah event per slot waktu dalam ring buffer"""
+
+    __slots__ = ('resolution', 'slots', 'counts', 'buckets')
+
+    def __init__(self, resolution: int, slots: int):
+        self.resolution = resolution
+        self.slots = slots
+        self.counts = [0] * slots
+        # Nomor bucket (waktu // resolution) yang sedang menempati slot
+        self.buckets = [-1] * slots
+
+    def add(self, timestamp: float, count: int = 1):
+        bucket = int(timestamp // self.resolution)
+        index = bucket % self.slots
+        if self.buckets[index] != bucket:
+            if self.buckets[index] > bucket:
+                # Lebih tua dari isi ring (packet sangat terlambat)
+                return
+            self.buckets[index] = bucket
+            self.counts[index] = 0
+        self.counts[index] += count
+
+    def get(self, bucket: int) -> int:
+        index = bucket % self.slots
+        return self.counts[index] if self.buckets[index] == bucket else 0
+
+    def current(self, now: float) -> int:
+        """Jumlah pada bucket yang sedang berjalan"""
+        return self.get(int(now // self.resolution))
+
+    def total(self, seconds: float, now: float) -> int:
+        """Jumlah dalam window terakhir (dibulatkan ke slot, maksimal seluruh ring)"""
+        last = int(now // self.resolution)
+        count = min(self.slots, max(1, int(-(-seconds // self.resolution))))
+        return sum(self.get(bucket) for bucket in range(last - count + 1, last + 1))
+
+    def series(self, points: int, now: float) -> List[Dict]:
+        """Deret waktu [{'timestamp', 'count'}] untuk points bucket terakhir"""
+        last = int(now // self.resolution)
+        points = min(points, self.slots)
+        return [
+            {'timestamp': bucket * self.resolution, 'count': self.get(bucket)}
+            for bucket in range(last - points + 1, last + 1)
+        ]
+
+class RateTracker:
+    def __init__(self, max_tracked_ips: int = None):
+        self.max_tracked_ips = max_tracked_ips or MONITORING_CONFIG['rate_max_tracked_ips']
+        self.counters = {name: RingCounter(*spec) for name, spec in RESOLUTIONS.items()}
+        self.sources: 'OrderedDict[str, RingCounter]' = OrderedDict()
+        self.destinations: 'OrderedDict[str, RingCounter]' = OrderedDict()
+        self.total = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _record_key(self, table: OrderedDict, key: str, timestamp: float, count: int):
+        counter = table.get(key)
+        if counter is None:
+            if len(table) >= self.max_tracked_ips:
+                table.popitem(last=False)
+                self.evictions += 1
+            counter = table[key] = RingCounter(*KEY_RESOLUTION)
+        else:
+            table.move_to_end(key)
+        counter.add(timestamp, count)
+
+    def record(self, source_ip: Optional[str] = None, dest_ip: Optional[str] = None,
+               timestamp: float = None, count: int = 1):
+        """Catat event koneksi (timestamp packet saat replay, default waktu sekarang)"""
+        timestamp = timestamp or time.time()
+        with self._lock:
+            self.total += count
+            for counter in self.counters.values():
+                counter.add(timestamp, count)
+            if source_ip:
+                self._record_key(self.sources, source_ip, timestamp, count)
+            if dest_ip:
+                self._record_key(self.destinations, dest_ip, timestamp, count)
+
+    def current(self, resolution: str = 'minute', now: float = None) -> int:
+        """Jumlah pada bucket yang sedang berjalan (misalnya menit ini)"""
+        return self.counters[resolution].current(now or time.time())
+
+    def _counter_for(self, seconds: float) -> RingCounter:
+        """Resolusi paling halus yang masih mencakup window"""
+        for counter in self.counters.values():
+            if seconds <= counter.resolution * counter.slots:
+                return counter
+        return self.counters['hour']
+
+    def count(self, seconds: float, now: float = None) -> int:
+        """Jumlah event dalam window terakhir"""
+        with self._lock:
+            return self._counter_for(seconds).total(seconds, now or time.time())
+
+    def rate(self, seconds: float = 60, now: float = None) -> float:
+        """Rata-rata event per detik dalam window terakhir"""
+        return round(self.count(seconds, now) / seconds, 2) if seconds > 0 else 0.0
+
+    def series(self, resolution: str = 'minute', points: int = 60, now: float = None) -> List[Dict]:
+        with self._lock:
+            return self.counters[resolution].series(points, now or time.time())
+
+    def top(self, kind: str = 'destination', limit: int = 10, seconds: float = 300,
+            now: float = None) -> List[Dict]:
+        """IP dengan event terbanyak dalam window (maksimal 1 jam)"""
+        table = self.sources if kind == 'source' else self.destinations
+        now = now or time.time()
+        with self._lock:
+            counts = [(ip, counter.total(seconds, now)) for ip, counter in table.items()]
+        counts = sorted((item for item in counts if item[1]), key=lambda item: item[1], reverse=True)
+        return [{'ip': ip, 'count': count} for ip, count in counts[:limit]]
+
+    def count_for(self, ip_address: str, kind: str = 'destination', seconds: float = 60,
+                  now: float = None) -> int:
+        table = self.sources if kind == 'source' else self.destinations
+        with self._lock:
+            counter = table.get(ip_address)
+            return counter.total(seconds, now or time.time()) if counter else 0
+
+    def get_stats(self, now: float = None) -> Dict:
+        """Ringkasan kecil berukuran tetap untuk /api/stats"""
+        now = now or time.time()
+        return {
+            'total': self.total,
+            'last_minute': self.count(60, now),
+            'last_5_minutes': self.count(300, now),
+            'last_hour': self.count(3600, now),
+            'last_24_hours': self.count(86400, now),
+            'per_second_1m': self.rate(60, now),
+            'tracked_sources': len(self.sources),
+            'tracked_destinations': len(self.destinations),
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,219 @@
+"""
+Raw Capture - Penyimpanan packet mentah bertingkat di pcap side-file
+
+Mode (RAW_CAPTURE_CONFIG['mode']):
+- off       : tidak ada data mentah yang disimpan (default)
+- suspicious: hanya packet dari koneksi/flow yang ditandai mencurigakan
+- all       : semua packet yang diproses
+
+Packet ditulis ke file pcap yang dirotasi berdasarkan ukuran. Setiap baris
+database menyimpan header packet pertama sebagai blob biner kecil dan
+referensi "nama_file:offset" ke record pcap-nya, sehingga packet lengkap
+bisa diambil belakangan dari dashboard.
+"""
+import logging
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from config.config import RAW_CAPTURE_CONFIG
+
+MODES = ('off', 'suspicious', 'all')
+
+_PCAP_GLOBAL_HEADER = struct.Struct('<IHHiIII')
+_PCAP_RECORD_HEADER = struct.Struct('<IIII')
+PCAP_MAGIC = 0xA1B2C3D4
+SNAPLEN = 65535
+# Toleransi until: jam raw capture bisa sedikit di belakang last_seen flow (capture live)
+UNTIL_SLACK = 1.0
+
+def pcap_bytes(linktype: int, records: List[Tuple[float, bytes, int]]) -> bytes:
+    """Susun file pcap lengkap dari list (timestamp, data, wire_length)"""
+    parts = [_PCAP_GLOBAL_HEADER.pack(PCAP_MAGIC, 2, 4, 0, 0, SNAPLEN, linktype)]
+    for timestamp, data, wire_length in records:
+        seconds = int(timestamp)
+        parts.append(_PCAP_RECORD_HEADER.pack(seconds, int((timestamp - seconds) * 1e6), len(data), wire_length))
+        parts.append(data)
+    return b''.join(parts)
+
+class RawCaptureStore:
+    def __init__(self, mode: str = None, directory=None, max_file_size: int = None,
+                 max_files: int = None, header_bytes: int = None, prefix: str = 'raw'):
+        self.logger = logging.getLogger(__name__)
+        self.mode = mode or RAW_CAPTURE_CONFIG['mode']
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown raw capture mode '{self.mode}'")
+        self.directory = Path(directory or RAW_CAPTURE_CONFIG['directory'])
+        self.max_file_size = max_file_size or RAW_CAPTURE_CONFIG['max_file_size']
+        self.max_files = max_files or RAW_CAPTURE_CONFIG['max_files']
+        self.header_bytes = header_bytes or RAW_CAPTURE_CONFIG['header_bytes']
+        # Nama file per penulis (misalnya per proses worker); rotasi hanya menghapus file sendiri
+        self.prefix = prefix
+        self._file = None
+        self._file_name = None
+        self._linktype = None
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'packets_written': 0,
+            'bytes_written': 0,
+            'files_rotated': 0,
+            'write_errors': 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    def wants(self, is_suspicious: bool) -> bool:
+        """Apakah packet dengan status ini perlu disimpan mentah"""
+        return self.mode == 'all' or (self.mode == 'suspicious' and bool(is_suspicious))
+
+    def headers(self, frame, payload_length: int = 0) -> bytes:
+        """Blob header (link + IP + transport), tanpa payload dan dibatasi header_bytes"""
+        length = max(0, len(frame) - payload_length) or len(frame)
+        return bytes(frame[:min(length, self.header_bytes)])
+
+    def _open(self, linktype: int):
+        """Buka file pcap baru dan hapus file lama di luar max_files"""
+        if self._file is not None:
+            self._file.close()
+            self.stats['files_rotated'] += 1
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sequence += 1
+        self._file_name = f"{self.prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{self._sequence}.pcap"
+        self._file = open(self.directory / self._file_name, 'wb')
+        self._file.write(_PCAP_GLOBAL_HEADER.pack(PCAP_MAGIC, 2, 4, 0, 0, SNAPLEN, linktype))
+        self._linktype = linktype
+
+        files = sorted(self.directory.glob(f'{self.prefix}-[0-9]*.pcap'), key=lambda path: path.stat().st_mtime)
+        for path in files[:-self.max_files]:
+            try:
+                path.unlink()
+            except OSError as e:
+                self.logger.warning(f"Could not remove old raw capture {path}: {e}")
+
+    def append(self, frame, wire_length: int, linktype: int, timestamp: float = None) -> Optional[str]:
+        """Tulis satu packet, return referensi 'file:offset' atau None jika gagal"""
+        timestamp = timestamp or time.time()
+        data = bytes(frame)
+        try:
+            with self._lock:
+                if (self._file is None or linktype != self._linktype
+                        or self._file.tell() + len(data) > self.max_file_size):
+                    self._open(linktype)
+                offset = self._file.tell()
+                seconds = int(timestamp)
+                self._file.write(_PCAP_RECORD_HEADER.pack(
+                    seconds, int((timestamp - seconds) * 1e6), len(data), wire_length or len(data)
+                ))
+                self._file.write(data)
+                self.stats['packets_written'] += 1
+                self.stats['bytes_written'] += len(data)
+                return f'{self._file_name}:{offset}'
+        except OSError as e:
+            self.stats['write_errors'] += 1
+            self.logger.error(f"Error writing raw capture: {e}")
+            return None
+
+    def read(self, ref: str, count: int = 1, match=None,
+             until: float = None) -> Tuple[int, List[Tuple[float, bytes, int]]]:
+        """
+        Baca packet mulai dari referensi.
+
+        match(data, linktype) opsional dipakai untuk flow: hanya packet yang cocok yang
+        dikembalikan, sampai count packet. Jika until (last_seen flow) diberikan, pembacaan
+        berlanjut ke file hasil rotasi berikutnya sampai melewati until.
+        Return (linktype, [(timestamp, data, wire_length)]).
+        """
+        name, _, offset = ref.rpartition(':')
+        name = Path(name).name
+        self.flush()
+
+        records = []
+        linktype, passed = self._read_file(self.directory / name, int(offset), count, match, until, records)
+        if until is not None and match is not None:
+            for path in self._following(name):
+                if passed or len(records) >= count:
+                    break
+                try:
+                    file_linktype, passed = self._read_file(path, _PCAP_GLOBAL_HEADER.size, count,
+                                                            match, until, records, linktype)
+                except FileNotFoundError:
+                    # Dihapus rotasi di antara glob dan open
+                    continue
+                if file_linktype != linktype:
+                    break
+        return linktype, records
+
+    @staticmethod
+    def _read_file(path: Path, offset: int, count: int, match, until: Optional[float],
+                   records: List, linktype: int = None) -> Tuple[int, bool]:
+        """
+        Tambahkan record yang cocok dari satu file ke records.
+        Return (linktype file, apakah sudah ada packet setelah until).
+        """
+        passed = False
+        with open(path, 'rb') as fh:
+            file_linktype = _PCAP_GLOBAL_HEADER.unpack(fh.read(_PCAP_GLOBAL_HEADER.size))[6]
+            if linktype is not None and file_linktype != linktype:
+                return file_linktype, True
+            fh.seek(offset)
+            while len(records) < count:
+                header = fh.read(_PCAP_RECORD_HEADER.size)
+                if len(header) < _PCAP_RECORD_HEADER.size:
+                    break
+                seconds, micros, captured, wire_length = _PCAP_RECORD_HEADER.unpack(header)
+                data = fh.read(captured)
+                timestamp = seconds + micros / 1e6
+                # Packet setelah until milik flow lain dengan tuple sama; file tetap dibaca
+                # sampai habis karena append dari beberapa thread bisa sedikit tidak urut
+                if until is not None and timestamp > until + UNTIL_SLACK:
+                    passed = True
+                    continue
+                if match is None or match(data, file_linktype):
+                    records.append((timestamp, data, wire_length))
+        return file_linktype, passed
+
+    def _following(self, name: str) -> List[Path]:
+        """File milik penulis yang sama yang dibuat setelah file name, urut waktu rotasi"""
+        prefix = name.rsplit('-', 3)[0]
+
+        def order(path: Path):
+            sequence = path.stem.rsplit('-', 1)[-1]
+            return path.stat().st_mtime, int(sequence) if sequence.isdigit() else 0
+
+        files = []
+        for path in self.directory.glob(f'{prefix}-[0-9]*.pcap'):
+            try:
+                files.append((order(path), path))
+            except OSError:
+                continue
+        files.sort(key=lambda item: item[0])
+        names = [path.name for _, path in files]
+        if name not in names:
+            return []
+        return [path for _, path in files[names.index(name) + 1:]]
+
+    def flush(self):
+        """Tulis buffer file aktif ke disk agar bisa dibaca proses lain"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'mode': self.mode,
+            'current_file': self._file_name,
+        }
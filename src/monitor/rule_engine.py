@@ -0,0 +1,303 @@
+"""
+Rule Engine - Deteksi koneksi mencurigakan dengan rule yang dikompilasi sekali
+
+Konfigurasi dikompilasi menjadi:
+- bitmap port (65536 bit) untuk cek port O(1)
+- multibit trie (stride 8 bit) untuk longest-prefix match CIDR IPv4/IPv6
+- automaton Aho-Corasick untuk pencocokan substring domain dalam satu pass
+"""
+import ipaddress
+import json
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from config.config import DETECTION_RULES, ALERT_THRESHOLDS
+
+class PortBitmap:
+    def __init__(self, ports: Iterable[int] = ()):
+        self.bits = bytearray(8192)
+        for port in ports:
+            self.add(port)
+
+    def add(self, port: int):
+        self.bits[port >> 3] |= 1 << (port & 7)
+
+    def __contains__(self, port) -> bool:
+        if port is None or not 0 <= port <= 65535:
+            return False
+        return bool(self.bits[port >> 3] & (1 << (port & 7)))
+
+class _TrieNode:
+    __slots__ = ('children', 'entries', 'rule')
+
+    def __init__(self):
+        self.children: Dict[int, '_TrieNode'] = {}
+        # Prefix yang berakhir di tengah stride, diekspansi ke semua nilai byte
+        self.entries: Dict[int, tuple] = {}
+        # Prefix yang berakhir tepat di batas stride node ini
+        self.rule = None
+
+class PrefixTrie:
+    """Multibit trie dengan stride 8 bit (4 level untuk IPv4, 16 untuk IPv6)"""
+
+    def __init__(self):
+        self.root = _TrieNode()
+        self.size = 0
+
+    def insert(self, network, rule):
+        prefix = network.network_address.packed
+        length = network.prefixlen
+        node = self.root
+
+        for byte in prefix[:length // 8]:
+            node = node.children.setdefault(byte, _TrieNode())
+
+        remainder = length % 8
+        if remainder == 0:
+            node.rule = rule
+        else:
+            span = 1 << (8 - remainder)
+            base = prefix[length // 8] & (0xFF ^ (span - 1))
+            for value in range(base, base + span):
+                existing = node.entries.get(value)
+                if existing is None or existing[0] <= length:
+                    node.entries[value] = (length, rule)
+        self.size += 1
+
+    def longest_match(self, packed: bytes):
+        best = None
+        node = self.root
+        for byte in packed:
+            if node.rule is not None:
+                best = node.rule
+            entry = node.entries.get(byte)
+            if entry is not None:
+                best = entry[1]
+            node = node.children.get(byte)
+            if node is None:
+                return best
+        if node.rule is not None:
+            best = node.rule
+        return best
+
+class AhoCorasick:
+    """Automaton untuk mencari banyak pola substring sekaligus"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Optional[str]] = [None]
+        self.size = 0
+
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+            state = next_state
+        self.output[state] = pattern
+        self.size += 1
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.output[next_state] is None:
+                    # Warisi pola dari suffix terpanjang agar match tidak terlewat
+                    self.output[next_state] = self.output[self.fail[next_state]]
+
+    def search(self, text: str) -> Optional[str]:
+        """Return pola pertama yang ditemukan di text, None jika tidak ada"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+class CompiledRules:
+    def __init__(self, ports: Iterable[int], trusted_networks: Iterable[str],
+                 suspicious_networks: Iterable[str], domains: Iterable[str]):
+        self.ports = PortBitmap(ports)
+        self.port_count = len(set(ports))
+        self.v4_trie = PrefixTrie()
+        self.v6_trie = PrefixTrie()
+        for verdict, networks in ((False, trusted_networks), (True, suspicious_networks)):
+            for cidr in networks:
+                network = ipaddress.ip_network(cidr, strict=False)
+                trie = self.v4_trie if network.version == 4 else self.v6_trie
+                prefix = 'net' if verdict else 'trusted'
+                trie.insert(network, (verdict, f'{prefix}:{network}'))
+        self.domains = AhoCorasick(domain.lower() for domain in domains)
+
+class RuleEngine:
+    def __init__(self, rules_file: str = None, reload_interval: float = None):
+        self.logger = logging.getLogger(__name__)
+        self.rules_file = rules_file or DETECTION_RULES.get('rules_file')
+        self.reload_interval = reload_interval or DETECTION_RULES['reload_interval']
+        self.hits: Dict[str, int] = {}
+        self.generation = 0
+        self.last_reload = None
+        self._rules_mtime = None
+        self._lock = threading.Lock()
+        # Hit counter diperbarui dari thread capture dan thread resolver
+        self._hits_lock = threading.Lock()
+        self.watch_thread = None
+        self._stop_event = threading.Event()
+        self.rules = self._compile()
+
+    def _load_rules_file(self) -> Dict:
+        """Baca rule tambahan dari file JSON (jika dikonfigurasi)"""
+        if not self.rules_file:
+            return {}
+        path = Path(self.rules_file)
+        try:
+            self._rules_mtime = path.stat().st_mtime
+            with open(path, encoding='utf-8') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            self._rules_mtime = None
+            return {}
+
+    def _compile(self) -> CompiledRules:
+        extra = self._load_rules_file()
+        rules = CompiledRules(
+            ports=list(DETECTION_RULES['suspicious_ports']) + extra.get('suspicious_ports', []),
+            trusted_networks=list(DETECTION_RULES['trusted_networks']) + extra.get('trusted_networks', []),
+            suspicious_networks=list(DETECTION_RULES['suspicious_networks']) + extra.get('suspicious_networks', []),
+            domains=list(ALERT_THRESHOLDS['suspicious_domains']) + extra.get('suspicious_domains', []),
+        )
+        self.generation += 1
+        self.last_reload = time.time()
+        return rules
+
+    def reload(self) -> bool:
+        """Kompilasi ulang rule dan ganti secara atomik"""
+        with self._lock:
+            try:
+                self.rules = self._compile()
+                self.logger.info(f"Detection rules reloaded (generation {self.generation})")
+                return True
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Error reloading detection rules: {e}")
+                return False
+
+    def start(self):
+        """Mulai thread yang memantau perubahan rules_file (idempotent, tanpa file tidak ada thread)"""
+        if not self.rules_file or (self.watch_thread and self.watch_thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self.watch_thread = threading.Thread(target=self._watch_loop, name='rule-reload')
+        self.watch_thread.daemon = True
+        self.watch_thread.start()
+
+    def stop(self, timeout: float = 2):
+        self._stop_event.set()
+        if self.watch_thread and self.watch_thread.is_alive():
+            self.watch_thread.join(timeout=timeout)
+
+    def _watch_loop(self):
+        while not self._stop_event.wait(self.reload_interval):
+            self.maybe_reload()
+
+    def maybe_reload(self) -> bool:
+        """Reload jika file rule berubah (dipanggil thread watcher, bukan jalur capture)"""
+        if not self.rules_file:
+            return False
+        try:
+            mtime = Path(self.rules_file).stat().st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._rules_mtime:
+            return self.reload()
+        return False
+
+    def _hit(self, rule: str):
+        with self._hits_lock:
+            self.hits[rule] = self.hits.get(rule, 0) + 1
+
+    def match_domain(self, domain: Optional[str]) -> Optional[str]:
+        """Return pola domain mencurigakan yang cocok, None jika tidak ada"""
+        pattern = self._match_domain(self.rules, domain)
+        if pattern is not None:
+            self._hit(f'domain:{pattern}')
+        return pattern
+
+    @staticmethod
+    def _match_domain(rules: CompiledRules, domain: Optional[str]) -> Optional[str]:
+        if not domain:
+            return None
+        return rules.domains.search(domain.lower())
+
+    def evaluate(self, dest_ip: str, dest_port: Optional[int],
+                 dest_domain: Optional[str] = None) -> Optional[str]:
+        """Return nama rule yang menandai koneksi mencurigakan, None jika aman"""
+        # Satu snapshot ruleset untuk seluruh evaluasi; reload menukar self.rules secara atomik
+        rules = self.rules
+        rule, verdict = self._decide(rules, dest_ip, dest_port, dest_domain)
+        # Hanya rule yang menentukan hasil yang dihitung (sekali per koneksi)
+        if rule is not None:
+            self._hit(rule)
+        return rule if verdict else None
+
+    def _decide(self, rules: CompiledRules, dest_ip: str, dest_port: Optional[int],
+                dest_domain: Optional[str]) -> tuple:
+        """(rule yang menentukan hasil atau None, mencurigakan)"""
+        if dest_port in rules.ports:
+            return f'port:{dest_port}', True
+
+        try:
+            packed = ipaddress.ip_address(dest_ip).packed
+        except ValueError:
+            packed = None
+        if packed is not None:
+            trie = rules.v4_trie if len(packed) == 4 else rules.v6_trie
+            match = trie.longest_match(packed)
+            if match is not None:
+                verdict, rule = match
+                return rule, verdict
+
+        pattern = self._match_domain(rules, dest_domain)
+        return (f'domain:{pattern}', True) if pattern else (None, False)
+
+    def get_stats(self, top: int = 20) -> Dict:
+        """Dapatkan jumlah rule dan hit counter per rule"""
+        rules = self.rules
+        with self._hits_lock:
+            hits = dict(self.hits)
+        top_hits = sorted(hits.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            'generation': self.generation,
+            'last_reload': self.last_reload,
+            'rules_file': str(self.rules_file) if self.rules_file else None,
+            'port_rules': rules.port_count,
+            'ipv4_prefixes': rules.v4_trie.size,
+            'ipv6_prefixes': rules.v6_trie.size,
+            'domain_patterns': rules.domains.size,
+            'total_hits': sum(hits.values()),
+            'top_hits': dict(top_hits),
+        }
@@ -0,0 +1,129 @@
+"""
+Packet Sampler - Tahap sampling sebelum pipeline pemrosesan packet
+
+Mode:
+- off          : semua packet diproses
+- deterministic: setiap packet ke-N diproses
+- flow         : flow dipilih dari hash 5-tuple simetris, sehingga sebuah flow
+                 (kedua arah) diproses utuh atau dilewati seluruhnya
+- adaptive     : seperti 'flow', tetapi N dinaikkan/diturunkan otomatis
+                 mengikuti beban pemrosesan. Keputusan (dan N) setiap flow
+                 ditetapkan saat packet pertamanya, sehingga perubahan N di
+                 tengah flow tidak mencampur sample rate dalam satu flow
+
+Setiap record yang disimpan membawa sample_rate (N) agar query bisa
+menskalakan kembali estimasi jumlah koneksi, packet dan bytes.
+"""
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict
+
+from config.config import MONITORING_CONFIG, SAMPLING_CONFIG
+
+MODES = ('off', 'deterministic', 'flow', 'adaptive')
+
+class PacketSampler:
+    def __init__(self, mode: str = None, rate: int = None, max_rate: int = None,
+                 high_watermark: float = None, low_watermark: float = None, max_flows: int = None):
+        self.mode = mode or SAMPLING_CONFIG['mode']
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown sampling mode '{self.mode}'")
+        self.min_rate = max(1, rate or SAMPLING_CONFIG['rate'])
+        self.max_rate = max(self.min_rate, max_rate or SAMPLING_CONFIG['max_rate'])
+        self.high_watermark = high_watermark or SAMPLING_CONFIG['high_watermark']
+        self.low_watermark = low_watermark or SAMPLING_CONFIG['low_watermark']
+        self.rate = 1 if self.mode == 'off' else self.min_rate
+        self.last_load = 0.0
+        self._counter = 0
+        # Mode adaptive: hash flow -> sample rate yang ditetapkan saat flow dimulai (0 = dilewati), LRU
+        self.max_flows = max_flows or MONITORING_CONFIG['flow_table_max_flows']
+        self._flows: "OrderedDict[int, int]" = OrderedDict()
+        # Counter deterministic dan keputusan flow diakses dari thread capture dan worker
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'seen': 0,
+            'sampled': 0,
+            'rate_changes': 0,
+        }
+
+    @staticmethod
+    def flow_hash(source_ip: str, dest_ip: str, source_port, dest_port, protocol: str) -> int:
+        """Hash 5-tuple yang sama untuk kedua arah flow"""
+        a = f'{source_ip}|{source_port}'
+        b = f'{dest_ip}|{dest_port}'
+        if a > b:
+            a, b = b, a
+        return zlib.crc32(f'{a}|{b}|{protocol}'.encode())
+
+    def sample(self, source_ip: str, dest_ip: str, source_port, dest_port, protocol: str) -> int:
+        """Return sample_rate jika packet diproses, 0 jika dilewati"""
+        rate = self.rate
+        if rate == 1 and self.mode != 'adaptive':
+            self.stats['seen'] += 1
+            self.stats['sampled'] += 1
+            return 1
+
+        if self.mode == 'deterministic':
+            with self._lock:
+                self.stats['seen'] += 1
+                self._counter += 1
+                if self._counter < rate:
+                    return 0
+                self._counter = 0
+                self.stats['sampled'] += 1
+            return rate
+
+        key = self.flow_hash(source_ip, dest_ip, source_port, dest_port, protocol)
+        if self.mode == 'flow':
+            with self._lock:
+                self.stats['seen'] += 1
+                if key % rate:
+                    return 0
+                self.stats['sampled'] += 1
+            return rate
+
+        with self._lock:
+            self.stats['seen'] += 1
+            decided = self._flows.get(key)
+            if decided is None:
+                decided = 0 if key % rate else rate
+                self._flows[key] = decided
+                if len(self._flows) > self.max_flows:
+                    self._flows.popitem(last=False)
+            else:
+                self._flows.move_to_end(key)
+            if decided:
+                self.stats['sampled'] += 1
+        return decided
+
+    def adjust(self, load: float):
+        """
+        Sesuaikan N dari beban (0..1, misalnya fraksi waktu sibuk atau isi antrian).
+
+        Hanya mode adaptive; N dikali/dibagi dua agar respons cepat tetapi stabil.
+        Rate yang naik tetap kelipatan N lama sehingga flow yang sudah dipilih
+        tetap terpilih saat N turun kembali.
+        """
+        self.last_load = round(load, 3)
+        if self.mode != 'adaptive':
+            return
+        with self._lock:
+            rate = self.rate
+            if load > self.high_watermark and rate < self.max_rate:
+                rate = min(rate * 2, self.max_rate)
+            elif load < self.low_watermark and rate > self.min_rate:
+                rate = max(rate // 2, self.min_rate)
+            if rate != self.rate:
+                self.rate = rate
+                self.stats['rate_changes'] += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'mode': self.mode,
+            'rate': self.rate,
+            'load': self.last_load,
+            'tracked_flows': len(self._flows),
+        }
@@ -0,0 +1,106 @@
+"""
+Worker Pipeline - Pipeline packet ringan untuk proses worker
+
+Worker hanya menjalankan decode, sampling, flow table, detection rules,
+peta passive DNS (di memori), GeoIP dan parsing hostname. Record, alert dan
+jawaban DNS yang perlu disimpan dikumpulkan di outbox lalu dikirim ke proses
+utama, yang memegang satu-satunya DatabaseManager (migrasi, maintenance,
+batch writer), deduplikasi alert dan resolver reverse DNS.
+"""
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from config.config import FILTERED_DOMAINS
+from src.monitor.metrics import PipelineMetrics
+from src.monitor.network_monitor import NetworkMonitor
+
+class RateDelta:
+    """
+    Pengganti RateTracker di worker: event dikumpulkan per (detik, source, destination)
+    lalu digabung ke RateTracker proses utama. Threshold HIGH_TRAFFIC diperiksa di
+    proses utama atas gabungan semua worker, sehingga current() selalu 0.
+    """
+
+    def __init__(self):
+        self.pending = defaultdict(int)
+
+    def record(self, source_ip: str = None, dest_ip: str = None, timestamp: float = None, count: int = 1):
+        self.pending[(int(timestamp or time.time()), source_ip, dest_ip)] += count
+
+    def current(self, resolution: str = 'minute', now: float = None) -> int:
+        return 0
+
+    def drain(self) -> Dict:
+        pending, self.pending = self.pending, defaultdict(int)
+        return dict(pending)
+
+    def get_stats(self) -> Dict:
+        return {'pending': len(self.pending)}
+
+class WorkerOutbox:
+    """Pengganti BatchWriter di worker: hasil (jenis, item) dikumpulkan lalu dikirim ke proses utama"""
+
+    def __init__(self):
+        self.items: List[Tuple[str, object]] = []
+
+    def submit(self, kind: str, item) -> bool:
+        self.items.append((kind, item))
+        return True
+
+    def drain(self) -> List[Tuple[str, object]]:
+        items, self.items = self.items, []
+        return items
+
+class WorkerPipeline(NetworkMonitor):
+    """Pipeline NetworkMonitor tanpa database, alert manager, resolver, dan log file"""
+
+    def __init__(self, interface: str, passive_entries: List[Tuple[str, str, float]] = None):
+        self.interface = interface
+        self.metrics = PipelineMetrics()
+        self._init_pipeline()
+        self.rates = RateDelta()
+        # Method pipeline NetworkMonitor mengirim record lewat batch_writer.submit
+        self.outbox = self.batch_writer = WorkerOutbox()
+        if self.passive_dns.enabled:
+            # Peta awal dari proses utama (dimuat dari database sekali, bukan per worker)
+            self.passive_dns.load(passive_entries or [])
+            self.passive_dns.add_listener(
+                lambda ip, domain, expires_at: self.outbox.submit('passive_dns', (ip, domain, expires_at))
+            )
+        self._busy_sample = (time.monotonic(), 0.0)
+
+    def resolve_domain(self, ip_address: str, timestamp: float = None) -> Optional[str]:
+        """Hanya peta passive DNS; PTR lookup dijalankan proses utama saat record diterima"""
+        if ip_address in FILTERED_DOMAINS:
+            return None
+        return self.passive_dns.lookup(ip_address, timestamp)
+
+    def _submit_flow(self, record: Dict):
+        if not record.get('dest_domain') and 'dest_ip' in record:
+            record['dest_domain'] = self.passive_dns.lookup(record['dest_ip'], record.get('last_seen'))
+        self.outbox.submit('flow', record)
+
+    def _raise_alert(self, alert_type: str, message: str, severity: str,
+                     dedup_key: str = None, timestamp: float = None):
+        """Alert dideduplikasi dan disimpan oleh alert manager proses utama"""
+        self.outbox.submit('alert', (alert_type, message, severity, dedup_key, timestamp))
+
+    def _capture_tick(self):
+        """Tick worker: sampling mengikuti beban worker, flow yang timeout di-export"""
+        now = time.monotonic()
+        last_time, last_busy = self._busy_sample
+        if now > last_time:
+            self.sampler.adjust((self._busy_time - last_busy) / (now - last_time))
+        self._busy_sample = (now, self._busy_time)
+        self.expire_flows()
+
+    def get_component_stats(self) -> Dict:
+        return {
+            'flow_table': self.flow_table.get_stats(),
+            'sampling': self.sampler.get_stats(),
+            'raw_capture': self.raw_capture.get_stats(),
+            'passive_dns': self.passive_dns.get_stats(),
+            'hostname_parser': self.hostnames.get_stats(),
+            'detection_rules': self.rule_engine.get_stats(top=100),
+        }
@@ -0,0 +1,404 @@
+"""
+Worker Pool - Pemrosesan packet multi-proses dengan sharding per flow
+
+Proses capture hanya membaca frame lalu membagikannya ke N proses worker
+lewat antrian multiprocessing (frame dikirim per batch). Pembagian memakai
+hash flow simetris dari header (flow_shard) sehingga kedua arah sebuah flow
+selalu diproses worker yang sama. Setiap worker menjalankan WorkerPipeline
+(decode, sampling, flow table, deteksi) di prosesnya sendiri, tanpa berbagi
+GIL dengan proses capture. Record, alert dan jawaban DNS dikirim balik ke
+proses utama lewat antrian hasil; migrasi, maintenance database, deduplikasi
+alert dan penulisan database hanya berjalan di proses utama.
+
+Jawaban DNS dikirim ke semua worker agar peta passive DNS setiap worker
+lengkap; hanya worker pemilik flow yang meneruskannya untuk disimpan. Worker yang
+mati terdeteksi saat pengiriman atau flush berkala lalu dijalankan ulang
+(sampai worker_max_restarts). Worker mengirim ringkasan berkala (counter kumulatif dan delta laju
+koneksi per detik) yang digabung oleh proses utama.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from typing import Callable, Dict, List, Tuple
+
+from config.config import MONITORING_CONFIG
+from src.monitor.packet_decoder import LINKTYPE_ETHERNET, decode_frame, flow_shard
+
+# Statistik komponen worker yang digabung untuk get_monitoring_stats
+MERGED_STATS = ('flow_table', 'sampling', 'raw_capture', 'passive_dns', 'hostname_parser', 'detection_rules')
+# Nilai rasio dirata-rata, bukan dijumlahkan
+AVERAGED_STATS = {'hit_rate', 'avg_parse_us', 'load', 'rate'}
+# Nilai yang sama di setiap worker (rules yang dimuat): ambil maksimum, bukan jumlah
+SHARED_STATS = {'generation', 'last_reload', 'port_rules', 'ipv4_prefixes',
+                'ipv6_prefixes', 'domain_patterns'}
+
+def _snapshot(worker_id: int, pipeline, final: bool = False) -> Dict:
+    """Ringkasan worker yang dikirim ke proses utama"""
+    stats = pipeline.get_component_stats()
+    return {
+        'worker_id': worker_id,
+        'pid': os.getpid(),
+        'final': final,
+        'packets': pipeline.packets_captured,
+        'connections': pipeline.connection_count,
+        'busy_seconds': round(pipeline._busy_time, 3),
+        'rates': pipeline.rates.drain(),
+        'metrics': pipeline.metrics.export(),
+        **{name: stats[name] for name in MERGED_STATS},
+    }
+
+def _send_output(worker_id: int, pipeline, results):
+    """Kirim record, alert dan jawaban DNS yang terkumpul ke proses utama"""
+    items = pipeline.outbox.drain()
+    if items:
+        results.put({'worker_id': worker_id, 'output': items})
+
+def _worker_main(worker_id: int, interface: str, frames, results,
+                 stats_interval: float, metrics_flag, passive_entries):
+    """Loop proses worker: proses batch frame sampai menerima None"""
+    # Ctrl+C ditangani proses utama, yang menghentikan worker lewat antrian
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Log ke stderr saja; file log ditulis proses utama
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    from src.monitor.worker_pipeline import WorkerPipeline
+
+    pipeline = WorkerPipeline(interface, passive_entries)
+    pipeline.metrics.enabled = bool(metrics_flag.value)
+    pipeline.raw_capture.prefix = f'raw-w{worker_id}'
+    pipeline.local_addresses.start()
+    pipeline.rule_engine.start()
+
+    process_frame = pipeline.process_frame
+    next_tick = time.monotonic() + stats_interval
+    next_expire = None
+    try:
+        while True:
+            try:
+                batch = frames.get(timeout=stats_interval)
+            except queue.Empty:
+                batch = ()
+            if batch is None:
+                break
+
+            for frame, wire_length, linktype, timestamp, owner in batch:
+                if owner:
+                    process_frame(frame, wire_length, linktype, timestamp)
+                    if timestamp:
+                        # Replay PCAP: expire flow menurut jam capture
+                        if next_expire is None:
+                            next_expire = timestamp + 1
+                        elif timestamp >= next_expire:
+                            pipeline.expire_flows(timestamp)
+                            next_expire = timestamp + 1
+                else:
+                    # Jawaban DNS milik flow worker lain: hanya isi peta passive DNS,
+                    # worker pemilik yang meneruskannya untuk disimpan
+                    info = decode_frame(frame, linktype, wire_length)
+                    if info is not None and info.payload:
+                        pipeline.passive_dns.ingest(info.payload, info.protocol == 'TCP', timestamp,
+                                                    notify=False)
+
+            now = time.monotonic()
+            if now >= next_tick:
+                next_tick = now + stats_interval
+                pipeline.metrics.enabled = bool(metrics_flag.value)
+                if next_expire is None:
+                    pipeline._capture_tick()
+                pipeline.raw_capture.flush()
+                _send_output(worker_id, pipeline, results)
+                results.put(_snapshot(worker_id, pipeline))
+            else:
+                _send_output(worker_id, pipeline, results)
+    except Exception as e:
+        pipeline.logger.error(f"Packet worker {worker_id} failed: {e}")
+    finally:
+        pipeline.flush_flows()
+        pipeline.local_addresses.stop()
+        pipeline.rule_engine.stop()
+        pipeline.raw_capture.close()
+        _send_output(worker_id, pipeline, results)
+        results.put(_snapshot(worker_id, pipeline, final=True))
+
+class WorkerPool:
+    def __init__(self, num_workers: int = None, interface: str = None, queue_size: int = None,
+                 batch_size: int = None, stats_interval: float = None, block_when_full: bool = False,
+                 metrics_enabled: bool = False, send_timeout: float = None, max_restarts: int = None,
+                 output_handler: Callable[[List[Tuple[str, object]]], None] = None,
+                 passive_entries: List[Tuple[str, str, float]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.num_workers = max(1, num_workers or MONITORING_CONFIG['workers'])
+        self.interface = interface or MONITORING_CONFIG['interface']
+        self.queue_size = queue_size or MONITORING_CONFIG['worker_queue_size']
+        self.batch_size = batch_size or MONITORING_CONFIG['worker_batch_size']
+        self.stats_interval = stats_interval or MONITORING_CONFIG['worker_stats_interval']
+        self.send_timeout = send_timeout or MONITORING_CONFIG['worker_send_timeout']
+        self.max_restarts = (max_restarts if max_restarts is not None
+                             else MONITORING_CONFIG['worker_max_restarts'])
+        # Capture live drop batch jika worker tertinggal; replay offline menunggu (backpressure)
+        self.block_when_full = block_when_full
+        self.metrics_enabled = metrics_enabled
+        self._metrics_flag = None
+        # Menerima [(jenis, item), ...] hasil worker (record, alert, jawaban DNS) di poll()
+        self.output_handler = output_handler
+        # Peta passive DNS awal untuk worker (dimuat proses utama dari database)
+        self.passive_entries = passive_entries or []
+        # spawn: proses capture sudah punya thread (writer, netlink), fork tidak aman
+        self._context = multiprocessing.get_context('spawn')
+        self.processes = []
+        self.queues = []
+        self.results = None
+        self._pending: List[List] = [[] for _ in range(self.num_workers)]
+        # worker_id -> ringkasan terakhir (tanpa delta laju)
+        self.worker_stats: Dict[int, Dict] = {}
+        # Counter kumulatif worker yang sudah mati (agar total tidak turun setelah restart)
+        self.retired = {'packets': 0, 'connections': 0}
+        # Worker yang melewati max_restarts; batch untuknya di-drop
+        self._failed = set()
+
+        self.stats = {
+            'dispatched': 0,
+            'broadcast': 0,
+            'batches': 0,
+            'dropped': 0,
+            'restarts': 0,
+            'results': 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self.processes)
+
+    def start(self):
+        """Jalankan proses worker (idempotent)"""
+        if self.processes:
+            return
+        self.results = self._context.Queue()
+        # Flag bersama: toggle metrics dari proses utama dibaca worker setiap tick
+        self._metrics_flag = self._context.Value('b', int(self.metrics_enabled), lock=False)
+        self.queues = [None] * self.num_workers
+        self.processes = [None] * self.num_workers
+        self._failed = set()
+        for worker_id in range(self.num_workers):
+            self._spawn(worker_id)
+        self.logger.info(f"Started {self.num_workers} packet workers")
+
+    def _spawn(self, worker_id: int):
+        """Buat antrian dan proses untuk satu worker"""
+        frames = self._context.Queue(maxsize=self.queue_size)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, self.interface, frames, self.results,
+                  self.stats_interval, self._metrics_flag, self.passive_entries),
+            name=f'packet-worker-{worker_id}'
+        )
+        process.daemon = True
+        process.start()
+        self.queues[worker_id] = frames
+        self.processes[worker_id] = process
+
+    def _ensure_alive(self, worker_id: int) -> bool:
+        """Restart worker yang mati; return False jika worker tidak bisa dipakai lagi"""
+        if worker_id in self._failed:
+            return False
+        process = self.processes[worker_id]
+        if process.is_alive():
+            return True
+
+        # Ringkasan terakhir worker yang mati masuk ke counter retired
+        snapshot = self.worker_stats.pop(worker_id, None)
+        if snapshot:
+            for key in self.retired:
+                self.retired[key] += snapshot[key]
+        # Frame di antrian lama ikut hilang bersama worker
+        self.queues[worker_id].cancel_join_thread()
+        self.queues[worker_id].close()
+
+        if self.stats['restarts'] >= self.max_restarts:
+            self._failed.add(worker_id)
+            self.logger.error(f"Packet worker {worker_id} died (exit code {process.exitcode}) "
+                              f"and the restart limit is reached, dropping its frames")
+            return False
+        self.stats['restarts'] += 1
+        self.logger.error(f"Packet worker {worker_id} died (exit code {process.exitcode}), restarting")
+        self._spawn(worker_id)
+        return True
+
+    def check_workers(self) -> int:
+        """Periksa semua worker dan restart yang mati, return jumlah worker yang hidup"""
+        if not self.processes:
+            return 0
+        return sum(1 for worker_id in range(self.num_workers) if self._ensure_alive(worker_id))
+
+    def set_metrics_enabled(self, enabled: bool):
+        self.metrics_enabled = enabled
+        if self._metrics_flag is not None:
+            self._metrics_flag.value = int(enabled)
+
+    def dispatch(self, frame, wire_length: int = None, linktype: int = LINKTYPE_ETHERNET,
+                 timestamp: float = None):
+        """Kirim satu frame ke worker pemilik flow-nya (jawaban DNS ke semua worker)"""
+        frame = bytes(frame)
+        flow_hash, is_dns = flow_shard(frame, linktype)
+        owner = flow_hash % self.num_workers
+        wire_length = wire_length or len(frame)
+        self.stats['dispatched'] += 1
+
+        if is_dns and self.num_workers > 1:
+            self.stats['broadcast'] += 1
+            for worker_id in range(self.num_workers):
+                self._enqueue(worker_id, (frame, wire_length, linktype, timestamp, worker_id == owner))
+        else:
+            self._enqueue(owner, (frame, wire_length, linktype, timestamp, True))
+
+    def _enqueue(self, worker_id: int, item: tuple):
+        pending = self._pending[worker_id]
+        pending.append(item)
+        if len(pending) >= self.batch_size:
+            self._send(worker_id)
+
+    def _send(self, worker_id: int):
+        batch = self._pending[worker_id]
+        if not batch or not self.queues:
+            return
+        self._pending[worker_id] = []
+        if not self._ensure_alive(worker_id):
+            self.stats['dropped'] += len(batch)
+            return
+        if not self.block_when_full:
+            try:
+                self.queues[worker_id].put_nowait(batch)
+                self.stats['batches'] += 1
+            except queue.Full:
+                self.stats['dropped'] += len(batch)
+            return
+
+        # Backpressure: tunggu antrian dalam potongan pendek agar worker yang mati terdeteksi
+        deadline = time.monotonic() + self.send_timeout
+        while True:
+            try:
+                self.queues[worker_id].put(batch, timeout=0.5)
+                self.stats['batches'] += 1
+                return
+            except queue.Full:
+                pass
+            if not self._ensure_alive(worker_id):
+                break
+            if time.monotonic() >= deadline:
+                self.logger.error(f"Packet worker {worker_id} queue still full after "
+                                  f"{self.send_timeout}s, dropping batch")
+                break
+        self.stats['dropped'] += len(batch)
+
+    def flush(self):
+        """Kirim batch yang belum penuh dan restart worker yang mati (dipanggil periodik)"""
+        self.check_workers()
+        for worker_id in range(self.num_workers):
+            self._send(worker_id)
+
+    def poll(self) -> List[Dict]:
+        """
+        Ambil pesan worker yang sudah masuk tanpa menunggu: hasil diteruskan ke
+        output_handler, ringkasan dikembalikan.
+        """
+        snapshots = []
+        if self.results is None:
+            return snapshots
+        while True:
+            try:
+                snapshot = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if 'output' in snapshot:
+                # Hasil tetap diproses walaupun worker pengirimnya sudah diganti
+                self.stats['results'] += len(snapshot['output'])
+                if self.output_handler:
+                    self.output_handler(snapshot['output'])
+                continue
+            process = self.processes[snapshot['worker_id']] if self.processes else None
+            if process is not None and snapshot['pid'] != process.pid:
+                # Ringkasan terlambat dari worker yang sudah diganti (sudah masuk retired)
+                continue
+            self.worker_stats[snapshot['worker_id']] = {
+                key: value for key, value in snapshot.items() if key != 'rates'
+            }
+            snapshots.append(snapshot)
+        return snapshots
+
+    def stop(self, timeout: float = 10) -> List[Dict]:
+        """Hentikan worker setelah sisa frame diproses, return ringkasan terakhir"""
+        if not self.processes:
+            return []
+        self.flush()
+        for frames, process in zip(self.queues, self.processes):
+            if not process.is_alive():
+                continue
+            try:
+                frames.put(None, timeout=timeout)
+            except queue.Full:
+                self.logger.warning(f"Worker {process.name} not responding, terminating")
+                process.terminate()
+
+        snapshots = []
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while any(process.is_alive() for process in self.processes):
+            snapshots.extend(self.poll())
+            if deadline is not None and time.monotonic() > deadline:
+                for process in self.processes:
+                    if process.is_alive():
+                        self.logger.warning(f"Worker {process.name} did not stop in time, terminating")
+                        process.terminate()
+                break
+            for process in self.processes:
+                process.join(timeout=0.1)
+        snapshots.extend(self.poll())
+
+        self.processes = []
+        self.queues = []
+        return snapshots
+
+    def total(self, key: str) -> int:
+        """Jumlah counter kumulatif (packets/connections) semua worker, termasuk yang sudah mati"""
+        return self.retired[key] + sum(stats[key] for stats in self.worker_stats.values())
+
+    def merged_stats(self, name: str) -> Dict:
+        """Gabungkan statistik satu komponen dari semua worker"""
+        merged = {}
+        snapshots = [snapshot[name] for snapshot in self.worker_stats.values() if snapshot.get(name)]
+        for stats in snapshots:
+            for key, value in stats.items():
+                if key in SHARED_STATS and value is not None:
+                    merged[key] = max(merged.get(key, value), value)
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    merged[key] = merged.get(key, 0) + value
+                elif isinstance(value, dict) and all(isinstance(count, int) for count in value.values()):
+                    # Counter per kunci (misalnya hit per rule)
+                    counters = merged.setdefault(key, {})
+                    for item, count in value.items():
+                        counters[item] = counters.get(item, 0) + count
+                else:
+                    merged.setdefault(key, value)
+        for key in AVERAGED_STATS & merged.keys():
+            merged[key] = round(merged[key] / len(snapshots), 3)
+        return merged
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'workers': self.num_workers,
+            'alive': sum(1 for process in self.processes if process.is_alive()),
+            'failed': sorted(self._failed),
+            'pending': sum(len(pending) for pending in self._pending),
+            'per_worker': [
+                {
+                    'worker_id': worker_id,
+                    'packets': snapshot['packets'],
+                    'connections': snapshot['connections'],
+                    'busy_seconds': snapshot['busy_seconds'],
+                }
+                for worker_id, snapshot in sorted(self.worker_stats.items())
+            ],
+        }
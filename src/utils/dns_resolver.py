@@ -0,0 +1,156 @@
+"""
+Resolver reverse DNS non-blocking dengan cache LRU + TTL
+"""
+import socket
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from config.config import DNS_CONFIG
+
+class DNSResolver:
+    def __init__(self, max_workers: int = None, cache_size: int = None,
+                 positive_ttl: float = None, negative_ttl: float = None,
+                 max_pending: int = None):
+        self.logger = logging.getLogger(__name__)
+        self.max_workers = max_workers or DNS_CONFIG['resolver_workers']
+        self.cache_size = cache_size or DNS_CONFIG['cache_size']
+        self.positive_ttl = positive_ttl or DNS_CONFIG['positive_ttl']
+        self.negative_ttl = negative_ttl or DNS_CONFIG['negative_ttl']
+        self.max_pending = max_pending or DNS_CONFIG['max_pending']
+
+        # Worker pool dibuat saat lookup pertama dan dibuat ulang setelah shutdown()
+        self.executor = None
+        # ip -> (domain atau None, expires_at), urutan LRU (paling lama di depan)
+        self.cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.listeners: List[Callable[[str, Optional[str]], None]] = []
+
+        self.stats = {
+            'hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'lookups': 0,
+            'failures': 0,
+            'skipped': 0,
+            'evictions': 0,
+            'total_latency': 0.0,
+            'max_latency': 0.0,
+        }
+
+    def add_listener(self, callback: Callable[[str, Optional[str]], None]):
+        """Daftarkan callback(ip, domain) yang dipanggil setelah lookup selesai"""
+        self.listeners.append(callback)
+
+    def get_cached(self, ip_address: str) -> Optional[str]:
+        """Ambil domain dari cache tanpa menjadwalkan lookup"""
+        with self.lock:
+            entry = self.cache.get(ip_address)
+            if entry and entry[1] > time.time():
+                return entry[0]
+        return None
+
+    def lookup(self, ip_address: str) -> Optional[str]:
+        """
+        Resolve IP tanpa blocking.
+
+        Jika ada di cache, domain langsung dikembalikan. Jika tidak, lookup
+        dijadwalkan di worker pool dan None dikembalikan (domain pending).
+        """
+        with self.lock:
+            entry = self.cache.get(ip_address)
+            if entry and entry[1] > time.time():
+                self.cache.move_to_end(ip_address)
+                if entry[0] is None:
+                    self.stats['negative_hits'] += 1
+                else:
+                    self.stats['hits'] += 1
+                return entry[0]
+
+            self.stats['misses'] += 1
+            if ip_address in self.pending:
+                return None
+            if len(self.pending) >= self.max_pending:
+                self.stats['skipped'] += 1
+                return None
+            self.pending.add(ip_address)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                   thread_name_prefix='dns-resolver')
+            executor = self.executor
+
+        try:
+            executor.submit(self._resolve, ip_address)
+        except RuntimeError:
+            # Executor sudah di-shutdown
+            with self.lock:
+                self.pending.discard(ip_address)
+        return None
+
+    def _resolve(self, ip_address: str):
+        """Lakukan PTR lookup di worker thread"""
+        started = time.monotonic()
+        try:
+            domain = socket.gethostbyaddr(ip_address)[0]
+            if domain == ip_address:
+                domain = None
+        except (socket.herror, socket.gaierror, OSError):
+            domain = None
+        latency = time.monotonic() - started
+
+        ttl = self.positive_ttl if domain else self.negative_ttl
+        with self.lock:
+            self.pending.discard(ip_address)
+            self.cache[ip_address] = (domain, time.time() + ttl)
+            self.cache.move_to_end(ip_address)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+                self.stats['evictions'] += 1
+
+            self.stats['lookups'] += 1
+            if domain is None:
+                self.stats['failures'] += 1
+            self.stats['total_latency'] += latency
+            self.stats['max_latency'] = max(self.stats['max_latency'], latency)
+
+        for callback in self.listeners:
+            try:
+                callback(ip_address, domain)
+            except Exception as e:
+                self.logger.error(f"Error in DNS resolver listener: {e}")
+
+    def shutdown(self):
+        """Hentikan worker pool; lookup yang belum berjalan dibatalkan (lookup berikutnya membuat pool baru)"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+            self.pending.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict:
+        """Dapatkan statistik cache dan latency resolver"""
+        with self.lock:
+            stats = dict(self.stats)
+            cache_entries = len(self.cache)
+            pending = len(self.pending)
+
+        requests = stats['hits'] + stats['negative_hits'] + stats['misses']
+        lookups = stats['lookups']
+        return {
+            'hits': stats['hits'],
+            'negative_hits': stats['negative_hits'],
+            'misses': stats['misses'],
+            'hit_rate': round((stats['hits'] + stats['negative_hits']) / requests, 4) if requests else 0.0,
+            'lookups': lookups,
+            'failures': stats['failures'],
+            'skipped': stats['skipped'],
+            'evictions': stats['evictions'],
+            'pending': pending,
+            'cache_entries': cache_entries,
+            'avg_latency_ms': round(stats['total_latency'] / lookups * 1000, 2) if lookups else 0.0,
+            'max_latency_ms': round(stats['max_latency'] * 1000, 2),
+        }
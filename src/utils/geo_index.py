@@ -0,0 +1,217 @@
+"""
+GeoIP Index - Database geolocation offline berbasis range IP yang diurutkan
+
+Format file index (semua integer dalam byte order native, dicek lewat marker):
+
+    header   : magic(8) marker(u32) n4(u32) n6(u32) n_countries(u32) country_bytes(u32)
+    IPv4     : starts u32[n4], ends u32[n4], country u16[n4] (+ padding ke 4 byte)
+    IPv6     : starts 16 byte big-endian[n6], ends 16 byte[n6], country u16[n6] (+ padding)
+    countries: nama negara dipisahkan newline (UTF-8)
+
+File di-mmap read-only sehingga beberapa proses berbagi page cache yang sama,
+dan lookup hanya berupa binary search pada array tersebut.
+"""
+import argparse
+import bisect
+import csv
+import ipaddress
+import logging
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+MAGIC = b'NMGEOIX1'
+BYTE_ORDER_MARKER = 0x01020304
+HEADER = struct.Struct('=8sIIIII')
+
+class _IPv6Keys:
+    """View sequence atas array key IPv6 16-byte untuk dipakai bisect"""
+
+    def __init__(self, view: memoryview, count: int):
+        self.view = view
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> bytes:
+        offset = index * 16
+        return bytes(self.view[offset:offset + 16])
+
+class GeoIndex:
+    def __init__(self, index_path):
+        self.logger = logging.getLogger(__name__)
+        self.index_path = Path(index_path)
+        self._file = open(self.index_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._load()
+
+    def _load(self):
+        """Petakan section di file index ke memoryview tanpa menyalin data"""
+        magic, marker, n4, n6, n_countries, country_bytes = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.index_path} is not a GeoIP index file")
+        if marker != BYTE_ORDER_MARKER:
+            raise ValueError(f"{self.index_path} was built on a machine with different byte order")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        self.v4_starts = view[offset:offset + n4 * 4].cast('I')
+        offset += n4 * 4
+        self.v4_ends = view[offset:offset + n4 * 4].cast('I')
+        offset += n4 * 4
+        self.v4_countries = view[offset:offset + n4 * 2].cast('H')
+        offset = _align(offset + n4 * 2)
+
+        self.v6_starts = _IPv6Keys(view[offset:offset + n6 * 16], n6)
+        offset += n6 * 16
+        self.v6_ends = _IPv6Keys(view[offset:offset + n6 * 16], n6)
+        offset += n6 * 16
+        self.v6_countries = view[offset:offset + n6 * 2].cast('H')
+        offset = _align(offset + n6 * 2)
+
+        self.countries = bytes(view[offset:offset + country_bytes]).decode('utf-8').split('\n')
+        if len(self.countries) != n_countries:
+            raise ValueError(f"{self.index_path} has a corrupt country table")
+
+        self.ipv4_ranges = n4
+        self.ipv6_ranges = n6
+
+    def lookup(self, ip_address: str) -> Optional[str]:
+        """Cari negara untuk IP address, None jika tidak ada range yang cocok"""
+        try:
+            ip = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+
+        if ip.version == 4:
+            value = int(ip)
+            i = bisect.bisect_right(self.v4_starts, value) - 1
+            if i >= 0 and value <= self.v4_ends[i]:
+                return self.countries[self.v4_countries[i]]
+            return None
+
+        value = ip.packed
+        i = bisect.bisect_right(self.v6_starts, value) - 1
+        if i >= 0 and value <= self.v6_ends[i]:
+            return self.countries[self.v6_countries[i]]
+        return None
+
+    def close(self):
+        """Lepaskan mmap dan file handle"""
+        for name in ('v4_starts', 'v4_ends', 'v4_countries', 'v6_countries'):
+            getattr(self, name).release()
+        self.v6_starts.view.release()
+        self.v6_ends.view.release()
+        self._mmap.close()
+        self._file.close()
+
+def _align(offset: int, boundary: int = 4) -> int:
+    return (offset + boundary - 1) // boundary * boundary
+
+def _parse_row(row: List[str]) -> Optional[Tuple]:
+    """Parse baris CSV 'start,end,country' atau 'cidr,country'"""
+    row = [col.strip() for col in row]
+    try:
+        if len(row) >= 3:
+            start = ipaddress.ip_address(row[0])
+            end = ipaddress.ip_address(row[1])
+            country = row[2]
+        elif len(row) == 2:
+            network = ipaddress.ip_network(row[0], strict=False)
+            start, end, country = network.network_address, network.broadcast_address, row[1]
+        else:
+            return None
+    except ValueError:
+        return None
+
+    if start.version != end.version or int(end) < int(start) or not country:
+        return None
+    return start, end, country
+
+def build_index(csv_path, index_path) -> Tuple[int, int]:
+    """Bangun file index dari CSV range IP, return (jumlah range IPv4, IPv6)"""
+    countries: List[str] = []
+    country_ids = {}
+    v4, v6 = [], []
+    skipped = 0
+
+    with open(csv_path, newline='', encoding='utf-8') as fh:
+        for row in csv.reader(fh):
+            parsed = _parse_row(row)
+            if parsed is None:
+                skipped += 1
+                continue
+            start, end, country = parsed
+            if country not in country_ids:
+                country_ids[country] = len(countries)
+                countries.append(country)
+            target = v4 if start.version == 4 else v6
+            target.append((int(start), int(end), country_ids[country]))
+
+    v4.sort()
+    v6.sort()
+
+    country_blob = '\n'.join(countries).encode('utf-8')
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(index_path.suffix + '.tmp')
+
+    with open(tmp_path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, BYTE_ORDER_MARKER, len(v4), len(v6), len(countries), len(country_blob)))
+        offset = HEADER.size
+
+        for column, typecode in ((0, 'I'), (1, 'I'), (2, 'H')):
+            data = array(typecode, (entry[column] for entry in v4)).tobytes()
+            out.write(data)
+            offset += len(data)
+        out.write(b'\0' * (_align(offset) - offset))
+        offset = _align(offset)
+
+        for column in (0, 1):
+            data = b''.join(entry[column].to_bytes(16, 'big') for entry in v6)
+            out.write(data)
+            offset += len(data)
+        data = array('H', (entry[2] for entry in v6)).tobytes()
+        out.write(data)
+        offset += len(data)
+        out.write(b'\0' * (_align(offset) - offset))
+
+        out.write(country_blob)
+
+    # Replace atomik agar proses lain yang sedang mmap file lama tidak terganggu
+    tmp_path.replace(index_path)
+
+    if skipped:
+        logging.getLogger(__name__).warning(f"Skipped {skipped} unparseable rows in {csv_path}")
+    return len(v4), len(v6)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and query the offline GeoIP index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build index file from an IP range CSV')
+    build_parser.add_argument('csv_file', help='CSV with start_ip,end_ip,country or cidr,country rows')
+    build_parser.add_argument('index_file', help='Output index file')
+
+    lookup_parser = subparsers.add_parser('lookup', help='Look up IP addresses in an index file')
+    lookup_parser.add_argument('index_file', help='Index file to query')
+    lookup_parser.add_argument('ips', nargs='+', help='IP addresses to look up')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        n4, n6 = build_index(args.csv_file, args.index_file)
+        print(f"Built {args.index_file}: {n4} IPv4 ranges, {n6} IPv6 ranges")
+    else:
+        index = GeoIndex(args.index_file)
+        for ip in args.ips:
+            print(f"{ip}: {index.lookup(ip) or 'Unknown'}")
+        index.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
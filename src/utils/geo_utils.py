@@ -6,11 +6,35 @@ import logging
 from typing import Optional, Dict
 import time
 
+from config.config import GEO_CONFIG
+from src.utils.geo_index import GeoIndex
+
 class GeoLocationUtils:
-    def __init__(self):
+    def __init__(self, mode: str = None, index_path: str = None):
         self.logger = logging.getLogger(__name__)
         self.cache = {}
         self.cache_timeout = 3600  # 1 hour cache
+        self.mode = mode or GEO_CONFIG['mode']
+        self.online_fallback = GEO_CONFIG['online_fallback']
+        self.geo_index = None
+        
+        if self.mode == 'offline':
+            self.load_index(index_path or GEO_CONFIG['index_path'])
+    
+    def load_index(self, index_path) -> bool:
+        """Load (atau reload) file index GeoIP offline"""
+        try:
+            new_index = GeoIndex(index_path)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Error loading GeoIP index {index_path}: {e}")
+            return False
+        
+        old_index, self.geo_index = self.geo_index, new_index
+        if old_index:
+            old_index.close()
+        self.logger.info(f"Loaded GeoIP index {index_path} "
+                         f"({new_index.ipv4_ranges} IPv4, {new_index.ipv6_ranges} IPv6 ranges)")
+        return True
         
     def get_country(self, ip_address: str) -> Optional[str]:
         """Dapatkan negara dari IP address"""
@@ -19,6 +43,12 @@ class GeoLocationUtils:
             if self._is_private_ip(ip_address):
                 return "Private"
             
+            # Mode offline: binary search di index lokal, tanpa network I/O
+            if self.mode == 'offline':
+                country = self.geo_index.lookup(ip_address) if self.geo_index else None
+                if country or not self.online_fallback:
+                    return country or "Unknown"
+            
             # Check cache first
             if ip_address in self.cache:
                 cached_data = self.cache[ip_address]
@@ -57,6 +87,17 @@ class GeoLocationUtils:
                     'org': 'Private'
                 }
             
+            if self.mode == 'offline' and not self.online_fallback:
+                country = self.get_country(ip_address)
+                return {
+                    'ip': ip_address,
+                    'country': country,
+                    'region': 'Unknown',
+                    'city': 'Unknown',
+                    'isp': 'Unknown',
+                    'org': 'Unknown'
+                }
+            
             response = requests.get(f"http://ip-api.com/json/{ip_address}", timeout=5)
             if response.status_code == 200:
                 data = response.json()
@@ -0,0 +1,209 @@
+"""
+Passive DNS - Peta IP -> domain dari jawaban DNS yang terlihat di jaringan
+
+Jawaban A/AAAA (termasuk yang lewat rantai CNAME) di-parse langsung dari
+payload UDP/TCP port 53 dan dicatat atas nama domain yang ditanyakan user.
+Map dibatasi ukurannya (LRU) dan setiap entri kedaluwarsa mengikuti TTL
+record DNS-nya, tanpa I/O jaringan tambahan.
+"""
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.config import DNS_CONFIG
+
+DNS_PORT = 53
+TYPE_A = 1
+TYPE_CNAME = 5
+TYPE_AAAA = 28
+CLASS_IN = 1
+
+_HEADER = struct.Struct('!HHHHHH')
+_RECORD = struct.Struct('!HHIH')
+
+class DNSParseError(ValueError):
+    pass
+
+def _read_name(data, offset: int) -> Tuple[str, int]:
+    """Baca nama DNS (dengan compression pointer), return (nama, offset setelah nama)"""
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        if offset >= len(data):
+            raise DNSParseError("Name exceeds message")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(data):
+                raise DNSParseError("Truncated pointer")
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            jumps += 1
+            if jumps > 32:
+                raise DNSParseError("Compression loop")
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(bytes(data[offset:offset + length]).decode('ascii', 'replace'))
+        offset += length
+    return '.'.join(labels).lower(), end if end is not None else offset
+
+def parse_dns_response(data) -> Optional[Tuple[str, List[Tuple[str, int]]]]:
+    """
+    Parse pesan DNS response.
+
+    Return (nama yang ditanyakan, [(ip, ttl)]) untuk record A/AAAA yang
+    terhubung ke nama tersebut, atau None jika bukan response yang berhasil.
+    """
+    if len(data) < _HEADER.size:
+        return None
+    _, flags, qdcount, ancount, _, _ = _HEADER.unpack_from(data, 0)
+    # Hanya response (QR=1) dengan RCODE NOERROR
+    if not flags & 0x8000 or flags & 0x000F or qdcount == 0 or ancount == 0:
+        return None
+
+    offset = _HEADER.size
+    qname = None
+    for _ in range(qdcount):
+        name, offset = _read_name(data, offset)
+        offset += 4
+        if qname is None:
+            qname = name
+
+    # Nama yang dianggap alias dari qname (rantai CNAME)
+    aliases = {qname}
+    addresses = []
+    for _ in range(ancount):
+        name, offset = _read_name(data, offset)
+        if offset + _RECORD.size > len(data):
+            raise DNSParseError("Truncated record")
+        rtype, rclass, ttl, rdlength = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        rdata_offset = offset
+        offset += rdlength
+        if offset > len(data):
+            raise DNSParseError("Truncated rdata")
+        if rclass != CLASS_IN or name not in aliases:
+            continue
+        if rtype == TYPE_CNAME:
+            aliases.add(_read_name(data, rdata_offset)[0])
+        elif rtype == TYPE_A and rdlength == 4:
+            addresses.append((socket.inet_ntoa(data[rdata_offset:offset]), ttl))
+        elif rtype == TYPE_AAAA and rdlength == 16:
+            addresses.append((socket.inet_ntop(socket.AF_INET6, data[rdata_offset:offset]), ttl))
+
+    return qname, addresses
+
+class PassiveDNS:
+    def __init__(self, enabled: bool = None, max_entries: int = None,
+                 min_ttl: float = None, max_ttl: float = None):
+        self.enabled = DNS_CONFIG['passive_dns'] if enabled is None else enabled
+        self.max_entries = max_entries or DNS_CONFIG['passive_cache_size']
+        self.min_ttl = min_ttl if min_ttl is not None else DNS_CONFIG['passive_min_ttl']
+        self.max_ttl = max_ttl or DNS_CONFIG['passive_max_ttl']
+        # ip -> (domain, expires_at), urutan LRU (paling lama di depan)
+        self.entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.listeners: List[Callable[[str, str, float], None]] = []
+
+        self.stats = {
+            'responses': 0,
+            'answers': 0,
+            'parse_errors': 0,
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+        }
+
+    def add_listener(self, callback: Callable[[str, str, float], None]):
+        """Daftarkan callback(ip, domain, expires_at) untuk setiap entri baru/diperbarui"""
+        self.listeners.append(callback)
+
+    def load(self, entries: List[Tuple[str, str, float]]):
+        """Isi map dari entri yang tersimpan (ip, domain, expires_at), urut dari yang paling lama"""
+        with self.lock:
+            for ip_address, domain, expires_at in entries:
+                self._store(ip_address, domain, expires_at)
+
+    def dump(self) -> List[Tuple[str, str, float]]:
+        """Semua entri (ip, domain, expires_at) urut dari yang paling lama, format yang sama dengan load()"""
+        with self.lock:
+            return [(ip_address, domain, expires_at) for ip_address, (domain, expires_at) in self.entries.items()]
+
+    def _store(self, ip_address: str, domain: str, expires_at: float):
+        if ip_address in self.entries:
+            self.entries.move_to_end(ip_address)
+        elif len(self.entries) >= self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+        self.entries[ip_address] = (domain, expires_at)
+
+    def ingest(self, payload, tcp: bool = False, now: float = None, notify: bool = True) -> int:
+        """
+        Proses payload DNS dari port 53, return jumlah IP yang dicatat.
+        notify=False hanya mengisi map tanpa memanggil listener (misalnya persistensi).
+        """
+        if not self.enabled:
+            return 0
+        if tcp:
+            # DNS over TCP: prefix panjang 2 byte, hanya pesan yang utuh dalam satu segment
+            if len(payload) < 2 or struct.unpack_from('!H', payload, 0)[0] != len(payload) - 2:
+                return 0
+            payload = payload[2:]
+        try:
+            result = parse_dns_response(payload)
+        except (DNSParseError, struct.error, ValueError, IndexError, OSError):
+            self.stats['parse_errors'] += 1
+            return 0
+        if not result or not result[1]:
+            return 0
+
+        qname, addresses = result
+        now = now or time.time()
+        learned = []
+        with self.lock:
+            self.stats['responses'] += 1
+            for ip_address, ttl in addresses:
+                expires_at = now + min(max(ttl, self.min_ttl), self.max_ttl)
+                self._store(ip_address, qname, expires_at)
+                learned.append((ip_address, expires_at))
+            self.stats['answers'] += len(learned)
+
+        for ip_address, expires_at in learned if notify else ():
+            for callback in self.listeners:
+                callback(ip_address, qname, expires_at)
+        return len(learned)
+
+    def lookup(self, ip_address: str, now: float = None) -> Optional[str]:
+        """Domain terakhir yang di-resolve ke IP ini, None jika tidak ada/kedaluwarsa"""
+        if not self.enabled:
+            return None
+        now = now or time.time()
+        with self.lock:
+            entry = self.entries.get(ip_address)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry[1] <= now:
+                del self.entries[ip_address]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(ip_address)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'enabled': self.enabled,
+            'entries': len(self.entries),
+            'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+        }